@@ -47,6 +47,7 @@ except Exception:
 import cs_exec_environment
 import cs_case_domain
 import cs_case
+import cs_io_reader
 
 #-------------------------------------------------------------------------------
 # Process the command line arguments
@@ -128,17 +129,28 @@ def main(argv, pkg):
     if not args:
         return 1
 
-    cmd = [pkg.get_io_dump(), '--diff']
-    cmd += argv
+    location = None
+    if options.location != None:
+        location = int(options.location)
 
-    # Set environment modules if present
+    n_echo = 0
+    if options.level != None:
+        n_echo = options.level
 
-    cs_exec_environment.set_modules(pkg)
-    cs_exec_environment.source_rcfile(pkg)
+    # Compare files directly (without calling cs_io_dump)
 
-    # Run executable
+    try:
+        results = cs_io_reader.compare_files(args[0], args[1],
+                                             threshold=options.threshold,
+                                             section=options.section,
+                                             location=location,
+                                             n_echo=n_echo)
+    except Exception as e:
+        sys.stderr.write("Error comparing files:\n  %s\n" % str(e))
+        return 1
 
-    return cs_exec_environment.run_command(cmd)
+    return cs_io_reader.print_diff(results, args[0], args[1],
+                                   f_fmt=options.f_format)
 
 #-------------------------------------------------------------------------------
 
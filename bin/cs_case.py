@@ -34,8 +34,10 @@ import os.path
 import platform
 import sys
 import stat
+import threading
 
 import cs_exec_environment
+import cs_run_timings
 
 from cs_case_domain import *
 
@@ -239,6 +241,12 @@ class case:
         # Error reporting
         self.error = ''
 
+        # Timings of run stages
+        self.timings = cs_run_timings.run_timings()
+
+        # Description of the processes distribution among domains
+        self.procs_distribution = []
+
     #---------------------------------------------------------------------------
 
     def print_procs_distribution(self):
@@ -290,6 +298,11 @@ class case:
                     + str(d.n_procs) + ' processes.\n'
                 sys.stdout.write(msg)
 
+        if self.procs_distribution:
+            sys.stdout.write('\n Process distribution:\n')
+            for l in self.procs_distribution:
+                sys.stdout.write('   ' + l + '\n')
+
         sys.stdout.write('\n')
 
     #---------------------------------------------------------------------------
@@ -326,9 +339,9 @@ class case:
             n_procs_tot += np[0]
             n_procs_min += np[1]
 
-        # If no process count is given or everything fits:
+        # If no process count is given:
 
-        if n_procs == None or n_procs == n_procs_tot:
+        if n_procs == None:
             return n_procs_tot
 
         # If process count is given and not sufficient, abort.
@@ -344,6 +357,17 @@ class case:
                 + '   in the toplevel script.'
             raise RunCaseError(err_str)
 
+        # Distribute based on timings of previous runs if available and
+        # requested; otherwise, if everything fits:
+
+        n_procs_hist = self.distribute_procs_history(n_procs)
+
+        if n_procs_hist != None:
+            return n_procs_hist
+
+        elif n_procs == n_procs_tot:
+            return n_procs_tot
+
         # Otherwise, rebalance process counts.
 
         n_passes = 0
@@ -440,6 +464,116 @@ class case:
 
     #---------------------------------------------------------------------------
 
+    def distribute_procs_history(self, n_procs):
+
+        """
+        Distribute processes to coupled domains based on the solver
+        times of previous runs of the case, excluding time spent waiting
+        for other domains, if requested by the
+        CS_PROCS_DISTRIBUTION environment variable or the
+        'procs_distribution' option of the [run] section of the
+        configuration file ('history'; 'weights' by default).
+
+        Domains without timings keep their process count, and Code_Aster
+        domains are not redistributed. Returns the total number of
+        processes if they were distributed, None otherwise (in which case
+        weights are used).
+        """
+
+        mode = os.getenv('CS_PROCS_DISTRIBUTION')
+        if mode == None:
+            config = configparser.ConfigParser()
+            config.read(self.package.get_configfiles())
+            if config.has_option('run', 'procs_distribution'):
+                mode = config.get('run', 'procs_distribution')
+
+        if mode != 'history':
+            return None
+
+        apps = self.domains + self.syr_domains
+        if len(apps) + len(self.ast_domains) < 2:
+            return None
+
+        # Previous runs, most recent first (run ids start with the date)
+
+        n_runs_max = 10
+
+        resu_dir = os.path.dirname(self.result_dir)
+        runs = []
+        for r in sorted(os.listdir(resu_dir), reverse=True):
+            r_dir = os.path.join(resu_dir, r)
+            if r_dir != self.result_dir and os.path.isdir(r_dir):
+                summary = cs_run_timings.read_run_summary(r_dir)
+                if summary and summary.get('n_procs') and not summary.get('error'):
+                    runs.append((r_dir, summary['n_procs']))
+            if len(runs) >= n_runs_max:
+                break
+
+        # Fit cost model of each domain
+
+        costs = []
+        bounds = []
+        modeled = []
+        n_procs_free = n_procs
+
+        for d in apps + self.ast_domains:
+            label = self.domain_label(d)
+            samples = []
+            t_wait = 0.
+            if d in apps:
+                for r_dir, n_procs_r in runs:
+                    d_dir = r_dir
+                    if d.name != None:
+                        d_dir = os.path.join(r_dir, d.name)
+                    t = d.solver_times(d_dir)
+                    if t != None and n_procs_r.get(label):
+                        samples.append((n_procs_r[label], t[0] - t[1]))
+                        t_wait += t[1]
+            cost = cs_run_timings.fit_solver_cost(samples)
+            if cost != None:
+                n_max = d.n_procs_max
+                costs.append(cost)
+                bounds.append((d.n_procs_min, n_max))
+                modeled.append((d, label, len(samples),
+                                t_wait/len(samples)))
+            else:
+                n_procs_free -= d.n_procs
+
+        if not modeled or n_procs_free < sum([b[0] for b in bounds]):
+            self.procs_distribution = \
+                ['processes distributed based on weights '
+                 '(no usable timings from previous runs)']
+            return None
+
+        n_procs_l, t_expected = cs_run_timings.balance_procs(costs,
+                                                             bounds,
+                                                             n_procs_free)
+
+        # Set process counts and record the reasons for this choice
+
+        info = ['processes distributed based on timings of previous runs, '
+                'to minimize expected solver time (%.1f s)' % t_expected]
+
+        for i, (d, label, n_samples, t_wait) in enumerate(modeled):
+            d.set_n_procs(n_procs_l[i])
+            work, overhead = costs[i]
+            info.append('%s: %d processes, expected %.1f s (process time '
+                        'model %.1f s + %.2f s per process, from %d run(s), '
+                        'excluding %.1f s mean coupling wait)'
+                        % (label, n_procs_l[i], work/n_procs_l[i] + overhead,
+                           work, overhead, n_samples, t_wait))
+
+        for d in apps + self.ast_domains:
+            if not d in [m[0] for m in modeled]:
+                info.append('%s: %d processes (no timings)'
+                            % (self.domain_label(d), d.n_procs))
+
+        self.procs_distribution = info
+
+        return n_procs - n_procs_free + sum(n_procs_l)
+
+    #---------------------------------------------------------------------------
+
     def define_exec_dir(self):
         """
         Define execution directory.
@@ -596,6 +730,12 @@ class case:
             s.write('\n')
         s.write(hline)
 
+        if self.procs_distribution:
+            s.write('  Distribution   : ' + self.procs_distribution[0] + '\n')
+            for l in self.procs_distribution[1:]:
+                s.write('    ' + l + '\n')
+            s.write(hline)
+
         if len(self.domains) + len(self.syr_domains) > 1:
             s.write('  Exec. dir.     : ' + self.exec_dir + '\n')
             s.write(hline)
@@ -646,6 +786,91 @@ class case:
 
     #---------------------------------------------------------------------------
 
+    def summary_save_stats(self):
+
+        """
+        Add results saving statistics to summary.
+        """
+
+        stats = {'bytes': 0, 'time': 0., 'renamed': 0, 'cloned': 0, 'copied': 0}
+        for d in self.domains + self.syr_domains:
+            for k in stats:
+                stats[k] += d.save_stats[k]
+
+        s_path = os.path.join(self.result_dir, 'summary')
+        if not os.path.isfile(s_path):
+            s_path = os.path.join(self.exec_dir, 'summary')
+            if not os.path.isfile(s_path):
+                return
+
+        dhline = '========================================================\n'
+
+        s = open(s_path, 'a')
+
+        s.write('  Saved results  : %.1f MiB in %.2f s\n'
+                % (stats['bytes'] / 1048576., stats['time']))
+        s.write('    files        : %d renamed, %d cloned, %d copied\n'
+                % (stats['renamed'], stats['cloned'], stats['copied']))
+        s.write(dhline)
+
+        s.close()
+
+    #---------------------------------------------------------------------------
+
+    def domain_label(self, d):
+
+        """
+        Return the name of a domain for stage timings.
+        """
+
+        if d.name != None:
+            return d.name
+        else:
+            return os.path.basename(self.case_dir)
+
+    #---------------------------------------------------------------------------
+
+    def save_timings(self, results_saved):
+
+        """
+        Write stage timings next to the summary file: in the result
+        directory once results are saved, in the execution directory
+        otherwise (appending to timings of previously run stages).
+        """
+
+        if results_saved or self.exec_dir == self.result_dir:
+            dest_dir = self.result_dir
+        else:
+            dest_dir = self.exec_dir
+
+        src_dirs = []
+        if dest_dir != self.exec_dir:
+            src_dirs.append(self.exec_dir)
+
+        n_procs = {}
+        for d in self.domains + self.syr_domains + self.ast_domains:
+            n_procs[self.domain_label(d)] = d.n_procs
+
+        info = {'run_id': self.run_id,
+                'case': os.path.basename(self.case_dir),
+                'package': self.package.name,
+                'version': self.package.version,
+                'error': self.error,
+                'n_procs': n_procs,
+                'procs_distribution': self.procs_distribution}
+
+        try:
+            self.timings.write(dest_dir, src_dirs, info)
+            for d in src_dirs:
+                for name in (cs_run_timings.json_name,
+                             cs_run_timings.csv_name):
+                    if os.path.isfile(os.path.join(d, name)):
+                        os.remove(os.path.join(d, name))
+        except Exception:
+            pass
+
+    #---------------------------------------------------------------------------
+
     def copy_log(self, name):
         """
         Retrieve single log file from the execution directory
@@ -1491,19 +1716,21 @@ $appli/salome kill `cat $port_log`
 
         need_compile = False
 
-        for d in self.domains:
-            if not hasattr(d, 'needs_compile'):
-                continue
-            if d.needs_compile() == True:
-                if need_compile == False: # Print banner on first pass
-                    need_compile = True
-                    msg = \
-                        " ****************************************\n" \
-                        "  Compiling user subroutines and linking\n" \
-                        " ****************************************\n\n"
-                    sys.stdout.write(msg)
-                    sys.stdout.flush()
-                d.compile_and_link()
+        with self.timings.stage('compile'):
+            for d in self.domains:
+                if not hasattr(d, 'needs_compile'):
+                    continue
+                if d.needs_compile() == True:
+                    if need_compile == False: # Print banner on first pass
+                        need_compile = True
+                        msg = \
+                            " ****************************************\n" \
+                            "  Compiling user subroutines and linking\n" \
+                            " ****************************************\n\n"
+                        sys.stdout.write(msg)
+                        sys.stdout.flush()
+                    with self.timings.stage('compile', self.domain_label(d)):
+                        d.compile_and_link()
 
         # Setup data
         #===========
@@ -1514,16 +1741,10 @@ $appli/salome kill `cat $port_log`
                          ' ****************************\n\n')
         sys.stdout.flush()
 
-        for d in self.domains:
-            d.prepare_data()
-            if len(d.error) > 0:
-                self.error = d.error
-        for d in self.syr_domains:
-            d.prepare_data()
-            if len(d.error) > 0:
-                self.error = d.error
-        for d in self.ast_domains:
-            d.prepare_data()
+        with self.timings.stage('prepare_data'):
+            self.prepare_domains_data()
+
+        for d in self.domains + self.syr_domains + self.ast_domains:
             if len(d.error) > 0:
                 self.error = d.error
 
@@ -1555,6 +1776,72 @@ $appli/salome kill `cat $port_log`
 
     #---------------------------------------------------------------------------
 
+    def prepare_domains_data(self):
+
+        """
+        Prepare data of all domains, concurrently for domains allowing it
+        (others being handled in the calling thread), and report the time
+        used to stage data files.
+        """
+
+        errors = []
+
+        all_domains = self.domains + self.syr_domains + self.ast_domains
+
+        # With concurrent domains, the CPU time of the process is not that
+        # of a given domain, so only wall-clock times are recorded.
+
+        concurrent = False
+        if len(all_domains) > 1:
+            for d in all_domains:
+                if d.threaded_prepare:
+                    concurrent = True
+
+        def _prepare(d):
+            try:
+                with self.timings.stage('prepare_data', self.domain_label(d),
+                                        cpu=not concurrent) as r:
+                    n_bytes = d.stage_stats['bytes']
+                    d.prepare_data()
+                    r['bytes'] = d.stage_stats['bytes'] - n_bytes
+            except Exception:
+                errors.append(sys.exc_info()[1])
+
+        threads = []
+        sequential = []
+
+        for d in all_domains:
+            if d.threaded_prepare and concurrent:
+                t = threading.Thread(target=_prepare, args=(d,))
+                t.start()
+                threads.append(t)
+            else:
+                sequential.append(d)
+
+        for d in sequential:
+            if errors:
+                break
+            _prepare(d)
+
+        for t in threads:
+            t.join()
+
+        if errors:
+            raise errors[0]
+
+        for d in all_domains:
+            s = d.stage_stats
+            n_files = s['cloned'] + s['copied']
+            if n_files > 0:
+                msg = ' Staged %d data file(s) for %s: %.1f MiB in %.2f s' \
+                      ' (%d cloned, %d copied)\n' \
+                      % (n_files, self.domain_label(d), s['bytes'] / 1048576.,
+                         s['time'], s['cloned'], s['copied'])
+                sys.stdout.write(msg)
+        sys.stdout.flush()
+
+    #---------------------------------------------------------------------------
+
     def init_prepared_data(self):
 
         """
@@ -1650,12 +1937,9 @@ $appli/salome kill `cat $port_log`
 
         self.summary_init(exec_env)
 
-        for d in self.domains:
-            d.preprocess()
-            if len(d.error) > 0:
-                self.error = d.error
-        for d in self.syr_domains:
-            d.preprocess()
+        for d in self.domains + self.syr_domains:
+            with self.timings.stage('preprocess', self.domain_label(d)):
+                d.preprocess()
             if len(d.error) > 0:
                 self.error = d.error
 
@@ -1807,11 +2091,13 @@ $appli/salome kill `cat $port_log`
                     except Exception:
                         pass
 
-        for d in self.domains:
-            d.copy_results()
+        for d in self.domains + self.syr_domains:
+            with self.timings.stage('save_results', self.domain_label(d)) as r:
+                n_bytes = d.save_stats['bytes']
+                d.copy_results()
+                r['bytes'] = d.save_stats['bytes'] - n_bytes
 
-        for d in self.syr_domains:
-            d.copy_results()
+        self.summary_save_stats()
 
         # Remove directories if empty
 
@@ -1948,14 +2234,19 @@ $appli/salome kill `cat $port_log`
                 self.init_prepared_data()
 
             if stages['initialize'] and  retcode == 0:
-                retcode = self.preprocess(n_procs,
-                                          n_threads,
-                                          mpiexec_options)
+                with self.timings.stage('preprocess'):
+                    retcode = self.preprocess(n_procs,
+                                              n_threads,
+                                              mpiexec_options)
             if stages['run_solver'] == True and retcode == 0:
-                self.run_solver()
+                with self.timings.stage('solver'):
+                    self.run_solver()
 
             if stages['save_results'] == True:
-                self.save_results()
+                with self.timings.stage('save_results') as r:
+                    self.save_results()
+                    for d in self.domains + self.syr_domains:
+                        r['bytes'] += d.save_stats['bytes']
                 self.clear_exec_dir_stamp()
 
         finally:
@@ -1966,6 +2257,8 @@ $appli/salome kill `cat $port_log`
                                          'finished',
                                          'failed'), None)
 
+            self.save_timings(stages['save_results'])
+
         # Standard or error exit
 
         if len(self.error) > 0:
@@ -35,8 +35,13 @@ import os.path
 import sys
 import shutil
 import stat
+import tempfile
+import threading
+import time
+import unittest
 
 import cs_compile
+import cs_run_timings
 import cs_xml_reader
 
 from cs_exec_environment import run_command, source_shell_script
@@ -76,6 +81,137 @@ def make_clean_dir(path):
 
 #-------------------------------------------------------------------------------
 
+def clone_file(src, dest):
+    """
+    Try to clone a file (copy-on-write reflink, on file systems
+    supporting it), returning True on success, False otherwise.
+    """
+
+    if not sys.platform.startswith('linux'):
+        return False
+
+    try:
+        import fcntl
+        FICLONE = 0x40049409
+        fs = open(src, 'rb')
+        fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    except Exception:
+        return False
+
+    retval = True
+    try:
+        fcntl.ioctl(fd, FICLONE, fs.fileno())
+    except Exception:
+        retval = False
+
+    os.close(fd)
+    fs.close()
+
+    if retval:
+        shutil.copystat(src, dest)
+    else:
+        os.remove(dest)
+
+    return retval
+
+#-------------------------------------------------------------------------------
+
+def copy_file_chunked(src, dest, chunk_size = 1 << 24):
+    """
+    Copy a file by large chunks (using in-kernel copies when available),
+    preserving its permissions and times.
+    """
+
+    fs = open(src, 'rb')
+    fd = open(dest, 'wb')
+
+    try:
+        copy_file_range = getattr(os, 'copy_file_range', None)
+        n = 1
+        if copy_file_range != None:
+            try:
+                while n > 0:
+                    n = copy_file_range(fs.fileno(), fd.fileno(), chunk_size)
+            except OSError:
+                fs.seek(0)
+                fd.seek(0)
+                fd.truncate()
+                copy_file_range = None
+        if copy_file_range == None:
+            shutil.copyfileobj(fs, fd, chunk_size)
+    finally:
+        fd.close()
+        fs.close()
+
+    shutil.copystat(src, dest)
+
+#-------------------------------------------------------------------------------
+
+def clone_or_copy_file(src, dest):
+    """
+    Clone a file (reflink) when possible, and copy it by chunks if not.
+    """
+
+    if not clone_file(src, dest):
+        copy_file_chunked(src, dest)
+
+#-------------------------------------------------------------------------------
+
+def save_file(src, dest, purge = False):
+    """
+    Save a file to a destination, removing the source if purge is True.
+    If purge is True, the file is simply renamed when possible; otherwise,
+    it is cloned (reflink) when possible, and copied by chunks if not.
+    Hard links are not used, as files of the (kept) execution directory
+    would then share their data with saved results.
+    Return the method used ('renamed', 'cloned' or 'copied').
+    """
+
+    if purge and not os.path.islink(src):
+        try:
+            os.rename(src, dest)
+            return 'renamed'
+        except Exception:
+            pass
+
+    if os.path.islink(dest):
+        os.remove(dest)
+
+    if clone_file(src, dest):
+        method = 'cloned'
+    else:
+        copy_file_chunked(src, dest)
+        method = 'copied'
+
+    if purge:
+        os.remove(src)
+
+    return method
+
+#-------------------------------------------------------------------------------
+
+def stage_file(src, dest):
+    """
+    Stage a data file to the execution directory.
+    Files are cloned (reflink) when possible, and copied by chunks
+    otherwise. As for saved results, hard links are not used, as files
+    of the execution directory (which may be modified by user scripts,
+    and are saved with results) would then share their data with the
+    original data files.
+    Return the method used ('cloned' or 'copied').
+    """
+
+    if os.path.islink(dest) or os.path.isfile(dest):
+        os.remove(dest)
+
+    if clone_file(src, dest):
+        return 'cloned'
+
+    copy_file_chunked(src, dest)
+    return 'copied'
+
+#-------------------------------------------------------------------------------
+
 class RunCaseError(Exception):
     """Base class for exception handling."""
 
@@ -152,6 +288,19 @@ class base_domain:
         # Error reporting
         self.error = ''
 
+        # Results saving and data staging statistics
+
+        self.save_stats = {'bytes': 0, 'time': 0.,
+                           'renamed': 0, 'cloned': 0, 'copied': 0}
+        self.stage_stats = {'bytes': 0, 'time': 0.,
+                            'cloned': 0, 'copied': 0}
+
+        # Can data be prepared in a thread, concurrently with other domains
+        # (i.e. without changing the process's working directory
+        # or environment) ?
+
+        self.threaded_prepare = False
+
     #---------------------------------------------------------------------------
 
     def set_case_dir(self, case_dir, staging_dir = None):
@@ -235,12 +384,12 @@ class base_domain:
         if src == dest:
             return
 
+        t0 = time.time()
+
         # Copy single file
 
         if os.path.isfile(src):
-            shutil.copy2(src, dest)
-            if purge:
-                os.remove(src)
+            self.__save_files([(src, dest)], purge)
 
         # Copy single directory (possibly recursive)
         # Unkike os.path.copytree, the destination directory
@@ -248,22 +397,125 @@ class base_domain:
 
         elif os.path.isdir(src):
 
-            if not os.path.isdir(dest):
-                os.mkdir(dest)
-            l = os.listdir(src)
-            for f in l:
-                f_src = os.path.join(src, f)
-                f_dest = os.path.join(dest, f)
-                if os.path.isfile(f_src):
-                    shutil.copy2(f_src, f_dest)
-                elif os.path.isdir(f_src):
-                    self.copy_result(f_src, f_dest)
+            files = []
+            for root, dirs, f_names in os.walk(src):
+                for f in f_names:
+                    f_src = os.path.join(root, f)
+                    if os.path.isfile(f_src):
+                        files.append(f_src)
+
+            # Files of a linked directory (such as mesh_input from a previous
+            # run) may be referenced by other runs, so they are only copied,
+            # and the link removed.
+
+            linked = os.path.islink(src)
+
+            # Whole directories may simply be renamed
+
+            renamed = False
+            if purge and not os.path.exists(dest) and not linked:
+                n_bytes = 0
+                for f in files:
+                    n_bytes += os.path.getsize(f)
+                try:
+                    os.rename(src, dest)
+                    renamed = True
+                    self.save_stats['bytes'] += n_bytes
+                    self.save_stats['renamed'] += len(files)
+                except Exception:
+                    pass
+
+            if not renamed:
+                pairs = []
+                for f_src in files:
+                    f_dest = os.path.join(dest, os.path.relpath(f_src, src))
+                    d = os.path.dirname(f_dest)
+                    if not os.path.isdir(d):
+                        os.makedirs(d)
+                    pairs.append((f_src, f_dest))
+                if not os.path.isdir(dest):
+                    os.mkdir(dest)
+
+                self.__save_files(pairs, purge and not linked)
+
+                if purge:
+                    if linked:
+                        os.remove(src)
+                    else:
+                        shutil.rmtree(src)
+
+        self.save_stats['time'] += time.time() - t0
 
-            if purge:
-                if os.path.islink(src):
-                    os.remove(f)
-                else:
-                    shutil.rmtree(src)
+    #---------------------------------------------------------------------------
+
+    def __save_files(self, pairs, purge):
+        """
+        Save files given as (source, destination) pairs, using several
+        threads when files need to be copied, and update statistics.
+        """
+
+        def _save(src, dest):
+            return save_file(src, dest, purge)
+
+        self.__transfer_files(pairs, _save, self.save_stats)
+
+    #---------------------------------------------------------------------------
+
+    def __transfer_files(self, pairs, transfer, stats, n_threads=4):
+        """
+        Transfer files given as (source, destination) pairs, using several
+        threads, with a function returning the method used, and update
+        the associated statistics.
+        """
+
+        lock = threading.Lock()
+        errors = []
+        pairs = list(pairs)
+
+        def _transfer():
+            while True:
+                with lock:
+                    if not pairs or errors:
+                        return
+                    src, dest = pairs.pop(0)
+                try:
+                    n_bytes = os.path.getsize(src)
+                    method = transfer(src, dest)
+                except Exception:
+                    with lock:
+                        errors.append(sys.exc_info()[1])
+                    return
+                with lock:
+                    stats['bytes'] += n_bytes
+                    stats[method] += 1
+
+        n_threads = min(n_threads, len(pairs))
+
+        if n_threads < 2:
+            _transfer()
+        else:
+            threads = []
+            for i in range(n_threads):
+                t = threading.Thread(target=_transfer)
+                t.start()
+                threads.append(t)
+            for t in threads:
+                t.join()
+
+        if errors:
+            raise errors[0]
+
+    #---------------------------------------------------------------------------
+
+    def stage_files(self, pairs):
+        """
+        Stage data files given as (source, destination) pairs to the
+        execution directory, using several threads, and update statistics.
+        """
+
+        t0 = time.time()
+        self.__transfer_files(pairs, stage_file, self.stage_stats)
+        self.stage_stats['time'] += time.time() - t0
 
     #---------------------------------------------------------------------------
 
@@ -309,6 +561,17 @@ class base_domain:
 
     #---------------------------------------------------------------------------
 
+    def solver_times(self, result_dir):
+        """
+        Return the elapsed time of the solver and the time spent waiting
+        for coupled domains logged in a previous result directory of
+        this domain, as a tuple, or None if not available.
+        """
+
+        return None
+
+    #---------------------------------------------------------------------------
+
     def solver_command(self, **kw):
         """
         Returns a tuple indicating the solver's working directory,
@@ -480,6 +743,15 @@ class domain(base_domain):
                 execfile(user_scripts, locals(), locals())
                 self.user_locals = locals()
 
+        # Data may be prepared concurrently with other domains, unless
+        # a user function (which might change the working directory)
+        # is called at this stage.
+
+        self.threaded_prepare = True
+        if self.user_locals:
+            if 'domain_prepare_data_add' in self.user_locals.keys():
+                self.threaded_prepare = False
+
         # We may now parse the optional XML parameter file
         # now that its path may be built and checked.
 
@@ -590,6 +862,8 @@ class domain(base_domain):
             log_name = os.path.join(self.exec_dir, 'compile.log')
             log = open(log_name, 'w')
 
+            n_jobs = cs_compile.get_compile_jobs(self.package)
+
             retval = cs_compile.compile_and_link(self.package_compute,
                                                  exec_src,
                                                  self.exec_dir,
@@ -599,7 +873,8 @@ class domain(base_domain):
                                                  self.compile_libs,
                                                  keep_going=True,
                                                  stdout=log,
-                                                 stderr=log)
+                                                 stderr=log,
+                                                 n_jobs=n_jobs)
 
             log.close()
 
@@ -636,13 +911,16 @@ class domain(base_domain):
         if self.package.guiname in dir_files:
             dir_files.remove(self.package.guiname)
 
+        pairs = []
         for f in dir_files:
             src = os.path.join(self.data_dir, f)
             if os.path.isfile(src):
-                shutil.copy2(src, os.path.join(self.exec_dir, f))
+                pairs.append((src, os.path.join(self.exec_dir, f)))
                 if f == 'cs_user_scripts.py':  # Copy user script to results now
                     shutil.copy2(src,  os.path.join(self.result_dir, f))
 
+        self.stage_files(pairs)
+
         if not self.exec_solver:
             return
 
@@ -742,7 +1020,17 @@ class domain(base_domain):
             destdir = 'mesh_input'
             make_clean_dir(destdir)
 
-        # Run once per mesh
+        # Preprocessor output cache
+
+        cache = None
+        cache_dir = cs_compile.get_cache_dir(self.package, 'mesh_cache',
+                                             'CS_MESH_CACHE_DIR')
+        if cache_dir != None:
+            cache = cs_compile.compile_cache(cache_dir)
+
+        # Build commands (one per mesh)
+
+        jobs = []
 
         for m in self.meshes:
 
@@ -774,31 +1062,64 @@ class domain(base_domain):
 
             # Build command
 
-            cmd = [self.package.get_preprocessor()]
+            preprocessor = self.package.get_preprocessor()
+            cmd = [preprocessor]
 
+            opts = []
             if (type(m) == tuple):
                 for opt in m[1:]:
-                    cmd.append(opt)
+                    opts.append(opt)
+            cmd += opts
 
             if (mesh_id != None):
                 mesh_id += 1
-                cmd = cmd + ['--log', 'preprocessor_%02d.log' % (mesh_id)]
-                cmd = cmd + ['--out', os.path.join('mesh_input',
-                                                   'mesh_%02d' % (mesh_id))]
+                log_name = 'preprocessor_%02d.log' % (mesh_id)
+                out_name = os.path.join('mesh_input', 'mesh_%02d' % (mesh_id))
+                cmd = cmd + ['--log', log_name]
+                cmd = cmd + ['--out', out_name]
             else:
+                log_name = 'preprocessor.log'
+                out_name = 'mesh_input'
                 cmd = cmd + ['--log']
-                cmd = cmd + ['--out', 'mesh_input']
+                cmd = cmd + ['--out', out_name]
 
             cmd.append(mesh_path)
 
-            # Run command
-
-            retcode = run_command(cmd, pkg=self.package)
-
-            if retcode != 0:
+            job = {'cmd': cmd, 'files': [out_name, log_name], 'key': None}
+
+            # Use cached output when the mesh, options and preprocessor
+            # are unchanged (the output is cloned when possible, and copied
+            # otherwise, so that results never reference the cache).
+
+            if cache != None:
+                try:
+                    st = os.stat(preprocessor)
+                    job['key'] = cache.key([self.package.version,
+                                            preprocessor, st.st_size,
+                                            st.st_mtime,
+                                            cache.file_hash(mesh_path)]
+                                           + opts)
+                except Exception:
+                    pass
+                if job['key'] and cache.get(job['key'], job['files'],
+                                            ['mesh_input', 'preprocessor.log'],
+                                            copy=clone_or_copy_file):
+                    sys.stdout.write('Using cached preprocessor output for '
+                                     + m0 + '\n')
+                    continue
+
+            jobs.append(job)
+
+        # Run commands, concurrently if there are multiple meshes
+
+        retcode = self.__run_preprocessor_jobs(jobs)
+
+        for job in jobs:
+            if job.get('retcode', 0) != 0:
+                retcode = job['retcode']
                 err_str = \
                     'Error running the preprocessor.\n' \
-                    'Check the preprocessor.log file for details.\n\n'
+                    'Check the ' + job['files'][1] + ' file for details.\n\n'
                 sys.stderr.write(err_str)
 
                 self.exec_solver = False
@@ -807,6 +1128,10 @@ class domain(base_domain):
 
                 break
 
+            elif cache != None and job['key'] and 'retcode' in job:
+                cache.put(job['key'], job['files'],
+                          ['mesh_input', 'preprocessor.log'])
+
         # Revert to initial directory
 
         if cur_dir != self.exec_dir:
@@ -816,6 +1141,78 @@ class domain(base_domain):
 
     #---------------------------------------------------------------------------
 
+    def __run_preprocessor_jobs(self, jobs):
+        """
+        Run preprocessor commands, using up to the number of available
+        processors. The output of each command is written once it is
+        finished, so as not to be interleaved.
+        """
+
+        retcode = 0
+
+        n_threads = min(len(jobs), cs_compile.available_procs())
+
+        if n_threads < 2:
+            for job in jobs:
+                job['retcode'] = run_command(job['cmd'], pkg=self.package)
+                if job['retcode'] != 0:
+                    retcode = job['retcode']
+                    break
+            return retcode
+
+        # Modify the PATH once for all commands for relocatable installations
+
+        pkg = self.package
+        saved_path = None
+        if pkg.config.features['relocatable'] == "yes":
+            if sys.platform.startswith("win"):
+                sep = ";"
+            else:
+                sep = ":"
+            saved_path = os.environ['PATH']
+            os.environ['PATH'] = pkg.get_dir('bindir') + sep + saved_path
+            pkg = None
+
+        lock = threading.Lock()
+        pending = list(jobs)
+
+        def _run():
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    job = pending.pop(0)
+                f = tempfile.TemporaryFile(mode='w+')
+                try:
+                    job['retcode'] = run_command(job['cmd'], pkg=pkg,
+                                                 stdout=f, stderr=f)
+                except BaseException:
+                    job['retcode'] = 1
+                f.seek(0)
+                with lock:
+                    sys.stdout.write(f.read())
+                    sys.stdout.flush()
+                f.close()
+
+        threads = []
+        for i in range(n_threads):
+            t = threading.Thread(target=_run)
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+
+        if saved_path != None:
+            os.environ['PATH'] = saved_path
+
+        for job in jobs:
+            if job['retcode'] != 0:
+                retcode = job['retcode']
+
+        return retcode
+
+    #---------------------------------------------------------------------------
+
     def solver_command(self, **kw):
         """
         Returns a tuple indicating the solver's working directory,
@@ -977,6 +1374,17 @@ class domain(base_domain):
         if self.exec_solver:
             s.write('    solver       : ' + self.solver_path + '\n')
 
+    #---------------------------------------------------------------------------
+
+    def solver_times(self, result_dir):
+        """
+        Return the elapsed time of the solver and the time spent waiting
+        for coupled domains logged in a previous result directory of
+        this domain, as a tuple, or None if not available.
+        """
+
+        return cs_run_timings.read_solver_times(result_dir)
+
 #-------------------------------------------------------------------------------
 
 # SYRTHES 4 coupling
@@ -1527,6 +1935,102 @@ class aster_domain(base_domain):
         if self.param:
             s.write('    Code_Aster   : ' + self.param + '\n')
 
+#-------------------------------------------------------------------------------
+# SaveFiles test case
+#-------------------------------------------------------------------------------
+
+class SaveFilesTestCase(unittest.TestCase):
+    """
+    Test saving of results to the results directory.
+    """
+
+    def setUp(self):
+        """This method is executed before all 'check' methods."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.domain = base_domain(None)
+        self.domain.exec_dir = os.path.join(self.tmp_dir, 'exec')
+        self.domain.result_dir = os.path.join(self.tmp_dir, 'result')
+        os.mkdir(self.domain.exec_dir)
+        os.mkdir(self.domain.result_dir)
+
+    def tearDown(self):
+        """This method is executed after all 'check' methods."""
+        shutil.rmtree(self.tmp_dir)
+
+    def __write(self, path, text):
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        f = open(path, 'w')
+        f.write(text)
+        f.close()
+
+    def __read(self, path):
+        f = open(path)
+        text = f.read()
+        f.close()
+        return text
+
+    def checkCopyResultPurge(self):
+        """Check whether a directory is moved to the results directory"""
+        src = os.path.join(self.domain.exec_dir, 'mesh_input')
+        self.__write(os.path.join(src, 'mesh_input_1'), 'mesh 1')
+
+        self.domain.copy_result('mesh_input', purge=True)
+
+        dest = os.path.join(self.domain.result_dir, 'mesh_input')
+        assert not os.path.exists(src), \
+            'Could not purge directory in copy_result'
+        assert self.__read(os.path.join(dest, 'mesh_input_1')) == 'mesh 1', \
+            'Could not save directory in copy_result'
+
+    def checkCopyResultPurgeLinkedDir(self):
+        """Check whether the target of a linked directory is kept"""
+        target = os.path.join(self.tmp_dir, 'previous', 'mesh_input')
+        self.__write(os.path.join(target, 'mesh_input_1'), 'mesh 1')
+        self.__write(os.path.join(target, 'sub', 'mesh_input_2'), 'mesh 2')
+        src = os.path.join(self.domain.exec_dir, 'mesh_input')
+        os.symlink(target, src)
+
+        self.domain.copy_result('mesh_input', purge=True)
+
+        dest = os.path.join(self.domain.result_dir, 'mesh_input')
+        assert not os.path.lexists(src), \
+            'Could not remove linked directory in copy_result'
+        assert not os.path.islink(dest), \
+            'Linked directory saved as link in copy_result'
+        for name, text in (('mesh_input_1', 'mesh 1'),
+                           (os.path.join('sub', 'mesh_input_2'), 'mesh 2')):
+            assert self.__read(os.path.join(dest, name)) == text, \
+                'Could not save linked directory in copy_result'
+            assert self.__read(os.path.join(target, name)) == text, \
+                'Target of linked directory modified by copy_result'
+
+    def checkStageFiles(self):
+        """Check whether staged data files are independent of originals"""
+        src = os.path.join(self.tmp_dir, 'DATA', 'restart')
+        self.__write(src, 'x' * (2 << 20))
+        dest = os.path.join(self.domain.exec_dir, 'restart')
+
+        self.domain.stage_files([(src, dest)])
+
+        assert os.stat(dest).st_nlink == 1, \
+            'Data file linked by stage_files'
+        self.__write(dest, 'modified')
+        assert self.__read(src) == 'x' * (2 << 20), \
+            'Data file modified through staged file'
+
+
+def suite():
+    """unittest function"""
+    testSuite = unittest.makeSuite(SaveFilesTestCase, "check")
+    return testSuite
+
+
+def runTest():
+    """unittest function"""
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
+
 #-------------------------------------------------------------------------------
 # End
 #-------------------------------------------------------------------------------
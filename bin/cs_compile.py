@@ -23,10 +23,20 @@
 
 #-------------------------------------------------------------------------------
 
+try:
+    import ConfigParser  # Python2
+    configparser = ConfigParser
+except Exception:
+    import configparser  # Python3
+
 import fnmatch
+import hashlib
 import os
+import re
+import shutil
 import sys
 import tempfile
+import threading
 
 from optparse import OptionParser
 
@@ -67,6 +77,11 @@ def process_cmd_line(argv, pkg):
                       action="store_true",
                       help="continue even if errors are encountered")
 
+    parser.add_option("-j", "--jobs", dest="n_jobs", type="int",
+                      metavar="<n_jobs>",
+                      help="number of concurrent compilation jobs "
+                      + "(default: number of available processors)")
+
     parser.add_option("-s", "--source", dest="src_dir", type="string",
                       metavar="<src_dir>",
                       help="choose source file directory")
@@ -98,6 +113,7 @@ def process_cmd_line(argv, pkg):
     parser.set_defaults(test_mode=False)
     parser.set_defaults(force_link=False)
     parser.set_defaults(keep_going=False)
+    parser.set_defaults(n_jobs=None)
     parser.set_defaults(src_dir=os.getcwd())
     parser.set_defaults(dest_dir=os.getcwd())
     parser.set_defaults(version="")
@@ -129,7 +145,7 @@ def process_cmd_line(argv, pkg):
 
     return options.test_mode, options.force_link, options.keep_going, \
            src_dir, dest_dir, options.version, options.cflags, \
-           options.cxxflags, options.fcflags, options.libs
+           options.cxxflags, options.fcflags, options.libs, options.n_jobs
 
 #-------------------------------------------------------------------------------
 
@@ -147,6 +163,245 @@ def files_to_compile(src_dir):
 
     return src_files
 
+#-------------------------------------------------------------------------------
+
+def available_procs():
+    """
+    Return the number of processors available for compilation jobs.
+    """
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except Exception:
+        pass
+
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except Exception:
+        return 1
+
+#-------------------------------------------------------------------------------
+
+def get_compile_jobs(pkg):
+    """
+    Return the number of concurrent compilation jobs for runs, defined by
+    the CS_COMPILE_JOBS environment variable, or the compile_jobs option
+    of the [run] section of the configuration file (None if not defined,
+    in which case all available processors are used).
+    """
+
+    n_jobs = os.getenv('CS_COMPILE_JOBS')
+
+    if n_jobs == None and pkg != None:
+        config = configparser.ConfigParser()
+        config.read(pkg.get_configfiles())
+        if config.has_option('run', 'compile_jobs'):
+            n_jobs = config.get('run', 'compile_jobs')
+
+    try:
+        return max(1, int(n_jobs))
+    except Exception:
+        return None
+
+#-------------------------------------------------------------------------------
+
+_re_f_module = re.compile(r'^\s*module\s+(\w+)\s*(?:!.*)?$',
+                          re.IGNORECASE | re.MULTILINE)
+_re_f_use = re.compile(r'^\s*use\s*(?:,\s*\w+\s*::)?\s*(\w+)',
+                       re.IGNORECASE | re.MULTILINE)
+
+def fortran_module_dependencies(f_files):
+    """
+    Return a dictionary associating to each Fortran file the list of
+    other files of f_files defining the modules it uses, and a dictionary
+    associating to each file the list of modules it defines.
+    """
+
+    defined = {}
+    used = {}
+
+    for f in f_files:
+        try:
+            fp = open(f, 'rb')
+            s = fp.read().decode('latin-1')
+            fp.close()
+        except Exception:
+            s = ''
+        for m in _re_f_module.findall(s):
+            defined[m.lower()] = f
+        used[f] = set([m.lower() for m in _re_f_use.findall(s)])
+
+    deps = {}
+    mods = {}
+    for f in f_files:
+        deps[f] = []
+        mods[f] = []
+        for m in used[f]:
+            if m in defined and defined[m] != f and not defined[m] in deps[f]:
+                deps[f].append(defined[m])
+    for m in sorted(defined.keys()):
+        mods[defined[m]].append(m)
+
+    return deps, mods
+
+#-------------------------------------------------------------------------------
+
+def get_cache_dir(pkg, option='compile_cache', env_var='CS_COMPILE_CACHE_DIR'):
+    """
+    Return a cache directory (by default, the compilation cache directory),
+    defined by an environment variable, or an option of the [run] section
+    of the configuration file (None if not defined).
+    """
+
+    cache_dir = os.getenv(env_var)
+
+    if cache_dir == None and pkg != None:
+        config = configparser.ConfigParser()
+        config.read(pkg.get_configfiles())
+        if config.has_option('run', option):
+            cache_dir = config.get('run', option)
+
+    if cache_dir:
+        cache_dir = os.path.expanduser(cache_dir)
+        cache_dir = os.path.abspath(os.path.expandvars(cache_dir))
+    else:
+        cache_dir = None
+
+    return cache_dir
+
+#===============================================================================
+# Class used to cache compilation results
+#===============================================================================
+
+class compile_cache(object):
+    """
+    Cache of files (such as object files and executables), indexed by
+    a hash of their sources, generating command and package files.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize cache object.
+        """
+        self.path = path
+
+    #---------------------------------------------------------------------------
+
+    def key(self, parts, files=[]):
+        """
+        Return a key built from a list of strings and the contents
+        of a list of files.
+        """
+        h = hashlib.sha256()
+        for p in parts:
+            h.update((str(p) + '\0').encode('utf-8'))
+        for f in files:
+            fp = open(f, 'rb')
+            while True:
+                b = fp.read(1 << 16)
+                if not b:
+                    break
+                h.update(b)
+            fp.close()
+            h.update(b'\0')
+        return h.hexdigest()
+
+    #---------------------------------------------------------------------------
+
+    def file_hash(self, path):
+        """
+        Return a hash of the contents of a file. Hashes of large files
+        are stored in the cache, indexed by the file's path, size and
+        modification time, so as not to be recomputed.
+        """
+        st = os.stat(path)
+        s_key = self.key([os.path.realpath(path), st.st_size, st.st_mtime])
+        s_path = os.path.join(self.path, 'hashes', s_key)
+
+        try:
+            fp = open(s_path)
+            h = fp.read().strip()
+            fp.close()
+            if h:
+                return h
+        except Exception:
+            pass
+
+        h = self.key([], [path])
+
+        try:
+            d = os.path.dirname(s_path)
+            if not os.path.isdir(d):
+                os.makedirs(d)
+            fd, tmp = tempfile.mkstemp(dir=d)
+            os.write(fd, h.encode('utf-8'))
+            os.close(fd)
+            os.rename(tmp, s_path)
+        except Exception:
+            pass
+
+        return h
+
+    #---------------------------------------------------------------------------
+
+    def __entry_dir(self, key):
+        """
+        Return the directory associated with a key.
+        """
+        return os.path.join(self.path, key[:2], key)
+
+    #---------------------------------------------------------------------------
+
+    def get(self, key, files, names=None, copy=shutil.copy2):
+        """
+        Copy cached files associated with a key to the given paths
+        (whose base names, or the given names, identify the files in the
+        cache entry), using the given copy function.
+        Files are never linked, so that they may be modified or saved
+        with results independently of the cache.
+        Return True if all files were found, False otherwise.
+        """
+        d = self.__entry_dir(key)
+        if names == None:
+            names = [os.path.basename(f) for f in files]
+        for n in names:
+            if not os.path.isfile(os.path.join(d, n)):
+                return False
+        try:
+            for f, n in zip(files, names):
+                c = os.path.join(d, n)
+                if os.path.lexists(f):
+                    os.remove(f)
+                copy(c, f)
+        except Exception:
+            return False
+        return True
+
+    #---------------------------------------------------------------------------
+
+    def put(self, key, files, names=None):
+        """
+        Store files in the cache entry associated with a key (under their
+        base names, or the given names).
+        Files are copied to temporary names first, then renamed, so that
+        concurrent uses of the cache only see complete files.
+        """
+        d = self.__entry_dir(key)
+        if names == None:
+            names = [os.path.basename(f) for f in files]
+        try:
+            if not os.path.isdir(d):
+                os.makedirs(d)
+            for f, n in zip(files, names):
+                dest = os.path.join(d, n)
+                fd, tmp = tempfile.mkstemp(dir=d)
+                os.close(fd)
+                shutil.copy2(f, tmp)
+                os.rename(tmp, dest)
+        except Exception:
+            pass
+
 #===============================================================================
 # Class used to manage compilation
 #===============================================================================
@@ -160,6 +415,11 @@ class cs_compile(object):
         """
         self.pkg = package
 
+        self.cache = None
+        cache_dir = get_cache_dir(package)
+        if cache_dir != None:
+            self.cache = compile_cache(cache_dir)
+
     #---------------------------------------------------------------------------
 
     def get_compiler(self, compiler):
@@ -315,9 +575,14 @@ class cs_compile(object):
     def compile_src(self, src_list=None,
                     opt_cflags=None, opt_cxxflags=None, opt_fcflags=None,
                     keep_going=False,
-                    stdout=sys.stdout, stderr=sys.stderr):
+                    stdout=sys.stdout, stderr=sys.stderr,
+                    n_jobs=None):
         """
         Compilation function.
+
+        Up to n_jobs files are compiled concurrently (using all available
+        processors if n_jobs is None); Fortran files using modules defined
+        in other files are compiled once those are compiled.
         """
         retval = 0
 
@@ -351,11 +616,11 @@ class cs_compile(object):
             f_include_dirs.append(os.path.dirname(f))
         f_include_dirs = sorted(set(cxx_include_dirs))
 
-        # Compile files
+        # Build compilation commands
+
+        jobs = []
 
         for f in c_files:
-            if (retval != 0 and not keep_going):
-                break
             cmd = [self.get_compiler('cc')]
             if opt_cflags != None:
                 cmd += separate_args(opt_cflags)
@@ -368,14 +633,9 @@ class cs_compile(object):
             cmd += self.get_flags('cppflags')
             cmd += separate_args(pkg.config.flags['cflags'])
             cmd += ["-c", f]
-            if run_command(cmd, pkg=pkg, echo=True,
-                           stdout=stdout, stderr=stderr) != 0:
-                retval = 1
-            o_files.append(self.obj_name(f))
+            jobs.append({'src': f, 'cmd': cmd, 'obj': self.obj_name(f)})
 
         for f in cxx_files:
-            if (retval != 0 and not keep_going):
-                break
             cmd = [self.get_compiler('cxx')]
             if opt_cxxflags != None:
                 cmd += separate_args(opt_cxxflags)
@@ -387,14 +647,11 @@ class cs_compile(object):
             cmd += self.get_flags('cppflags')
             cmd += separate_args(pkg.config.flags['cxxflags'])
             cmd += ["-c", f]
-            if run_command(cmd, pkg=pkg, echo=True,
-                           stdout=stdout, stderr=stderr) != 0:
-                retval = 1
-            o_files.append(self.obj_name(f))
+            jobs.append({'src': f, 'cmd': cmd, 'obj': self.obj_name(f)})
+
+        f_deps, f_mods = fortran_module_dependencies(f_files)
 
         for f in f_files:
-            if (retval != 0 and not keep_going):
-                break
             cmd = [self.get_compiler('fc')]
             f_base = os.path.basename(f)
             o_name = self.obj_name(f)
@@ -427,15 +684,232 @@ class cs_compile(object):
                 cmd += [pkg.config.fcmodinclude, pkg.get_dir('pkgincludedir')]
             cmd += separate_args(pkg.config.flags['fcflags'])
             cmd += ["-c", f]
-            if run_command(cmd, pkg=pkg, echo=True,
-                           stdout=stdout, stderr=stderr) != 0:
-                retval = 1
-            o_files.append(o_name)
+            jobs.append({'src': f, 'cmd': cmd, 'obj': o_name,
+                         'deps': f_deps[f],
+                         'mods': [m + '.mod' for m in f_mods[f]]})
+
+        # Use cached object files when possible
+
+        if self.cache != None:
+            self.__cache_keys(jobs, h_files + hxx_files)
+            for j in jobs:
+                if self.cache.get(j['key'], [j['obj']] + j.get('mods', [])):
+                    stdout.write('Using cached ' + j['obj'] + ' for '
+                                 + os.path.basename(j['src']) + '\n')
+                    j['retval'] = 0
+                    j['cached'] = True
+
+        # Compile files
+
+        retval = self.__run_jobs(jobs, keep_going, n_jobs, stdout, stderr)
+
+        if self.cache != None:
+            for j in jobs:
+                if j.get('retval') == 0 and not 'cached' in j:
+                    self.cache.put(j['key'], [j['obj']] + j.get('mods', []))
+
+        for j in jobs:
+            if 'retval' in j:
+                o_files.append(j['obj'])
 
         return retval, o_files
 
     #---------------------------------------------------------------------------
 
+    def __pkg_files_stamp(self, dirs, prefixes=None):
+        """
+        Return a string identifying the state of package files
+        (headers, Fortran modules or libraries) in the given directories,
+        based on their names, sizes and modification times.
+        If prefixes are given, only files of the given directories (not
+        recursively) whose names start with one of them are considered.
+        """
+        l = []
+        for d in dirs:
+            for root, subdirs, files in os.walk(d):
+                if prefixes != None:
+                    del subdirs[:]
+                    files = [f for f in files
+                             if [p for p in prefixes if f.startswith(p)]]
+                subdirs.sort()
+                for f in sorted(files):
+                    p = os.path.join(root, f)
+                    try:
+                        st = os.stat(p)
+                        l.append('%s:%d:%d' % (p, st.st_size, int(st.st_mtime)))
+                    except Exception:
+                        pass
+        return ';'.join(l)
+
+    #---------------------------------------------------------------------------
+
+    def __cache_keys(self, jobs, header_files):
+        """
+        Determine the cache key of each compilation job, based on its
+        command (independent of the source directory), the contents of its
+        source, user headers and used user modules, and package headers.
+        """
+        pkg_stamp = self.__pkg_files_stamp([self.pkg.get_dir('pkgincludedir')])
+
+        src_dirs = set()
+        for j in jobs:
+            src_dirs.add(os.path.dirname(j['src']))
+        for f in header_files:
+            src_dirs.add(os.path.dirname(f))
+
+        # Fortran jobs depend on all (direct or indirect) used user modules
+
+        f_deps = {}
+        for j in jobs:
+            if 'deps' in j:
+                f_deps[j['src']] = j['deps']
+
+        for j in jobs:
+            cmd = []
+            for a in j['cmd']:
+                if a == j['src']:
+                    a = os.path.basename(a)
+                elif a in src_dirs:
+                    a = '.'
+                cmd.append(a)
+            files = [j['src']]
+            if j['src'] in f_deps:
+                deps = list(f_deps[j['src']])
+                i = 0
+                while i < len(deps):
+                    for d in f_deps.get(deps[i], []):
+                        if not d in deps and d != j['src']:
+                            deps.append(d)
+                    i += 1
+                files += deps
+            else:
+                files += header_files
+            j['key'] = self.cache.key(cmd + [pkg_stamp], files)
+
+    #---------------------------------------------------------------------------
+
+    def __run_jobs(self, jobs, keep_going, n_jobs, stdout, stderr):
+        """
+        Run compilation jobs, with up to n_jobs concurrent jobs.
+
+        A job is started only when the jobs compiling the sources it
+        depends on are finished. The output of concurrent jobs is
+        written to stdout once each job is finished, so as not to be
+        interleaved. Unless keep_going is True, no new job is started
+        after an error.
+        """
+        retval = 0
+
+        if n_jobs == None:
+            n_jobs = available_procs()
+        n_jobs = max(1, min(n_jobs, len(jobs)))
+
+        pkg = self.pkg
+
+        # Modify the PATH once for all jobs (instead of in each call
+        # to run_command) for relocatable installations
+
+        saved_path = None
+        if n_jobs > 1 and pkg.config.features['relocatable'] == "yes":
+            if sys.platform.startswith("win"):
+                sep = ";"
+            else:
+                sep = ":"
+            saved_path = os.environ['PATH']
+            os.environ['PATH'] = pkg.get_dir('bindir') + sep + saved_path
+            pkg = None
+
+        # Jobs already done (using cached results) are skipped
+
+        pending = [j for j in jobs if not 'retval' in j]
+        running = []
+        done_src = set([j['src'] for j in jobs if j.get('retval') == 0])
+        errors = []
+        cond = threading.Condition()
+
+        def _run_job(j):
+            try:
+                j['retval'] = run_command(j['cmd'], pkg=pkg, echo=True,
+                                          stdout=j['log'], stderr=j['log'])
+            except BaseException:
+                j['retval'] = 1
+                errors.append(sys.exc_info()[1])
+            with cond:
+                j['done'] = True
+                cond.notify()
+
+        def _select_job():
+            for j in pending:
+                ready = True
+                for d in j.get('deps', []):
+                    if not d in done_src:
+                        ready = False
+                        break
+                if ready:
+                    return j
+            # Unresolved (circular or failed) dependencies
+            if not running:
+                return pending[0]
+            return None
+
+        def _end_job(j):
+            if j['log'] != stdout:
+                j['log'].seek(0)
+                stdout.write(j['log'].read())
+                stdout.flush()
+                j['log'].close()
+            if j['retval'] != 0:
+                return 1
+            done_src.add(j['src'])
+            return 0
+
+        with cond:
+            while pending or running:
+
+                for j in [j for j in running if 'done' in j]:
+                    running.remove(j)
+                    if _end_job(j) != 0:
+                        retval = 1
+
+                if retval != 0 and not keep_going:
+                    pending = []
+
+                j = None
+                if pending and len(running) < n_jobs:
+                    j = _select_job()
+                if j == None:
+                    if running:
+                        cond.wait()
+                    continue
+
+                pending.remove(j)
+
+                if n_jobs == 1:
+                    j['log'] = stdout
+                    j['retval'] = run_command(j['cmd'], pkg=pkg, echo=True,
+                                              stdout=stdout, stderr=stderr)
+                    if _end_job(j) != 0:
+                        retval = 1
+                    continue
+
+                j['log'] = tempfile.TemporaryFile(mode='w+')
+                running.append(j)
+                t = threading.Thread(target=_run_job, args=(j,))
+                t.daemon = True
+                t.start()
+
+        if saved_path != None:
+            os.environ['PATH'] = saved_path
+
+        # Errors (such as sys.exit() calls) are raised in the calling thread
+
+        if errors:
+            raise errors[0]
+
+        return retval
+
+    #---------------------------------------------------------------------------
+
     def link_obj(self, exec_name, obj_files=None, opt_libs=None,
                  stdout=sys.stdout, stderr=sys.stderr):
         """
@@ -533,7 +1007,7 @@ class cs_compile(object):
     def compile_and_link(self, srcdir, destdir=None, src_list=None,
                          opt_cflags=None, opt_cxxflags=None, opt_fcflags=None,
                          opt_libs=None, force_link=False, keep_going=False,
-                         stdout=sys.stdout, stderr=sys.stderr):
+                         stdout=sys.stdout, stderr=sys.stderr, n_jobs=None):
         """
         Compilation and link function.
         """
@@ -566,12 +1040,34 @@ class cs_compile(object):
 
         retval, obj_list = self.compile_src(src_list,
                                             opt_cflags, opt_cxxflags, opt_fcflags,
-                                            keep_going, stdout, stderr)
+                                            keep_going, stdout, stderr,
+                                            n_jobs=n_jobs)
 
         if retval == 0 and (force_link or len(obj_list)) > 0:
-            retval = self.link_obj(exec_name, obj_files=obj_list,
-                                   opt_libs=opt_libs,
-                                   stdout=stdout, stderr=stderr)
+
+            # Reuse a cached executable if all objects are unchanged
+
+            link_key = None
+            if self.cache != None:
+                p_libs = self.get_flags('libs')
+                l_dir = self.pkg.get_dir('libdir')
+                prefixes = ['lib' + l[2:] + '.' for l in p_libs if l[:2] == '-l']
+                parts = [os.path.basename(exec_name), str(opt_libs),
+                         self.__pkg_files_stamp([l_dir,
+                                                 os.path.join(l_dir, self.pkg.name)],
+                                                prefixes)]
+                parts += self.get_flags('ldflags') + p_libs
+                link_key = self.cache.key(parts, sorted(obj_list))
+
+            if link_key and self.cache.get(link_key, [exec_name]):
+                stdout.write('Using cached ' + os.path.basename(exec_name)
+                             + '\n')
+            else:
+                retval = self.link_obj(exec_name, obj_files=obj_list,
+                                       opt_libs=opt_libs,
+                                       stdout=stdout, stderr=stderr)
+                if retval == 0 and link_key:
+                    self.cache.put(link_key, [exec_name])
 
         # Cleanup
 
@@ -590,7 +1086,7 @@ class cs_compile(object):
 def compile_and_link(pkg, srcdir, destdir=None,
                      opt_cflags=None, opt_cxxflags=None, opt_fcflags=None,
                      opt_libs=None, force_link=False, keep_going=False,
-                     stdout=sys.stdout, stderr=sys.stderr):
+                     stdout=sys.stdout, stderr=sys.stderr, n_jobs=None):
     """
     Compilation and link function.
     """
@@ -605,7 +1101,8 @@ def compile_and_link(pkg, srcdir, destdir=None,
                                  force_link=force_link,
                                  keep_going=keep_going,
                                  stdout=stdout,
-                                 stderr=stderr)
+                                 stderr=stderr,
+                                 n_jobs=n_jobs)
 
     return retcode
 
@@ -621,7 +1118,8 @@ def main(argv, pkg):
     from cs_exec_environment import set_modules, source_rcfile
 
     test_mode, force_link, keep_going, src_dir, dest_dir, \
-        version, cflags, cxxflags, fcflags, libs = process_cmd_line(argv, pkg)
+        version, cflags, cxxflags, fcflags, libs, n_jobs \
+        = process_cmd_line(argv, pkg)
 
     if (version):
         pkg = pkg.get_alternate_version(version)
@@ -640,7 +1138,8 @@ def main(argv, pkg):
                                opt_fcflags=fcflags,
                                opt_libs=libs,
                                force_link=force_link,
-                               keep_going=keep_going)
+                               keep_going=keep_going,
+                               n_jobs=n_jobs)
 
     sys.exit(retcode)
 
@@ -31,6 +31,7 @@ except Exception:
 
 import datetime
 import fnmatch
+import json
 import os
 import subprocess
 import sys
@@ -488,9 +489,10 @@ def get_script_return_code():
 #-------------------------------------------------------------------------------
 
 def run_command(args, pkg = None, echo = False,
-                stdout = sys.stdout, stderr = sys.stderr, env = None):
+                stdout = sys.stdout, stderr = sys.stderr, env = None,
+                cwd = None):
     """
-    Run a command.
+    Run a command (in directory cwd if given).
     """
     if echo == True:
         if type(args) == str:
@@ -524,6 +526,8 @@ def run_command(args, pkg = None, echo = False,
         kwargs['stdout'] = stdout
     if (stderr != sys.stderr):
         kwargs['stderr'] = stderr
+    if cwd != None:
+        kwargs['cwd'] = cwd
 
     returncode = 1
     try:
@@ -895,6 +899,8 @@ class resource_info(batch_info):
 
         batch_info.__init__(self)
 
+        self.cache = None
+
         self.manager = None
         self.n_procs = None
         self.n_nodes = None
@@ -1173,8 +1179,17 @@ class resource_info(batch_info):
         # Check for resource manager and eventual hostsfile
 
         elif self.manager == 'SLURM':
-            hosts_list = get_command_output('srun hostname -s').split()
-            hosts_list.sort()
+            stamp = [os.getenv(v) for v in ('SLURM_JOB_ID',
+                                            'SLURM_JOB_NODELIST',
+                                            'SLURM_NTASKS',
+                                            'SLURM_TASKS_PER_NODE')]
+            if self.cache != None and stamp[0] != None:
+                hosts_list = self.cache.get('slurm_hosts', stamp)
+            if hosts_list == None:
+                hosts_list = get_command_output('srun hostname -s').split()
+                hosts_list.sort()
+                if self.cache != None and stamp[0] != None and hosts_list:
+                    self.cache.set('slurm_hosts', stamp, hosts_list)
 
         elif self.manager == 'LSF':
             s = os.getenv('LSB_MCPU_HOSTS')
@@ -1243,6 +1258,228 @@ class resource_info(batch_info):
 
         return hosts_file
 
+#-------------------------------------------------------------------------------
+# Cache for MPI environment detection
+#-------------------------------------------------------------------------------
+
+def file_stamp(path):
+    """
+    Return a stamp (path, modification time and size) for a file,
+    or None if it does not exist.
+    """
+
+    try:
+        st = os.stat(path)
+        return [path, st.st_mtime, st.st_size]
+    except Exception:
+        return None
+
+#-------------------------------------------------------------------------------
+
+class mpi_environment_cache:
+    """
+    On-disk cache of MPI environment detection results requiring external
+    commands (MPICH process manager, resource managers known by Open MPI,
+    hosts allocated by SLURM).
+
+    Entries are stored in a JSON file, with a stamp based on the associated
+    executables (path, modification time and size) or environment, and on
+    the package configuration, so that checking them only requires a few
+    stat() calls.
+
+    The file is defined by the CS_MPI_ENV_CACHE environment variable or
+    the 'mpi_env_cache' option of the [run] section of the configuration
+    file ('off' to disable the cache), and defaults to
+    $XDG_CACHE_HOME/<package>/mpi_environment.json.
+    """
+
+    #---------------------------------------------------------------------------
+
+    def __init__(self, pkg):
+        """
+        Initialize cache object.
+        """
+
+        self.path = None
+        self.config_stamp = None
+        self.entries = None
+
+        if pkg == None:
+            return
+
+        path = os.getenv('CS_MPI_ENV_CACHE')
+
+        if path == None:
+            config = configparser.ConfigParser()
+            config.read(pkg.get_configfiles())
+            if config.has_option('run', 'mpi_env_cache'):
+                path = config.get('run', 'mpi_env_cache')
+
+        if path == None:
+            cache_home = os.getenv('XDG_CACHE_HOME')
+            if not cache_home:
+                cache_home = os.path.join(os.path.expanduser('~'), '.cache')
+            path = os.path.join(cache_home, pkg.name, 'mpi_environment.json')
+
+        if path and not path in ('off', 'no'):
+            path = os.path.expandvars(os.path.expanduser(path))
+            self.path = os.path.abspath(path)
+
+        stamp = [pkg.version,
+                 pkg.config.libs['mpi'].variant,
+                 pkg.config.libs['mpi'].bindir]
+        for f in pkg.get_configfiles():
+            stamp.append(file_stamp(f))
+
+        self.config_stamp = stamp
+
+    #---------------------------------------------------------------------------
+
+    def __read__(self):
+        """
+        Read the cache file.
+        """
+
+        entries = {}
+
+        try:
+            f = open(self.path)
+            entries = json.load(f)
+            f.close()
+        except Exception:
+            pass
+
+        if not isinstance(entries, dict):
+            entries = {}
+
+        return entries
+
+    #---------------------------------------------------------------------------
+
+    def __stamp__(self, stamp):
+        """
+        Return full stamp of an entry, normalized as read from JSON.
+        """
+
+        return json.loads(json.dumps([self.config_stamp, stamp]))
+
+    #---------------------------------------------------------------------------
+
+    def get(self, key, stamp):
+        """
+        Return the cached value for a given key, or None if not present
+        or if its stamp does not match the given one.
+        """
+
+        if self.path == None:
+            return None
+
+        if self.entries == None:
+            self.entries = self.__read__()
+
+        e = self.entries.get(key)
+        if isinstance(e, dict) and e.get('stamp') == self.__stamp__(stamp):
+            return e.get('value')
+
+        return None
+
+    #---------------------------------------------------------------------------
+
+    def set(self, key, stamp, value):
+        """
+        Cache a value for a given key (ignoring errors, as the cache
+        is only an optimization).
+        """
+
+        if self.path == None:
+            return
+
+        entry = {'stamp':self.__stamp__(stamp), 'value':value}
+
+        # Merge with entries possibly added concurrently
+
+        self.entries = self.__read__()
+        self.entries[key] = entry
+
+        try:
+            d = os.path.dirname(self.path)
+            if not os.path.isdir(d):
+                os.makedirs(d)
+            fd, tmp_path = tempfile.mkstemp(dir=d, prefix='.mpi_env_')
+            f = os.fdopen(fd, 'w')
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+            f.close()
+            os.rename(tmp_path, self.path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except Exception:
+                pass
+
+    #---------------------------------------------------------------------------
+
+    def is_valid(self, key):
+        """
+        Check if an entry matches the current configuration and files.
+        (entries based on the environment are only checked for the
+        configuration).
+        """
+
+        if self.entries == None:
+            self.entries = self.__read__()
+
+        e = self.entries.get(key)
+        if not isinstance(e, dict):
+            return False
+
+        try:
+            config_stamp, stamp = e['stamp']
+            if config_stamp != self.__stamp__(None)[0]:
+                return False
+            for s in stamp:
+                if isinstance(s, list) and len(s) == 3:
+                    if self.__stamp__([file_stamp(s[0])])[1] != [s]:
+                        return False
+        except Exception:
+            return False
+
+        return True
+
+    #---------------------------------------------------------------------------
+
+    def info(self):
+        """
+        Return a description of the cache contents.
+        """
+
+        if self.path == None:
+            return 'MPI environment cache disabled.\n'
+
+        output = 'MPI environment cache: ' + self.path + '\n'
+
+        self.entries = self.__read__()
+        for key in sorted(self.entries.keys()):
+            if self.is_valid(key):
+                status = 'valid'
+            else:
+                status = 'stale'
+            value = self.entries[key].get('value')
+            output += '  ' + key + ' (' + status + '): ' + str(value) + '\n'
+
+        return output
+
+    #---------------------------------------------------------------------------
+
+    def clear(self):
+        """
+        Remove the cache file.
+        """
+
+        self.entries = {}
+
+        if self.path != None and os.path.isfile(self.path):
+            os.remove(self.path)
+
 #-------------------------------------------------------------------------------
 # MPI environments and associated commands
 #-------------------------------------------------------------------------------
@@ -1282,6 +1519,12 @@ class mpi_environment:
 
         self.info_cmds = None
 
+        # Cache for detection results requiring external commands
+
+        self.cache = mpi_environment_cache(pkg)
+        if resource_info != None and resource_info.cache == None:
+            resource_info.cache = self.cache
+
         # Initialize options based on system-wide or user configuration
 
         config = configparser.ConfigParser()
@@ -1387,6 +1630,31 @@ class mpi_environment:
 
     def __get_mpich2_3_default_pm__(self, mpiexec_path):
 
+        """
+        Determine the program manager for MPICH2 or MPICH-3,
+        using the cache if possible.
+        """
+
+        if not mpiexec_path:
+            return self.__detect_mpich2_3_default_pm__(mpiexec_path)
+
+        d = os.path.split(mpiexec_path)[0]
+        stamp = [file_stamp(mpiexec_path),
+                 file_stamp(os.path.join(d, 'mpichversion')),
+                 file_stamp(os.path.join(d, 'mpich2version'))]
+
+        key = 'mpich_pm:' + mpiexec_path
+        pm = self.cache.get(key, stamp)
+        if pm == None:
+            pm = self.__detect_mpich2_3_default_pm__(mpiexec_path)
+            self.cache.set(key, stamp, pm)
+
+        return pm
+
+    #---------------------------------------------------------------------------
+
+    def __detect_mpich2_3_default_pm__(self, mpiexec_path):
+
         """
         Try to determine the program manager for MPICH2 or MPICH-3.
         """
@@ -1674,8 +1942,9 @@ class mpi_environment:
                               'PBS':' tm ',
                               'SGE':' gridengine '}
             if resource_info.manager in rc_mca_by_type:
-                info = get_command_output(info_name)
-                if info.find(rc_mca_by_type[resource_info.manager]) > -1:
+                known_managers = self.__get_openmpi_managers__(p, info_name,
+                                                               rc_mca_by_type)
+                if resource_info.manager in known_managers:
                     known_manager = True
             elif resource_info.manager == 'OAR':
                 self.mpiexec += ' -machinefile $OAR_FILE_NODES'
@@ -1692,6 +1961,41 @@ class mpi_environment:
 
     #---------------------------------------------------------------------------
 
+    def __get_openmpi_managers__(self, p, info_name, rc_mca_by_type):
+
+        """
+        Determine which resource managers are known by an Open MPI build,
+        using the cache if possible.
+        """
+
+        absname = info_name
+        if not os.path.isabs(absname):
+            absname = ''
+            for d in p:
+                if os.path.isfile(os.path.join(d, info_name)):
+                    absname = os.path.join(d, info_name)
+                    break
+
+        key = 'ompi_managers:' + absname
+        stamp = [file_stamp(absname)]
+
+        known_managers = None
+        if absname:
+            known_managers = self.cache.get(key, stamp)
+
+        if known_managers == None:
+            info = get_command_output(info_name)
+            known_managers = []
+            for rm in sorted(rc_mca_by_type.keys()):
+                if info.find(rc_mca_by_type[rm]) > -1:
+                    known_managers.append(rm)
+            if absname and info:
+                self.cache.set(key, stamp, known_managers)
+
+        return known_managers
+
+    #---------------------------------------------------------------------------
+
     def __init_bgq__(self, p, resource_info=None, wdir = None):
 
         """
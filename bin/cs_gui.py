@@ -30,7 +30,7 @@ Parse command line arguments and launch the GUI.
 # Library modules import
 #-------------------------------------------------------------------------------
 
-import os, sys, string
+import os, sys, string, time
 
 from optparse import OptionParser
 
@@ -102,8 +102,14 @@ def process_cmd_line(argv):
                       action="store_false",
                       help="deactivate splash screen")
 
+    parser.add_option("--profile-startup", dest="profile_startup",
+                      action="store_true",
+                      help="report import and initialization times " \
+                      "of modules at startup")
+
 
     parser.set_defaults(splash_screen=True)
+    parser.set_defaults(profile_startup=False)
 
     (options, args) = parser.parse_args(argv)
 
@@ -120,7 +126,110 @@ def process_cmd_line(argv):
         else:
             options.file_name = args[0]
 
-    return options.file_name, options.splash_screen
+    return options.file_name, options.splash_screen, options.profile_startup
+
+#-------------------------------------------------------------------------------
+# Startup profiling
+#-------------------------------------------------------------------------------
+
+class startup_profiler(object):
+    """
+    Measure the time spent importing each module (excluding the import
+    of its own dependencies) and the duration of startup stages.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self.t_start = time.time()
+        self.t_stage = self.t_start
+        self.stages = []
+        self.imports = {}
+        self.__stack = []
+
+        try:
+            import builtins  # Python3
+        except ImportError:
+            import __builtin__ as builtins  # Python2
+        self.__builtins = builtins
+        self.__import = builtins.__import__
+
+    #---------------------------------------------------------------------------
+
+    def __timed_import(self, name, *args, **kwargs):
+        """
+        Replacement for __import__, timing the first import of a module.
+        """
+        if name in sys.modules:
+            return self.__import(name, *args, **kwargs)
+
+        t0 = time.time()
+        self.__stack.append(0.)
+        try:
+            return self.__import(name, *args, **kwargs)
+        finally:
+            t = time.time() - t0
+            t_sub = self.__stack.pop()
+            if self.__stack:
+                self.__stack[-1] += t
+            self.imports[name] = self.imports.get(name, 0.) + t - t_sub
+
+    #---------------------------------------------------------------------------
+
+    def start(self):
+        """
+        Start timing imports.
+        """
+        self.__builtins.__import__ = self.__timed_import
+
+    #---------------------------------------------------------------------------
+
+    def stop(self):
+        """
+        Stop timing imports.
+        """
+        self.__builtins.__import__ = self.__import
+
+    #---------------------------------------------------------------------------
+
+    def stage(self, name):
+        """
+        Mark the end of a startup stage.
+        """
+        t = time.time()
+        self.stages.append((name, t - self.t_stage))
+        self.t_stage = t
+
+    #---------------------------------------------------------------------------
+
+    def report(self, n_max=30):
+        """
+        Stop timing and print the startup report.
+        """
+        from code_saturne.Base.Toolbox import GuiParam
+
+        self.stop()
+
+        print("")
+        print("Startup stages:")
+        for name, t in self.stages:
+            print("  %-50s %8.3f s" % (name, t))
+        print("  %-50s %8.3f s" % ("total", time.time() - self.t_start))
+
+        if GuiParam.startup_timings:
+            print("")
+            print("Initialization of models:")
+            for name, t in GuiParam.startup_timings:
+                print("  %-50s %8.3f s" % (name, t))
+
+        imports = sorted(self.imports.items(), key=lambda i: -i[1])
+        print("")
+        print("Module imports (%d modules, %.3f s, %d slowest shown):"
+              % (len(imports), sum([i[1] for i in imports]), n_max))
+        for name, t in imports[:n_max]:
+            print("  %-50s %8.3f s" % (name, t))
+        print("")
 
 #-------------------------------------------------------------------------------
 # Main
@@ -131,6 +240,15 @@ def main(argv, pkg):
     Start Qt and a session of the application.
     """
 
+    case, spl, profile = process_cmd_line(argv)
+
+    profiler = None
+    if profile:
+        profiler = startup_profiler()
+        profiler.start()
+        from code_saturne.Base.Toolbox import GuiParam
+        GuiParam.startup_timings = []
+
     from cs_exec_environment import set_modules, source_rcfile
     set_modules(pkg)
     source_rcfile(pkg)
@@ -163,8 +281,6 @@ def main(argv, pkg):
             if os.path.isdir(eospath) and not eospath in sys.path:
                 sys.path.insert(0, eospath)
 
-    case, spl = process_cmd_line(argv)
-
     app = QApplication(argv)
     app.setOrganizationName(pkg.code_name) # Defines the name of subdirectory under .config
     app.setOrganizationDomain(pkg.url)
@@ -192,14 +308,29 @@ def main(argv, pkg):
         app.processEvents()
         QTimer.singleShot(1500, splash.hide)
 
+    if profiler:
+        profiler.stage("environment and Qt application setup")
+
     from code_saturne.Base.MainView import MainView
+
+    if profiler:
+        profiler.stage("main window modules import")
+
     mv = MainView(cmd_package = pkg, cmd_case = case)
 
+    if profiler:
+        profiler.stage("main window creation and case loading")
+
     try:
         mv.show()
         if spl:
             app.processEvents()
             app.restoreOverrideCursor()
+        if profiler:
+            def report():
+                profiler.stage("first window display")
+                profiler.report()
+            QTimer.singleShot(0, report)
     except:
         print("\n  Unable to display a Qt window.")
         print("  Please check your display environment.\n")
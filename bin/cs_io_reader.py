@@ -0,0 +1,596 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-------------------------------------------------------------------------------
+
+# This file is part of Code_Saturne, a general-purpose CFD tool.
+#
+# Copyright (C) 1998-2018 EDF S.A.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+#-------------------------------------------------------------------------------
+
+"""
+This module reads and compares files using the Code_Saturne I/O format
+(Preprocessor output, partitioning, checkpoint/restart files), as
+cs_io_dump does, but without running a separate process.
+
+Files are memory-mapped, and section values are compared by blocks,
+using NumPy if available (or plain Python otherwise).
+
+This module defines the following classes and functions:
+- IOFormatError
+- io_section
+- io_file
+- section_diff
+- compare_files
+- print_diff
+"""
+
+#-------------------------------------------------------------------------------
+# Library modules import
+#-------------------------------------------------------------------------------
+
+import mmap
+import os
+import struct
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#-------------------------------------------------------------------------------
+# Global definitions
+#-------------------------------------------------------------------------------
+
+_base_header = b"Code_Saturne I/O, BE, R0"
+
+# Big-endian type definitions, for NumPy and for the struct module
+
+_numpy_types = {'c ': 'S1',
+                'i4': '>i4', 'i8': '>i8',
+                'u4': '>u4', 'u8': '>u8',
+                'r4': '>f4', 'r8': '>f8'}
+
+_struct_types = {'c ': 'c',
+                 'i4': 'i', 'i8': 'q',
+                 'u4': 'I', 'u8': 'Q',
+                 'r4': 'f', 'r8': 'd'}
+
+_default_threshold = 1.e-30
+
+# Number of values compared at once (bounds temporary memory use)
+
+_block_size = 1 << 20
+
+#-------------------------------------------------------------------------------
+# Utility functions
+#-------------------------------------------------------------------------------
+
+def _to_str(b):
+    """
+    Convert a null-terminated byte string to a string.
+    """
+    i = b.find(b'\0')
+    if i > -1:
+        b = b[:i]
+    if sys.version_info[0] > 2:
+        return b.decode('ascii', 'replace')
+    return b
+
+def _align(offset, alignment):
+    """
+    Return offset aligned to the next multiple of alignment.
+    """
+    if alignment > 0:
+        offset += (alignment - (offset % alignment)) % alignment
+    return offset
+
+#-------------------------------------------------------------------------------
+# Exception class
+#-------------------------------------------------------------------------------
+
+class IOFormatError(Exception):
+    """Base class for I/O format errors."""
+
+    def __init__(self, *args):
+        self.args = args
+
+    def __str__(self):
+        if len(self.args) == 1:
+            return str(self.args[0])
+        else:
+            return str(self.args)
+
+#-------------------------------------------------------------------------------
+# Section of a file
+#-------------------------------------------------------------------------------
+
+class io_section(object):
+    """
+    Section header info.
+    """
+
+    def __init__(self, name, n_vals, location_id, index_id, n_loc_vals,
+                 type_name, offset, embedded):
+
+        self.name = name
+        self.n_vals = n_vals
+        self.location_id = location_id
+        self.index_id = index_id
+        self.n_loc_vals = n_loc_vals
+        self.type_name = type_name
+        self.offset = offset        # offset of values in file mapping
+        self.embedded = embedded    # values embedded in header ?
+
+    #---------------------------------------------------------------------------
+
+    def compare_type(self):
+        """
+        Return the type class used for comparisons ('c', 'i' or 'r'),
+        unsigned and signed integers being considered equivalent.
+        """
+        if self.n_vals == 0:
+            return ' '
+        t = self.type_name[0]
+        if t == 'u':
+            t = 'i'
+        return t
+
+#-------------------------------------------------------------------------------
+# Memory-mapped file
+#-------------------------------------------------------------------------------
+
+class io_file(object):
+    """
+    Memory-mapped file in Code_Saturne I/O format, with index of sections.
+    """
+
+    def __init__(self, path):
+        """
+        Open and map file, and build section index.
+        """
+        self.path = path
+        self.sections = []
+
+        self.__f = open(path, 'rb')
+        size = os.fstat(self.__f.fileno()).st_size
+        if size < 152:
+            self.__f.close()
+            raise IOFormatError("File format of \"%s\" is not recognized."
+                                % path)
+
+        self.__map = mmap.mmap(self.__f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        m = self.__map
+        if m[0:64].rstrip(b'\0') != _base_header:
+            self.close()
+            raise IOFormatError("File format of \"%s\" is not recognized:\n"
+                                "First %d bytes: \"%s\"."
+                                % (path, 64, _to_str(m[0:64])))
+
+        self.file_type = _to_str(m[64:128])
+        self.header_size, self.header_align, self.body_align \
+            = struct.unpack_from('>3Q', m, 128)
+
+        self.__build_index(size)
+
+    #---------------------------------------------------------------------------
+
+    def __build_index(self, size):
+        """
+        Read section headers to build index.
+        """
+        m = self.__map
+        pos = 152
+
+        while True:
+            pos = _align(pos, self.header_align)
+            if pos + self.header_size > size:
+                break
+
+            h_size, n_vals, location_id, index_id, n_loc_vals, d_shift \
+                = struct.unpack_from('>6Q', m, pos)
+
+            type_bytes = m[pos+48:pos+56]
+            type_name = _to_str(type_bytes[0:2])
+            if type_name == 'c':
+                type_name = 'c '
+            name = _to_str(m[pos+56:pos+max(h_size, self.header_size)])
+
+            embedded = False
+            offset = None
+            h_end = pos + max(h_size, self.header_size)
+
+            if n_vals > 0:
+                if type_name not in _numpy_types:
+                    raise IOFormatError("Type \"%s\" is not known in file \"%s\"."
+                                        % (type_name, self.path))
+                if type_bytes[7:8] == b'e':
+                    embedded = True
+                    offset = pos + 56 + d_shift
+                    pos = h_end
+                else:
+                    offset = _align(h_end, self.body_align)
+                    pos = offset + n_vals*self.type_size(type_name)
+            else:
+                pos = h_end
+
+            self.sections.append(io_section(name, n_vals, location_id,
+                                            index_id, n_loc_vals,
+                                            type_name, offset, embedded))
+
+    #---------------------------------------------------------------------------
+
+    def type_size(self, type_name):
+        """
+        Return the size of a given type.
+        """
+        if type_name[0] == 'c':
+            return 1
+        return int(type_name[1])
+
+    #---------------------------------------------------------------------------
+
+    def values(self, section, start=0, end=None):
+        """
+        Return values of a section (or of a range of values in that section),
+        as a NumPy array referencing the file mapping if possible,
+        or as a list otherwise.
+        """
+        if end == None or end > section.n_vals:
+            end = section.n_vals
+        n = end - start
+        if n <= 0:
+            return []
+
+        t = section.type_name
+        offset = section.offset + start*self.type_size(t)
+
+        if numpy != None:
+            return numpy.frombuffer(self.__map, dtype=_numpy_types[t],
+                                    count=n, offset=offset)
+
+        return list(struct.unpack_from('>%d%s' % (n, _struct_types[t]),
+                                       self.__map, offset))
+
+    #---------------------------------------------------------------------------
+
+    def close(self):
+        """
+        Unmap and close file.
+        """
+        try:
+            self.__map.close()
+        except Exception:
+            pass
+        self.__f.close()
+
+    #---------------------------------------------------------------------------
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+#-------------------------------------------------------------------------------
+# Comparison results
+#-------------------------------------------------------------------------------
+
+class section_diff(object):
+    """
+    Result of the comparison of a section of 2 files.
+
+    status is one of:
+      'identical', 'different', 'size_mismatch', 'type_mismatch',
+      'only_in_first', 'only_in_second'.
+    For floating-point sections, statistics (max_diff, mean_diff,
+    max_rel_diff, mean_rel_diff) are based on values whose absolute
+    difference is above the comparison threshold.
+    """
+
+    def __init__(self, name, location_id, type1, type2, n_vals1, n_vals2):
+
+        self.name = name
+        self.location_id = location_id
+        self.type1 = type1
+        self.type2 = type2
+        self.n_vals1 = n_vals1
+        self.n_vals2 = n_vals2
+
+        self.status = 'identical'
+        self.n_diffs = 0
+        self.max_diff = 0.
+        self.mean_diff = 0.
+        self.max_rel_diff = 0.
+        self.mean_rel_diff = 0.
+        self.first_diffs = []    # (id, value1, value2) of first differences
+
+    #---------------------------------------------------------------------------
+
+    def is_real(self):
+        """
+        Return True if section contains floating-point values.
+        """
+        return (self.type1 != None and self.type1[0] == 'r')
+
+#-------------------------------------------------------------------------------
+
+def _compare_blocks_numpy(f1, f2, s1, s2, d, threshold, n_echo):
+    """
+    Compare values of 2 sections by blocks, using NumPy.
+    """
+    c_type = s1.compare_type()
+    sum_diff = 0.
+    sum_rel_diff = 0.
+
+    for start in range(0, s1.n_vals, _block_size):
+        end = min(start + _block_size, s1.n_vals)
+        v1 = f1.values(s1, start, end)
+        v2 = f2.values(s2, start, end)
+
+        if c_type == 'r':
+            v1 = v1.astype(numpy.float64)
+            v2 = v2.astype(numpy.float64)
+            delta = numpy.abs(v1 - v2)
+            mask = delta > threshold
+        elif c_type == 'i':
+            mask = v1.astype(numpy.int64) != v2.astype(numpy.int64)
+        else:
+            mask = v1 != v2
+
+        ids = numpy.flatnonzero(mask)
+        if len(ids) == 0:
+            continue
+
+        d.n_diffs += len(ids)
+
+        if c_type == 'r':
+            dm = delta[ids]
+            rm = dm / numpy.maximum(numpy.abs(v1[ids]), numpy.abs(v2[ids]))
+            d.max_diff = max(d.max_diff, float(dm.max()))
+            d.max_rel_diff = max(d.max_rel_diff, float(rm.max()))
+            sum_diff += float(dm.sum())
+            sum_rel_diff += float(rm.sum())
+
+        for i in ids[0:max(0, n_echo - len(d.first_diffs))]:
+            d.first_diffs.append((start + int(i), v1[i], v2[i]))
+
+    return sum_diff, sum_rel_diff
+
+#-------------------------------------------------------------------------------
+
+def _compare_blocks_python(f1, f2, s1, s2, d, threshold, n_echo):
+    """
+    Compare values of 2 sections by blocks, in plain Python
+    (if NumPy is not available).
+    """
+    c_type = s1.compare_type()
+    sum_diff = 0.
+    sum_rel_diff = 0.
+
+    for start in range(0, s1.n_vals, _block_size):
+        end = min(start + _block_size, s1.n_vals)
+        v1 = f1.values(s1, start, end)
+        v2 = f2.values(s2, start, end)
+
+        for i in range(len(v1)):
+            a = v1[i]
+            b = v2[i]
+            if c_type == 'r':
+                delta = abs(a - b)
+                if not delta > threshold:
+                    continue
+                rel = delta / max(abs(a), abs(b))
+                d.max_diff = max(d.max_diff, delta)
+                d.max_rel_diff = max(d.max_rel_diff, rel)
+                sum_diff += delta
+                sum_rel_diff += rel
+            elif a == b:
+                continue
+            d.n_diffs += 1
+            if len(d.first_diffs) < n_echo:
+                d.first_diffs.append((start + i, a, b))
+
+    return sum_diff, sum_rel_diff
+
+#-------------------------------------------------------------------------------
+
+def _compare_sections(f1, f2, s1, s2, threshold, n_echo):
+    """
+    Compare sections with identical names and locations in 2 files.
+    """
+    d = section_diff(s1.name, s1.location_id,
+                     s1.type_name, s2.type_name, s1.n_vals, s2.n_vals)
+
+    if s1.n_vals == 0 and s2.n_vals == 0:
+        return d
+
+    if s1.n_vals != s2.n_vals:
+        d.status = 'size_mismatch'
+        return d
+    elif s1.compare_type() != s2.compare_type():
+        d.status = 'type_mismatch'
+        return d
+
+    if numpy != None:
+        sum_diff, sum_rel_diff \
+            = _compare_blocks_numpy(f1, f2, s1, s2, d, threshold, n_echo)
+    else:
+        sum_diff, sum_rel_diff \
+            = _compare_blocks_python(f1, f2, s1, s2, d, threshold, n_echo)
+
+    if d.n_diffs > 0:
+        d.status = 'different'
+        d.mean_diff = sum_diff / d.n_diffs
+        d.mean_rel_diff = sum_rel_diff / d.n_diffs
+
+    return d
+
+#-------------------------------------------------------------------------------
+
+def compare_files(path1, path2, threshold=None, section=None, location=None,
+                  n_echo=0):
+    """
+    Compare 2 files in Code_Saturne I/O format.
+
+    Sections are matched by name and location id; sections may be filtered
+    by name or location id. Up to n_echo first differences are kept
+    for each section.
+
+    Returns the list of section_diff results, for sections of the first
+    file followed by unmatched sections of the second file.
+    """
+    if threshold == None:
+        threshold = _default_threshold
+
+    results = []
+
+    f1 = io_file(path1)
+    try:
+        f2 = io_file(path2)
+    except Exception:
+        f1.close()
+        raise
+
+    try:
+        def _filter(s):
+            if section != None and s.name != section:
+                return False
+            if location != None and s.location_id != location:
+                return False
+            return True
+
+        index2 = {}
+        for s in f2.sections:
+            if _filter(s):
+                index2.setdefault((s.name, s.location_id), []).append(s)
+
+        compared2 = set()
+
+        unmatched1 = []
+        for s1 in f1.sections:
+            if not _filter(s1):
+                continue
+            key = (s1.name, s1.location_id)
+            if key in index2:
+                for s2 in index2[key]:
+                    results.append(_compare_sections(f1, f2, s1, s2,
+                                                     threshold, n_echo))
+                compared2.add(key)
+            else:
+                d = section_diff(s1.name, s1.location_id,
+                                 s1.type_name, None, s1.n_vals, None)
+                d.status = 'only_in_first'
+                unmatched1.append(d)
+
+        results += unmatched1
+
+        for s2 in f2.sections:
+            if not _filter(s2):
+                continue
+            if (s2.name, s2.location_id) not in compared2:
+                d = section_diff(s2.name, s2.location_id,
+                                 None, s2.type_name, None, s2.n_vals)
+                d.status = 'only_in_second'
+                results.append(d)
+
+    finally:
+        f1.close()
+        f2.close()
+
+    return results
+
+#-------------------------------------------------------------------------------
+
+def print_diff(results, path1, path2, f_fmt=None, out=sys.stdout):
+    """
+    Print comparison results, in the same form as "cs_io_dump --diff".
+    Returns 0 if no differences were found, 1 otherwise.
+    """
+    if f_fmt:
+        fmt = "    %12d:  %" + f_fmt + "  |  %" + f_fmt + "\n"
+    else:
+        fmt = "    %12d:  %22.15e  | %22.15e\n"
+
+    retval = 0
+
+    for d in results:
+        if d.status == 'size_mismatch':
+            if d.type1 == d.type2:
+                out.write("  \"%-32s\"; Location: %2d; Type: %-6s\n"
+                          "    Size: %d  |  Size: %d\n\n"
+                          % (d.name, d.location_id, d.type1,
+                             d.n_vals1, d.n_vals2))
+            else:
+                out.write("  \"%-32s\"; Location: %2d\n"
+                          "    Type: %-6s; Size: %d  |  Type: %-6s; Size: %d\n\n"
+                          % (d.name, d.location_id, d.type1, d.n_vals1,
+                             d.type2, d.n_vals2))
+            retval = 1
+
+        elif d.status == 'type_mismatch':
+            out.write("  \"%-32s\"; Location: %2d; Size: %d\n"
+                      "    Type: %-6s; |  Type: %-6s\n\n"
+                      % (d.name, d.location_id, d.n_vals1, d.type1, d.type2))
+            retval = 1
+
+        elif d.status == 'different':
+            if d.type1 != d.type2:
+                out.write("  \"%-32s\"; Location: %2d Size: %d\n"
+                          "    Type: %-6s;  |  Type: %-6s; \n"
+                          % (d.name, d.location_id, d.n_vals1,
+                             d.type1, d.type2))
+            else:
+                out.write("  \"%-32s\"; Location: %2d; Type: %-6s; Size: %d\n"
+                          % (d.name, d.location_id, d.type1, d.n_vals1))
+            for i, v1, v2 in d.first_diffs:
+                if d.is_real():
+                    out.write(fmt % (i+1, v1, v2))
+                elif d.type1[0] == 'c':
+                    out.write("    %12d:  %s  | %s\n"
+                              % (i+1, _to_str(v1), _to_str(v2)))
+                else:
+                    out.write("    %12d:  %d  | %d\n" % (i+1, v1, v2))
+            if d.is_real():
+                out.write("    Differences: %d; Max: %g; Mean: %g\n\n"
+                          % (d.n_diffs, d.max_diff, d.mean_diff))
+            else:
+                out.write("    Differences: %d\n\n" % d.n_diffs)
+            retval = 1
+
+    for status, path in (('only_in_first', path1), ('only_in_second', path2)):
+        unmatched = [d for d in results if d.status == status]
+        if not unmatched:
+            continue
+        out.write("Sections only found in file \"%s\":\n\n" % path)
+        for d in unmatched:
+            t = d.type1 or d.type2
+            n = d.n_vals1 or d.n_vals2
+            if n:
+                out.write("  \"%-32s\"; Type: %-6s; Location: %2d; Size: %d\n"
+                          % (d.name, t, d.location_id, n))
+            else:
+                out.write("  \"%-32s\"\n" % d.name)
+        out.write("\n")
+        retval = 1
+
+    return retval
+
+#-------------------------------------------------------------------------------
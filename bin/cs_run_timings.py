@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-------------------------------------------------------------------------------
+
+# This file is part of Code_Saturne, a general-purpose CFD tool.
+#
+# Copyright (C) 1998-2018 EDF S.A.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+#-------------------------------------------------------------------------------
+
+"""
+This module records the wall-clock and CPU times of the stages of a run
+(and of each domain within a stage), and writes them as a machine-readable
+summary (summary.json and summary.csv) next to the run's summary file.
+
+It also provides a simple cost model for coupled domains, based on the
+solver times of previous runs (excluding coupling waits), used to
+distribute processes.
+
+This module defines the following classes and functions:
+- run_timings
+- read_run_summary
+- read_run_timings
+- format_run_timings
+- read_solver_times
+- fit_solver_cost
+- balance_procs
+"""
+
+#-------------------------------------------------------------------------------
+# Library modules import
+#-------------------------------------------------------------------------------
+
+import contextlib
+import json
+import os
+import time
+import unittest
+import tempfile
+import shutil
+
+#-------------------------------------------------------------------------------
+# Global definitions
+#-------------------------------------------------------------------------------
+
+json_name = 'summary.json'
+csv_name = 'summary.csv'
+
+csv_columns = ('stage', 'domain', 'wall', 'cpu', 'bytes')
+
+#-------------------------------------------------------------------------------
+
+def cpu_time():
+    """
+    Return the CPU time used by this process and its terminated children.
+    """
+
+    t = os.times()
+    return t[0] + t[1] + t[2] + t[3]
+
+#-------------------------------------------------------------------------------
+
+class run_timings:
+    """
+    Timings of the stages of a run.
+
+    Each record is a dictionary with the stage name, the domain name
+    (None for a whole stage), the wall-clock and CPU times, and the number
+    of bytes copied when known. Records are kept in the order in which
+    stages are started, so a stage precedes the timings of its domains.
+
+    CPU times are those of the whole process, so they are not recorded
+    (None) for domains handled concurrently in threads, whose CPU times
+    would include those of other domains.
+    """
+
+    #---------------------------------------------------------------------------
+
+    def __init__(self):
+
+        self.records = []
+
+    #---------------------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def stage(self, name, domain=None, cpu=True):
+        """
+        Context manager timing a stage, or a domain within a stage
+        (with its CPU time only if cpu is True).
+        The record is returned, so that the number of bytes may be set.
+        """
+
+        r = {'stage': name, 'domain': domain,
+             'wall': 0., 'cpu': 0., 'bytes': 0}
+        self.records.append(r)
+
+        t0 = time.time()
+        c0 = cpu_time()
+        try:
+            yield r
+        finally:
+            r['wall'] = time.time() - t0
+            if cpu:
+                r['cpu'] = cpu_time() - c0
+            else:
+                r['cpu'] = None
+
+    #---------------------------------------------------------------------------
+
+    def write(self, dest_dir, src_dirs=(), info=None):
+        """
+        Write the timings to dest_dir, after timings already written
+        to dest_dir or one of src_dirs by previous runs of the same case
+        (when stages are run separately).
+        """
+
+        previous = []
+        for d in (dest_dir,) + tuple(src_dirs):
+            previous = read_run_timings(d)
+            if previous:
+                break
+
+        records = previous + self.records
+
+        summary = {'stages': records}
+        if info:
+            summary.update(info)
+
+        f = open(os.path.join(dest_dir, json_name), 'w')
+        json.dump(summary, f, indent=1, sort_keys=True)
+        f.close()
+
+        f = open(os.path.join(dest_dir, csv_name), 'w')
+        f.write(','.join(csv_columns) + '\n')
+        for r in records:
+            domain = r['domain']
+            if domain == None:
+                domain = ''
+            cpu = ''
+            if r['cpu'] != None:
+                cpu = '%.3f' % r['cpu']
+            f.write('%s,%s,%.3f,%s,%d\n'
+                    % (r['stage'], domain, r['wall'], cpu, r['bytes']))
+        f.close()
+
+#-------------------------------------------------------------------------------
+
+def read_run_summary(run_dir):
+    """
+    Return the machine-readable summary of a run directory as a
+    dictionary (None if not available).
+    """
+
+    try:
+        f = open(os.path.join(run_dir, json_name))
+        summary = json.load(f)
+        f.close()
+        return summary
+    except Exception:
+        return None
+
+#-------------------------------------------------------------------------------
+
+def read_run_timings(run_dir):
+    """
+    Return the list of stage timing records of a run directory
+    (empty if not available).
+    """
+
+    summary = read_run_summary(run_dir)
+    if summary == None:
+        return []
+
+    return summary.get('stages', [])
+
+#-------------------------------------------------------------------------------
+
+def format_run_timings(records, domains=False):
+    """
+    Return stage timings as lines of text.
+    """
+
+    lines = []
+    for r in records:
+        if r['domain'] != None:
+            if not domains:
+                continue
+            name = '  ' + r['domain']
+        else:
+            name = r['stage']
+        l = '%-20s %10.2f s wall' % (name, r['wall'])
+        if r['cpu'] != None:
+            l += ' %10.2f s CPU' % r['cpu']
+        else:
+            l += ' %10s   CPU' % '-'
+        if r['bytes'] > 0:
+            l += ' %10.1f MiB' % (r['bytes'] / 1048576.)
+        lines.append(l)
+
+    return lines
+
+#-------------------------------------------------------------------------------
+
+def read_solver_times(run_dir):
+    """
+    Return the elapsed time of the solver and the time spent in coupling
+    communication and wait (summed over couplings), from performance.log
+    in a run directory, as a tuple, or None if not available.
+
+    In a coupled run, a domain waiting for another at each exchange keeps
+    using its processors (MPI polling), so its CPU and elapsed times are
+    the same as those of the slowest domain; only the elapsed time
+    excluding waits measures the domain's own work.
+    """
+
+    t_elapsed = None
+    t_wait = 0.
+
+    try:
+        f = open(os.path.join(run_dir, 'performance.log'))
+        for line in f:
+            l = line.split(':')
+            if len(l) != 2:
+                continue
+            key = l[0].strip()
+            if key == 'Elapsed time':
+                t_elapsed = float(l[1].split()[0])
+            elif key == 'communication and wait':
+                t_wait += float(l[1].split()[0])
+        f.close()
+    except Exception:
+        return None
+
+    if t_elapsed == None:
+        return None
+
+    return t_elapsed, min(t_wait, t_elapsed)
+
+#-------------------------------------------------------------------------------
+
+def fit_solver_cost(samples):
+    """
+    Fit the cost model of a domain to (number of processes, busy time)
+    samples from previous runs, the busy time being the elapsed time
+    excluding coupling waits.
+
+    The busy time on n_procs processes is modeled as
+    work/n_procs + overhead, so that the total process time
+    (busy time times n_procs) is work + overhead*n_procs.
+    With samples for a single process count, the overhead is assumed to
+    be zero.
+
+    Returns the (work, overhead) tuple, or None if there are no samples.
+    """
+
+    if not samples:
+        return None
+
+    samples = [(s[0], s[1]*s[0]) for s in samples]
+
+    n = float(len(samples))
+    p_mean = sum([s[0] for s in samples]) / n
+    t_mean = sum([s[1] for s in samples]) / n
+
+    s_pp = sum([(s[0] - p_mean)**2 for s in samples])
+    s_pt = sum([(s[0] - p_mean)*(s[1] - t_mean) for s in samples])
+
+    overhead = 0.
+    if s_pp > 0:
+        overhead = max(0., s_pt / s_pp)
+    work = max(0., t_mean - overhead*p_mean)
+
+    if work <= 0 and overhead <= 0:
+        return None
+
+    return (work, overhead)
+
+#-------------------------------------------------------------------------------
+
+def balance_procs(costs, bounds, n_procs):
+    """
+    Distribute n_procs processes among domains so as to minimize the
+    largest expected elapsed time, given (work, overhead) cost models
+    and (min, max) bounds for each domain (max may be None).
+
+    As expected times decrease with the number of processes, processes
+    are given one by one to the domain with the largest expected time.
+
+    Returns the list of process counts and the expected elapsed time.
+    """
+
+    def _time(i, p):
+        return costs[i][0]/p + costs[i][1]
+
+    n_procs_l = [b[0] for b in bounds]
+
+    for k in range(n_procs - sum(n_procs_l)):
+        i_max = None
+        t_max = -1.
+        for i in range(len(costs)):
+            if bounds[i][1] != None and n_procs_l[i] >= bounds[i][1]:
+                continue
+            t = _time(i, n_procs_l[i])
+            if t > t_max:
+                i_max = i
+                t_max = t
+        if i_max == None:
+            break
+        n_procs_l[i_max] += 1
+
+    t_expected = max([_time(i, n_procs_l[i]) for i in range(len(costs))])
+
+    return n_procs_l, t_expected
+
+#-------------------------------------------------------------------------------
+# RunTimings test case
+#-------------------------------------------------------------------------------
+
+class RunTimingsTestCase(unittest.TestCase):
+    """
+    Test the cost model of coupled domains.
+    """
+
+    def setUp(self):
+        """This method is executed before all 'check' methods."""
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """This method is executed after all 'check' methods."""
+        shutil.rmtree(self.tmp_dir)
+
+    def __write_performance_log(self, name, t_elapsed, t_wait):
+        run_dir = os.path.join(self.tmp_dir, name)
+        os.mkdir(run_dir)
+        f = open(os.path.join(run_dir, 'performance.log'), 'w')
+        f.write('\nSYRTHES 4 coupling overheads\n\n'
+                '  SOLID (surface):\n\n'
+                '    location time:                 %12.3f\n'
+                '      communication and wait:      %12.3f\n'
+                '    variable exchange time:        %12.3f\n'
+                '      communication and wait:      %12.3f\n'
+                % (1., 0.5, t_wait, t_wait - 0.5))
+        f.write('\n  Total CPU time:      %12.3f s\n'
+                '\n  Elapsed time:        %12.3f s\n'
+                '  CPU / elapsed time   %12.3f\n'
+                % (4*t_elapsed, t_elapsed, 4.))
+        f.close()
+        return run_dir
+
+    def checkReadSolverTimes(self):
+        """Check whether solver and coupling wait times are read"""
+        run_dir = self.__write_performance_log('fluid', 100., 30.)
+        assert read_solver_times(run_dir) == (100., 30.), \
+            'Could not read solver times'
+        assert read_solver_times(self.tmp_dir) == None, \
+            'Solver times read without performance.log'
+
+    def checkBalanceImbalancedHistory(self):
+        """Check whether processes move from a domain waiting for another"""
+        # Both domains ran on 4 processes, with the same elapsed (and CPU)
+        # times; the fluid domain spent most of its time waiting
+        costs = []
+        for name, t_wait in (('fluid', 75.), ('solid', 5.)):
+            t_elapsed, t_wait = \
+                read_solver_times(self.__write_performance_log(name, 100.,
+                                                               t_wait))
+            costs.append(fit_solver_cost([(4, t_elapsed - t_wait)]))
+
+        n_procs_l, t_expected = balance_procs(costs, [(1, None), (1, None)], 8)
+
+        assert n_procs_l[0] < 4 and n_procs_l[1] > 4, \
+            'Could not move processes to the busiest domain'
+        assert t_expected < 95., \
+            'Could not reduce the expected elapsed time'
+
+
+def suite():
+    """unittest function"""
+    testSuite = unittest.makeSuite(RunTimingsTestCase, "check")
+    return testSuite
+
+
+def runTest():
+    """unittest function"""
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
+
+#-------------------------------------------------------------------------------
+# End
+#-------------------------------------------------------------------------------
@@ -100,6 +100,9 @@ def process_cmd_line(argv, pkg):
     parser.add_option("--n-procs",  dest="n_procs", default=None, type="int",
                       help="Optional number of processors requested for the computations")
 
+    parser.add_option("--max-procs", dest="max_procs", default=None, type="int",
+                      help="Optional total number of processors used by cases run concurrently (by default, cases are run one at a time)")
+
     parser.add_option("-n", "--n-iterations", dest="n_iterations",
                       type="int", help="maximum number of iterations for cases of the study")
 
@@ -162,6 +165,10 @@ def process_cmd_line(argv, pkg):
                       dest="without_tags", default="",
                       help="exclude any run with one of specified tags (separated by commas)")
 
+    parser.add_option("--ignore-state", action="store_true",
+                      dest="ignore_state", default=False,
+                      help="run all cases, even those already run successfully with the same inputs (according to the state database of the destination directory)")
+
     (options, args) = parser.parse_args(argv)
 
     return  options
@@ -404,6 +411,11 @@ Options:
   -x, --update-xml      update only xml files in the repository
   -t, --test-compile    compile all cases
   -r, --run             run all cases
+  --n-procs=N_PROCS     Optional number of processors requested for the
+                        computations
+  --max-procs=MAX_PROCS
+                        Optional total number of processors used by cases run
+                        concurrently (by default, cases are run one at a time)
   -n N_ITERATIONS, --n-iterations=N_ITERATIONS
                         maximum number of iterations for cases of the study
   -c, --compare         compare results between repository and destination
@@ -26,7 +26,7 @@
 # Standard modules
 #-------------------------------------------------------------------------------
 
-import os, sys, string, logging
+import os, sys, string, logging, warnings
 from string import *
 
 #-------------------------------------------------------------------------------
@@ -41,6 +41,8 @@ except ImportError:
 
 matplotlib.use("Agg")
 
+import numpy
+
 #-------------------------------------------------------------------------------
 # matplotlib config
 #-------------------------------------------------------------------------------
@@ -82,6 +84,109 @@ log = logging.getLogger(__file__)
 log.setLevel(logging.NOTSET)
 #log.setLevel(logging.DEBUG)
 
+#===============================================================================
+# Data files loader
+#===============================================================================
+
+# Cache of parsed data files: path -> (mtime, size, array)
+
+_data_cache = {}
+
+#-------------------------------------------------------------------------------
+
+def _parse_data(lines):
+    """
+    Parse data lines (comments excluded) into a 2D array of floats.
+    """
+    if not lines:
+        return numpy.zeros((0, 0))
+
+    n_cols = len(lines[0].split())
+    n_rows = len(lines)
+
+    # Fast path: parse all values at once, if all rows have
+    # the same number of columns
+
+    values = None
+    if all(len(line.split()) == n_cols for line in lines):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            try:
+                values = numpy.fromstring(" ".join(lines), sep=" ")
+            except ValueError:
+                values = None
+
+    if values is not None and len(values) == n_rows*n_cols:
+        return values.reshape((n_rows, n_cols))
+
+    # Slow path, for rows with a varying number of columns
+
+    data = numpy.empty((n_rows, n_cols))
+    data.fill(numpy.nan)
+    for i, line in enumerate(lines):
+        row = [float(v) for v in line.split()[:n_cols]]
+        data[i, :len(row)] = row
+
+    return data
+
+#-------------------------------------------------------------------------------
+
+def load_data(file_name):
+    """
+    Read a data file (monitoring, CSV or DAT format) once, and return its
+    values as a 2D array (rows, columns), the first column having index 0.
+    Lines starting with '#' are ignored, as is a CSV header line.
+    Arrays are cached, and reloaded only if the file is modified.
+    """
+    st = os.stat(file_name)
+    key = os.path.abspath(file_name)
+
+    c = _data_cache.get(key)
+    if c and c[0] == st.st_mtime and c[1] == st.st_size:
+        return c[2]
+
+    lines = []
+    f = open(file_name, 'r')
+    for line in f:
+        line = line.strip()
+        if line and line[0] != '#':
+            line = line.replace(",", " ") # compatibility with CSV
+            lines.append(line)
+    f.close()
+
+    # Skip CSV header (column names)
+    if lines:
+        try:
+            float(lines[0].split()[0])
+        except ValueError:
+            lines.pop(0)
+
+    data = _parse_data(lines)
+    _data_cache[key] = (st.st_mtime, st.st_size, data)
+
+    return data
+
+#-------------------------------------------------------------------------------
+
+def data_column(data, col):
+    """
+    Return a column of a data array (the first column having index 1),
+    or an empty array if there is no data (such as for a run which
+    failed early).
+    """
+    if data.shape[0] == 0:
+        return numpy.zeros(0)
+
+    return data[:, col-1]
+
+#-------------------------------------------------------------------------------
+
+def clear_data_cache():
+    """
+    Release cached data files.
+    """
+    _data_cache.clear()
+
 #===============================================================================
 # Plot class
 #===============================================================================
@@ -104,9 +209,9 @@ class Plot(object):
         self.ismesure = False
         self.cmd      = []
 
-        # Open file of data
+        # Data of the file (shared with other curves)
 
-        self.f = open(file, 'r')
+        self.data = load_data(file)
 
         # Read mandatory attributes
         self.subplots = [int(s) for s in parser.getAttribute(node,"fig").split()]
@@ -144,16 +249,11 @@ class Plot(object):
         except:
             yerrp = None
 
-        self.f.close()
-
         # Error Bar
-        self.f = open(file, 'r')
         self.xerr = self.uploadErrorBar(xerr, xerrp, xcol)
-        self.f.close()
-
-        self.f = open(file, 'r')
         self.yerr = self.uploadErrorBar(yerr, yerrp, ycol)
-        self.f.close()
+
+        self.data = None
 
         # List of additional matplotlib commands
         for k, v in parser.getAttributes(node).items():
@@ -180,28 +280,20 @@ class Plot(object):
 
     def uploadData(self, xcol, ycol, xplus, xfois, yplus, yfois):
         """
-        Upload and parse data
+        Extract data from columns of the file
         """
-        j = 0
-
-        for line in self.f.readlines():
-            line = line.lstrip()
-            if line and line[0] != '#':
-                j += 1
-                line = line.replace(", ", " ") # compatibility with CSV
-                line = line.lstrip()
-                if xcol:
-                    self.xspan.append(float(line.split()[xcol-1])*xfois + xplus)
-                else:
-                    self.xspan.append(j)
+        if xcol:
+            self.xspan = data_column(self.data, xcol)*xfois + xplus
+        else:
+            self.xspan = numpy.arange(1, self.data.shape[0] + 1)
 
-                self.yspan.append(float(line.split()[ycol-1])*yfois + yplus)
+        self.yspan = data_column(self.data, ycol)*yfois + yplus
 
     #---------------------------------------------------------------------------
 
     def uploadErrorBar(self, errorbar, errorp, col):
         """
-        load and parse data for Measurement uncertainty
+        Extract data for Measurement uncertainty from columns of the file
         """
         if errorbar == None and errorp == None:
             return None
@@ -213,35 +305,19 @@ class Plot(object):
                       "The error definition by percentage will be ignored.")
 
             if len(errorbar) == 2:
-                error = [ [], [] ]
-                for line in self.f.readlines():
-                    line = line.replace(", ", " ") # compatibility with CSV
-                    line = line.lstrip()
-                    if line and line[0] != '#':
-                        error[0].append(float(line.split()[errorbar[0]-1]))
-                        error[1].append(float(line.split()[errorbar[1]-1]))
-                return error
+                return [data_column(self.data, errorbar[0]),
+                        data_column(self.data, errorbar[1])]
 
             elif len(errorbar) == 1:
-                error = []
-                for line in self.f.readlines():
-                    line = line.lstrip()
-                    if line and line[0] != '#':
-                        error.append(float(line.split()[errorbar[0]-1]))
-                return error
+                return data_column(self.data, errorbar[0])
+
         elif errorp:
             if col == 0:
                 print("Error: can not compute errors by percentage of an "
                       "unspecified data set (column number missing).\n")
                 sys.exit(1)
             else:
-                error = []
-                for line in self.f.readlines():
-                    line = line.replace(", ", " ") # compatibility with CSV
-                    line = line.lstrip()
-                    if line and line[0] != '#':
-                        error.append(errorp/100.*float(line.split()[col-1]))
-                return error
+                return errorp/100.*data_column(self.data, col)
 
 #===============================================================================
 # Probes class
@@ -268,15 +344,10 @@ class Probes(object):
 
         xcol = 1
 
-        f = open(file_name, 'r')
+        data = load_data(file_name)
 
-        for line in f.readlines():
-            line = line.lstrip()
-            if line and line[0] != '#':
-                self.xspan.append(float(line.split()[xcol - 1]))
-                self.yspan.append(float(line.split()[ycol - 1]))
-
-        f.close()
+        self.xspan = data_column(data, xcol)
+        self.yspan = data_column(data, ycol)
 
     #---------------------------------------------------------------------------
 
@@ -478,15 +549,7 @@ class Plotter(object):
         """
         Compute the number of column of the data file.
         """
-        nbr = 0
-        f = open(file_name, 'r')
-        for line in f.readlines():
-            line = line.lstrip()
-            if line and line[0] != '#':
-                nbr = len(line.split())
-                break
-        f.close()
-        return nbr
+        return load_data(file_name).shape[1]
 
     #---------------------------------------------------------------------------
 
@@ -619,6 +682,9 @@ class Plotter(object):
         # close current figure
         plt.close()
 
+        # data of curves are kept, so cached files may be released
+        clear_data_cache()
+
     #---------------------------------------------------------------------------
 
     def __draw_curve(self, ax, curve, p):
@@ -635,7 +701,7 @@ class Plotter(object):
         yerr = curve.yerr
 
         # draw curve with error bars
-        if xerr or yerr:
+        if xerr is not None or yerr is not None:
             lines = ax.errorbar(xspan, yspan,
                                 xerr=xerr,
                                 yerr=yerr,
@@ -51,9 +51,11 @@ log.setLevel(logging.NOTSET)
 
 #-------------------------------------------------------------------------------
 
-def run_studymanager_command(_c, _log, pythondir = None):
+def run_studymanager_command(_c, _log, pythondir = None, cwd = None,
+                             env_vars = None):
     """
-    Run command with arguments.
+    Run command with arguments (in directory cwd if given, and with
+    additional environment variables env_vars if given).
     Redirection of the stdout or stderr of the command.
     """
     assert type(_c) == str or type(_c) == unicode
@@ -65,11 +67,14 @@ def run_studymanager_command(_c, _log, pythondir = None):
     except:
         _log.seek(0, 2)
 
+    if cwd == None:
+        cwd = os.getcwd()
+
     def __text(_t):
         return "\n\nExecution failed --> %s: %s" \
                 "\n - command: %s"                \
                 "\n - directory: %s\n\n" %        \
-                (_t, str(retcode), _c, os.getcwd())
+                (_t, str(retcode), _c, cwd)
 
     _l = ""
 
@@ -82,9 +87,13 @@ def run_studymanager_command(_c, _log, pythondir = None):
         pythonpath = pythondir + ':' + env.get("PYTHONPATH", '')
         env.update([("PYTHONPATH", pythonpath)])
 
+    if env_vars:
+        env.update(env_vars)
+
     try:
         t1 = time.time()
-        retcode = run_command(cmd, stdout=_log, stderr=_log, env=env)
+        retcode = run_command(cmd, stdout=_log, stderr=_log, env=env,
+                              cwd=cwd)
         t2 = time.time()
 
         if retcode < 0:
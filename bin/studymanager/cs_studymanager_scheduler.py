@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+#-------------------------------------------------------------------------------
+
+# This file is part of Code_Saturne, a general-purpose CFD tool.
+#
+# Copyright (C) 1998-2018 EDF S.A.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+#-------------------------------------------------------------------------------
+
+"""
+This module defines a scheduler running studymanager jobs (for example
+cases or post-processing scripts) concurrently, within a total budget of
+processors, and respecting dependencies between jobs.
+
+This module defines the following classes:
+- Scheduler
+"""
+
+#-------------------------------------------------------------------------------
+# Standard modules import
+#-------------------------------------------------------------------------------
+
+import sys
+import threading
+import logging
+
+#-------------------------------------------------------------------------------
+# log config.
+#-------------------------------------------------------------------------------
+
+logging.basicConfig()
+log = logging.getLogger(__file__)
+#log.setLevel(logging.DEBUG)
+log.setLevel(logging.NOTSET)
+
+#===============================================================================
+# Scheduler class
+#===============================================================================
+
+class Scheduler(object):
+    """
+    Run jobs concurrently, so that the sum of the number of processors
+    used by running jobs does not exceed a given budget.
+
+    Jobs are packed greedily: each time processors are freed, the largest
+    pending job fitting in the remaining budget is started, so that small
+    jobs fill the gaps left by larger ones. A job requiring more processors
+    than the whole budget is run alone.
+
+    A job may depend on previously added jobs, in which case it is started
+    only once they are finished (whether they succeeded or not).
+    """
+
+    def __init__(self, n_procs_max=None):
+        """
+        Constructor.
+        @type n_procs_max: C{int}
+        @param n_procs_max: total number of processors available for
+                            concurrent jobs (jobs run one at a time if None)
+        """
+        if not n_procs_max or n_procs_max < 1:
+            n_procs_max = 1
+        self.n_procs_max = n_procs_max
+
+        self.__jobs = []
+
+    #---------------------------------------------------------------------------
+
+    def add_job(self, func, args=(), n_procs=1, label=None, depends=None):
+        """
+        Add a job to the scheduler.
+        @type func: C{Function}
+        @param func: function called (in a separate thread) to run the job
+        @type args: C{Tuple}
+        @param args: arguments passed to func
+        @type n_procs: C{int}
+        @param n_procs: number of processors used by the job
+        @type label: C{String}
+        @param label: optional label of the job
+        @type depends: C{List}
+        @param depends: optional ids of jobs which must be finished
+                        before this job is started
+        @rtype: C{int}
+        @return: id of the job (its rank in the list of results)
+        """
+        try:
+            n_procs = max(1, int(n_procs))
+        except Exception:
+            n_procs = 1
+
+        # Only depending on previous jobs ensures there are no cycles
+
+        depends = list(depends or [])
+        for j in depends:
+            assert 0 <= j < len(self.__jobs)
+
+        self.__jobs.append({'func': func,
+                            'args': args,
+                            'n_procs': n_procs,
+                            'label': label,
+                            'depends': depends})
+
+        return len(self.__jobs) - 1
+
+    #---------------------------------------------------------------------------
+
+    def __select_job(self, pending, done, n_free, n_running):
+        """
+        Select the next job to start among pending jobs whose dependencies
+        are done, or return None if no such job can start with the
+        currently free processors.
+        """
+        ready = [j for j in pending
+                 if not [d for d in self.__jobs[j]['depends'] if d not in done]]
+
+        j_max = None
+        n_max = 0
+        for j in ready:
+            n = min(self.__jobs[j]['n_procs'], self.n_procs_max)
+            if n <= n_free and n > n_max:
+                j_max = j
+                n_max = n
+
+        # A job larger than the budget is run alone
+
+        if j_max == None and n_running == 0 and ready:
+            j_max = ready[0]
+
+        return j_max
+
+    #---------------------------------------------------------------------------
+
+    def run(self, start_hook=None):
+        """
+        Run all jobs, and wait for their completion.
+        @type start_hook: C{Function}
+        @param start_hook: optional function called with the job label
+                           (from the calling thread) when a job starts
+        @rtype: C{List}
+        @return: values returned by the jobs, in submission order
+        """
+        n_jobs = len(self.__jobs)
+        results = [None]*n_jobs
+        errors = []
+
+        pending = list(range(n_jobs))
+        done = set()
+        state = {'n_free': self.n_procs_max, 'n_running': 0}
+        cond = threading.Condition()
+
+        def _run_job(j, n_procs):
+            job = self.__jobs[j]
+            try:
+                results[j] = job['func'](*job['args'])
+            except BaseException:
+                errors.append((j, sys.exc_info()[1]))
+            finally:
+                with cond:
+                    done.add(j)
+                    state['n_free'] += n_procs
+                    state['n_running'] -= 1
+                    cond.notify()
+
+        threads = []
+
+        with cond:
+            while pending or state['n_running'] > 0:
+                j = None
+                if pending:
+                    j = self.__select_job(pending,
+                                          done,
+                                          state['n_free'],
+                                          state['n_running'])
+                if j == None:
+                    cond.wait()
+                    continue
+
+                pending.remove(j)
+                n_procs = min(self.__jobs[j]['n_procs'], self.n_procs_max)
+                state['n_free'] -= n_procs
+                state['n_running'] += 1
+
+                log.debug("start job %d (%d procs, %d free)"
+                          % (j, n_procs, state['n_free']))
+
+                if start_hook:
+                    start_hook(self.__jobs[j]['label'])
+
+                t = threading.Thread(target=_run_job, args=(j, n_procs))
+                t.daemon = True
+                t.start()
+                threads.append(t)
+
+        for t in threads:
+            t.join()
+
+        self.__jobs = []
+
+        # Errors (including sys.exit() calls) are raised in the calling thread
+
+        if errors:
+            errors.sort(key=lambda e: e[0])
+            raise errors[0][1]
+
+        return results
+
+#-------------------------------------------------------------------------------
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+#-------------------------------------------------------------------------------
+
+# This file is part of Code_Saturne, a general-purpose CFD tool.
+#
+# Copyright (C) 1998-2018 EDF S.A.
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51 Franklin
+# Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+#-------------------------------------------------------------------------------
+
+"""
+This module defines a persistent store of the state of studymanager runs,
+in an SQLite database in the destination directory, so that a session
+may be resumed, and cases whose inputs did not change since a successful
+run may be skipped.
+
+This module defines the following classes:
+- RunState
+"""
+
+#-------------------------------------------------------------------------------
+# Standard modules import
+#-------------------------------------------------------------------------------
+
+import os
+import hashlib
+import json
+import threading
+import time
+import logging
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+#-------------------------------------------------------------------------------
+# log config.
+#-------------------------------------------------------------------------------
+
+logging.basicConfig()
+log = logging.getLogger(__file__)
+#log.setLevel(logging.DEBUG)
+log.setLevel(logging.NOTSET)
+
+#===============================================================================
+# RunState class
+#===============================================================================
+
+class RunState(object):
+    """
+    Store, for each case of each study, the fingerprint of its inputs
+    (contents of the DATA and SRC directories of the case and of the
+    MESH directory of the study in the repository, and package version),
+    its status ('running', 'OK' or 'KO'), run id, run time, stage timings
+    and comparison results.
+
+    A new connection is used for each access, so that the store may be
+    updated from the threads running cases. If SQLite is not available
+    or the database cannot be opened, the store is disabled.
+    """
+
+    db_name = "studymanager_state.db"
+
+    #---------------------------------------------------------------------------
+
+    def __init__(self, dest, version=None):
+        """
+        Constructor.
+        @type dest: C{String}
+        @param dest: destination directory, containing the database
+                     (the store is disabled if None)
+        @type version: C{String}
+        @param version: package version, part of the inputs fingerprint
+        """
+        self.path = None
+        self.version = version
+        self.__lock = threading.Lock()
+        self.__hashes = {}
+
+        if sqlite3 == None or dest == None:
+            return
+
+        path = os.path.join(dest, self.db_name)
+
+        try:
+            c = sqlite3.connect(path, timeout=60)
+            c.execute("create table if not exists cases ("
+                      "study text, name text, fingerprint text, "
+                      "status text, run_id text, run_time real, "
+                      "timings text, compare text, updated real, "
+                      "primary key (study, name))")
+            c.execute("create table if not exists hashes ("
+                      "path text primary key, size integer, mtime real, "
+                      "hash text)")
+            c.commit()
+            c.close()
+            self.path = path
+        except Exception as e:
+            log.debug("run state disabled: %s" % str(e))
+
+    #---------------------------------------------------------------------------
+
+    def __execute(self, sql, args=()):
+        """
+        Execute a statement, returning all resulting rows.
+        """
+        with self.__lock:
+            c = sqlite3.connect(self.path, timeout=60)
+            try:
+                rows = c.execute(sql, args).fetchall()
+                c.commit()
+            finally:
+                c.close()
+        return rows
+
+    #---------------------------------------------------------------------------
+
+    def __file_hash(self, path):
+        """
+        Return a hash of the contents of a file, stored in the database
+        with the file's size and modification time so as to be computed
+        only once for files which do not change (such as meshes).
+        """
+        st = os.stat(path)
+        path = os.path.realpath(path)
+
+        h = self.__hashes.get((path, st.st_size, st.st_mtime))
+        if h != None:
+            return h
+
+        rows = self.__execute("select hash from hashes "
+                              "where path = ? and size = ? and mtime = ?",
+                              (path, st.st_size, st.st_mtime))
+        if rows:
+            h = rows[0][0]
+        else:
+            m = hashlib.sha1()
+            f = open(path, 'rb')
+            while True:
+                b = f.read(1 << 20)
+                if not b:
+                    break
+                m.update(b)
+            f.close()
+            h = m.hexdigest()
+            self.__execute("insert or replace into hashes values (?, ?, ?, ?)",
+                           (path, st.st_size, st.st_mtime, h))
+
+        self.__hashes[(path, st.st_size, st.st_mtime)] = h
+
+        return h
+
+    #---------------------------------------------------------------------------
+
+    def fingerprint(self, dirs, extra=()):
+        """
+        Return the fingerprint of the contents of a list of directories
+        (missing directories are ignored), of the package version, and of
+        extra run options.
+        @type dirs: C{List}
+        @param dirs: list of (label, path) directories
+        @type extra: C{List}
+        @param extra: list of other values defining the run
+        @rtype: C{String}
+        @return: fingerprint, or None if the store is disabled or a file
+                 cannot be read (so that the case is run)
+        """
+        if not self.path:
+            return None
+
+        m = hashlib.sha1()
+        m.update(str(self.version).encode('utf-8'))
+        for e in extra:
+            m.update(str(e).encode('utf-8'))
+
+        try:
+            for label, d in dirs:
+                if not os.path.isdir(d):
+                    continue
+                for root, subdirs, files in os.walk(d):
+                    subdirs.sort()
+                    for f in sorted(files):
+                        p = os.path.join(root, f)
+                        if not os.path.isfile(p):
+                            continue
+                        name = os.path.join(label, os.path.relpath(p, d))
+                        m.update(name.encode('utf-8'))
+                        m.update(self.__file_hash(p).encode('utf-8'))
+        except Exception as e:
+            log.debug("fingerprint not computed: %s" % str(e))
+            return None
+
+        return m.hexdigest()
+
+    #---------------------------------------------------------------------------
+
+    def get(self, study, name):
+        """
+        Return the stored state of a case as a dictionary, or None.
+        """
+        if not self.path:
+            return None
+
+        try:
+            rows = self.__execute("select fingerprint, status, run_id, "
+                                  "run_time, timings, compare from cases "
+                                  "where study = ? and name = ?",
+                                  (study, name))
+        except Exception:
+            return None
+
+        if not rows:
+            return None
+
+        r = rows[0]
+        return {'fingerprint': r[0],
+                'status': r[1],
+                'run_id': r[2],
+                'run_time': r[3],
+                'timings': json.loads(r[4] or 'null'),
+                'compare': json.loads(r[5] or 'null')}
+
+    #---------------------------------------------------------------------------
+
+    def set_run(self, study, name, fingerprint, status,
+                run_id=None, run_time=None, timings=None):
+        """
+        Record the run status of a case (comparison results are reset).
+        """
+        if not self.path:
+            return
+
+        try:
+            self.__execute("insert or replace into cases values "
+                           "(?, ?, ?, ?, ?, ?, ?, null, ?)",
+                           (study, name, fingerprint, status, run_id,
+                            run_time, json.dumps(timings), time.time()))
+        except Exception as e:
+            log.debug("run state not updated: %s" % str(e))
+
+    #---------------------------------------------------------------------------
+
+    def set_compare(self, study, name, compare):
+        """
+        Record the comparison results of a case.
+        """
+        if not self.path:
+            return
+
+        try:
+            self.__execute("update cases set compare = ?, updated = ? "
+                           "where study = ? and name = ?",
+                           (json.dumps(compare), time.time(), study, name))
+        except Exception as e:
+            log.debug("run state not updated: %s" % str(e))
+
+#-------------------------------------------------------------------------------
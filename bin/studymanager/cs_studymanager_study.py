@@ -34,12 +34,19 @@ import string
 import time
 import logging
 import fnmatch
+import tempfile
+import json
+import unittest
 
 #-------------------------------------------------------------------------------
 # Application modules import
 #-------------------------------------------------------------------------------
 
 from cs_exec_environment import get_shell_type, enquote_arg
+from cs_exec_environment import separate_args, get_command_single_value
+from cs_exec_environment import file_stamp
+from cs_io_reader import compare_files
+from cs_run_timings import read_run_timings, format_run_timings
 from cs_compile import files_to_compile, compile_and_link
 import cs_create
 from cs_create import set_executable
@@ -55,6 +62,8 @@ except Exception:
     pass
 
 from studymanager.cs_studymanager_run import run_studymanager_command
+from studymanager.cs_studymanager_scheduler import Scheduler
+from studymanager.cs_studymanager_state import RunState
 
 #-------------------------------------------------------------------------------
 # log config.
@@ -339,7 +348,7 @@ class Case(object):
 
     #---------------------------------------------------------------------------
 
-    def __suggest_run_id(self):
+    def __suggest_run_id(self, exec_dir):
 
         cmd = enquote_arg(os.path.join(self.pkg.get_dir('bindir'), self.exe)) + " run --suggest-id"
         if self.subdomains:
@@ -347,6 +356,7 @@ class Case(object):
         p = subprocess.Popen(cmd,
                              shell=True,
                              executable=get_shell_type(),
+                             cwd=exec_dir,
                              stdout=subprocess.PIPE,
                              stderr=subprocess.PIPE,
                              universal_newlines=True)
@@ -409,15 +419,58 @@ class Case(object):
 
     #---------------------------------------------------------------------------
 
-    def run(self):
+    def get_n_procs(self):
         """
-        Run the case a thread.
+        Return the number of processors used by a run of the case
+        (MPI processes times threads per process), so as to pack
+        concurrent runs.
         """
-        home = os.getcwd()
+        n_procs = self.__data['n_procs']
+        n_threads = None
+
         if self.subdomains:
-            os.chdir(os.path.join(self.__dest, self.label))
+            run_ref = os.path.join(self.__dest, self.label, "runcase")
         else:
-            os.chdir(os.path.join(self.__dest, self.label, 'SCRIPTS'))
+            run_ref = os.path.join(self.__dest, self.label, "SCRIPTS", "runcase")
+
+        if os.path.isfile(run_ref):
+            try:
+                runcase = cs_runcase.runcase(run_ref, create_if_missing=False,
+                                             ignore_batch=True)
+                if not n_procs:
+                    n_procs = runcase.get_nprocs()
+                n_threads = runcase.get_nthreads()
+            except Exception:
+                pass
+
+        n = 1
+        for v in (n_procs, n_threads):
+            try:
+                n *= max(1, int(v))
+            except Exception:
+                pass
+
+        return n
+
+    #---------------------------------------------------------------------------
+
+    def run(self, log=None, compile_jobs=None):
+        """
+        Run the case (possibly in a thread, as the working
+        directory of the process is not changed).
+        @type log: C{File}
+        @param log: log file for the run (studymanager log file if None)
+        @type compile_jobs: C{int}
+        @param compile_jobs: maximum number of concurrent compilation jobs
+                             of user sources (unless CS_COMPILE_JOBS is set)
+        """
+        if log == None:
+            log = self.__log
+
+        if self.subdomains:
+            exec_dir = os.path.join(self.__dest, self.label)
+        else:
+            exec_dir = os.path.join(self.__dest, self.label, 'SCRIPTS')
 
         if self.run_id:
             run_id = self.run_id
@@ -434,16 +487,15 @@ class Case(object):
                     self.is_run = "OK"
                     self.is_time = 0.
                     error = 0
-                os.chdir(home)
 
                 return error
 
         else:
-            run_id, run_dir = self.__suggest_run_id()
+            run_id, run_dir = self.__suggest_run_id(exec_dir)
 
             while os.path.isdir(run_dir):
                 time.sleep(5)
-                run_id, run_dir = self.__suggest_run_id()
+                run_id, run_dir = self.__suggest_run_id(exec_dir)
 
         self.run_id  = run_id
         self.run_dir = run_dir
@@ -451,24 +503,34 @@ class Case(object):
         self.__updateRuncase(run_id)
 
         if sys.platform.startswith('win'):
-            error, self.is_time = run_studymanager_command("runcase.bat", self.__log)
+            cmd = os.path.join(exec_dir, "runcase.bat")
         else:
-            error, self.is_time = run_studymanager_command("./runcase", self.__log)
+            cmd = os.path.join(exec_dir, "runcase")
+        env_vars = None
+        if compile_jobs and os.getenv('CS_COMPILE_JOBS') == None:
+            env_vars = {'CS_COMPILE_JOBS': str(compile_jobs)}
+
+        error, self.is_time = run_studymanager_command(enquote_arg(cmd), log,
+                                                       cwd=exec_dir,
+                                                       env_vars=env_vars)
 
         if not error:
             self.is_run = "OK"
         else:
             self.is_run = "KO"
 
-        os.chdir(home)
-
         return error
 
     #---------------------------------------------------------------------------
 
     def runCompare(self, studies, r, d, threshold, args, reference=None):
-        home = os.getcwd()
-
+        """
+        Compare checkpoint files of the repository and the destination.
+        @rtype: C{List}, C{True} or C{False}
+        @return: list of differences for fields of real values
+                 (name, max. difference, mean difference, threshold),
+                 and whether field sizes match.
+        """
         node = None
 
         if reference:
@@ -488,66 +550,180 @@ class Case(object):
             studies.reporting(msg)
         dest = os.path.join(result, dest, 'checkpoint', 'main')
 
-        cmd = self.__diff + ' ' + repo + ' ' + dest
-
         self.threshold = "default"
         if threshold != None:
-            cmd += ' --threshold ' + threshold
             self.threshold = threshold
 
+        # Filter options, similar to those of cs_io_dump --diff
+
+        section = None
+        location = None
         if args != None:
-            cmd += (" " + args)
-            l = args.split()
+            l = separate_args(args)
+            t = get_command_single_value(l, ('--threshold', '--threshold='))
+            if t != None:
+                self.threshold = t
+            section = get_command_single_value(l, ('--section', '--section='))
+            location = get_command_single_value(l, ('--location', '--location='))
+            if location != None:
+                location = int(location)
+
+        t = None
+        if self.threshold != "default":
+            t = float(self.threshold)
+
+        # Results are reused if neither checkpoint file nor options changed
+
+        stamp = {'repo': file_stamp(repo),
+                 'dest': file_stamp(dest),
+                 'threshold': t,
+                 'section': section,
+                 'location': location}
+
+        store = self.__loadCompareStore()
+        key = repo + " " + dest
+        entry = store.get(key)
+
+        if entry and entry['stamp'] == stamp:
+            studies.reporting("    - compare %s: checkpoint files unchanged, "
+                              "using stored results" % self.label)
+            results = entry['results']
+        else:
             try:
-                i = l.index('--threshold')
-                self.threshold = l[i+1]
-            except:
-                pass
+                diffs = compare_files(repo, dest, threshold=t,
+                                      section=section, location=location)
+            except Exception as e:
+                studies.reporting("Warning: comparison of %s and %s failed:\n%s"
+                                  % (repo, dest, str(e)))
+                diffs = None
+
+            # studymanager compare log only for field of real values
+            results = []
+            for r in (diffs or []):
+                if r.is_real():
+                    results.append({'name': r.name,
+                                    'max_diff': r.max_diff,
+                                    'mean_diff': r.mean_diff,
+                                    'threshold': self.threshold,
+                                    'status': r.status})
+
+            if diffs != None:
+                store[key] = {'stamp': stamp, 'results': results}
+                self.__saveCompareStore(store)
+
+        return self.__compareTable(results)
 
-        l = subprocess.Popen(cmd,
-                             shell=True,
-                             executable=get_shell_type(),
-                             stdout=subprocess.PIPE,
-                             universal_newlines=True).stdout
-        lines = l.readlines()
+    #---------------------------------------------------------------------------
 
+    def __compareTable(self, results):
+        """
+        Build the list of field differences from comparison results.
+        """
         # list of field differences
         tab = []
         # meshes have same sizes
         m_size_eq = True
 
-        # studymanager compare log only for field of real values
-        for i in range(len(lines)):
-            # only select line with "Type" (english and french) and ';'
-            # since this should be only true for heads of section
-            if lines[i].find("Type") != -1 and lines[i].find(";") != -1:
-                line = [x.replace("\""," ").strip() for x in lines[i].split(";")]
-                name = line[0]
-                info = [x.split(":") for x in line[1:]]
-                info = [[x[0].strip(),x[1].strip()] for x in info]
-
-                # section with at least 2 informations (location, type) after
-                # their name, and of type r (real)
-                if len(info) >= 2 and info[1][1] in ['r4', 'r8']:
-                    # if next line contains size, this means sizes are different
-                    if lines[i+1].find("Taille") != -1 or lines[i+1].find("Size") != -1:
-                        m_size_eq = False
-                        break
-                    else:
-                        line = [x.strip() for x in lines[i+1].split(";")]
-                        vals = [x.split(":") for x in line]
-                        vals = [[x[0].strip(),x[1].strip()] for x in vals]
-                        tab.append([name.replace("_", "\_"),
-                                    vals[1][1],
-                                    vals[2][1],
-                                    self.threshold])
-
-        os.chdir(home)
+        for r in results:
+            if r['status'] == 'size_mismatch':
+                m_size_eq = False
+                break
+            elif r['status'] == 'different':
+                tab.append([r['name'].replace("_", "\_"),
+                            "%g" % r['max_diff'],
+                            "%g" % r['mean_diff'],
+                            r['threshold']])
 
         return tab, m_size_eq
 
     #---------------------------------------------------------------------------
 
+    def __compareStorePath(self):
+        """
+        Return the path of the file storing comparison results of the case.
+        """
+        return os.path.join(self.__dest, self.label, "compare_results.json")
+
+    #---------------------------------------------------------------------------
+
+    def __loadCompareStore(self):
+        """
+        Load stored comparison results, indexed by compared files.
+        """
+        try:
+            f = open(self.__compareStorePath())
+            store = json.load(f)
+            f.close()
+        except Exception:
+            store = {}
+
+        return store
+
+    #---------------------------------------------------------------------------
+
+    def __saveCompareStore(self, store):
+        """
+        Save comparison results.
+        """
+        path = self.__compareStorePath()
+        if not os.path.isdir(os.path.dirname(path)):
+            return
+
+        try:
+            tmp = path + '.tmp'
+            f = open(tmp, 'w')
+            json.dump(store, f, indent=1, sort_keys=True)
+            f.close()
+            os.rename(tmp, path)
+        except Exception:
+            pass
+
+    #---------------------------------------------------------------------------
+
+    def loadCompare(self):
+        """
+        Load stored comparison results still matching the checkpoint files,
+        for a case which was not compared in the current run.
+        Only results for the current results directories of the case (those
+        which would be compared) are used, not those of previous runs.
+        @rtype: C{True} or C{False}
+        @return: True if stored results were found
+        """
+        result = os.path.join(self.__dest, self.label, self.resu)
+
+        is_compare, nodes, repo, dest, t, args = self.__parser.getCompare(self.node)
+        dirs = [d for c, d in zip(is_compare, dest) if c]
+        if not dirs:
+            dirs = [""]
+
+        current = []
+        for d in dirs:
+            rep, msg = self.check_dir(None, result, d, "dest")
+            if rep:
+                current.append(os.path.join(result, rep, 'checkpoint', 'main'))
+
+        found = False
+        for key, entry in sorted(self.__loadCompareStore().items()):
+            stamp = entry['stamp']
+            if stamp['repo'] == None or stamp['dest'] == None:
+                continue
+            if stamp['dest'][0] not in current:
+                continue
+            if file_stamp(stamp['repo'][0]) != stamp['repo'] \
+               or file_stamp(stamp['dest'][0]) != stamp['dest']:
+                continue
+            diff_value, m_size_eq = self.__compareTable(entry['results'])
+            self.diff_value += diff_value
+            self.m_size_eq = self.m_size_eq and m_size_eq
+            found = True
+
+        if found:
+            self.is_compare = "done"
+
+        return found
+
+    #---------------------------------------------------------------------------
+
     def run_ok(self, run_dir):
         """
         Check if a result directory contains an error file
@@ -1111,6 +1287,7 @@ class Studies(object):
         self.__quiet       = options.quiet
         self.__running     = options.runcase
         self.__n_iter      = options.n_iterations
+        self.__max_procs   = options.max_procs
         self.__compare     = options.compare
         self.__ref         = options.reference
         self.__postpro     = options.post
@@ -1120,6 +1297,14 @@ class Studies(object):
         # tex reports compilation with pdflatex
         self.__pdflatex    = not options.disable_pdflatex
 
+        # persistent run state, used to skip cases whose inputs did not
+        # change since a successful run, and resume interrupted sessions
+        if self.__xmlupdate:
+            self.__state   = RunState(None)
+        else:
+            self.__state   = RunState(self.__dest, pkg.version)
+        self.__use_state   = not options.ignore_state
+
         # in case of restart
         iok = 0
         for l, s in self.studies:
@@ -1307,71 +1492,239 @@ class Studies(object):
     def run(self):
         """
         Update and run all cases.
+        Cases are run concurrently if a total number of processors
+        is given (--max-procs option), and results are reported in order
+        once all runs are finished.
         Warning, if the markup of the case is repeated in the xml file of parameters,
-        the run of the case is also repeated.
+        the run of the case is also repeated (after the previous one, as
+        runs of a case share its execution directory).
+        With concurrent runs, the compilation of user sources of each case
+        uses at most the number of processors of the case.
         """
+        scheduler = Scheduler(self.__max_procs)
+        concurrent = (scheduler.n_procs_max > 1)
+
+        runs = []
+        skipped = []
+        case_jobs = {}
+
         for l, s in self.studies:
-            self.reporting("  o Script prepro and run of study: " + l)
+            self.reporting("  o Script prepro of study: " + l)
             for case in s.cases:
                 self.prepro(l, s, case)
                 if self.__running:
                     if case.compute == 'on' and case.is_compiled != "KO":
 
+                        # Skip cases already run with the same inputs
+                        fingerprint = self.__state.fingerprint(self.__case_inputs(s, case),
+                                                               self.__case_options(case))
+                        state = self.__state.get(s.label, self.__state_name(s, case))
+                        if self.__use_state and fingerprint and state \
+                           and state['fingerprint'] == fingerprint \
+                           and state['status'] == "OK":
+                            run_dir = os.path.join(self.__dest, s.label, case.label,
+                                                   case.resu, state['run_id'])
+                            if os.path.isdir(run_dir):
+                                case.is_run  = "OK"
+                                case.is_time = state['run_time']
+                                case.run_id  = state['run_id']
+                                case.run_dir = run_dir
+                                skipped.append((s, case))
+                                continue
+
                         if self.__n_iter:
                             if case.subdomains:
                                 case_dir = os.path.join(self.__dest, s.label, case.label,
                                                         case.subdomains[0], "DATA")
                             else:
                                 case_dir = os.path.join(self.__dest, s.label, case.label, "DATA")
-                            os.chdir(case_dir)
                             # Create a control_file in each case DATA
-                            if not os.path.exists('control_file'):
-                                control_file = open('control_file','w')
+                            control_path = os.path.join(case_dir, 'control_file')
+                            if not os.path.exists(control_path):
+                                control_file = open(control_path, 'w')
                                 control_file.write("time_step_limit " + str(self.__n_iter) + "\n")
                                 # Flush to ensure that control_file content is seen
                                 # when control_file is copied to the run directory on all systems
                                 control_file.flush()
-                                control_file.close
-
-                        self.reporting('    - running %s ...' % case.label,
-                                       stdout=True, report=False, status=True)
-                        error = case.run()
-                        if not error:
-                            if not case.run_id:
-                                self.reporting("    - run %s --> Warning suffix"
-                                               " is not read" % case.label)
-
-                            self.reporting('    - run %s --> OK (%s s) in %s' \
-                                           % (case.label, \
-                                              case.is_time, \
-                                              case.run_id))
-                            self.__parser.setAttribute(case.node,
-                                                       "compute",
-                                                       "off")
-
-                            # update dest="" attribute
-                            n1 = self.__parser.getChildren(case.node, "compare")
-                            n2 = self.__parser.getChildren(case.node, "script")
-                            n3 = self.__parser.getChildren(case.node, "data")
-                            n4 = self.__parser.getChildren(case.node, "probe")
-                            n5 = self.__parser.getChildren(case.node, "resu")
-                            n6 = self.__parser.getChildren(case.node, "input")
-                            for n in n1 + n2 + n3 + n4 + n5 + n6:
-                                if self.__parser.getAttribute(n, "dest") == "":
-                                    self.__parser.setAttribute(n, "dest", case.run_id)
-                        else:
-                            if not case.run_id:
-                                self.reporting('    - run %s --> FAILED' % case.label)
-                            else:
-                                self.reporting('    - run {0} --> FAILED in {1}'.format(case.label,
-                                                                                        case.run_id))
+                                control_file.close()
+
+                        # With concurrent runs, each run has its own log,
+                        # appended to the studymanager log when finished,
+                        # and compiles on its share of the processors
+                        n_procs = case.get_n_procs()
+                        run_log = None
+                        compile_jobs = None
+                        if concurrent:
+                            run_log = tempfile.TemporaryFile(mode='w+')
+                            compile_jobs = n_procs
+
+                        depends = []
+                        key = (s.label, case.label)
+                        if key in case_jobs:
+                            depends.append(case_jobs[key])
+
+                        case_jobs[key] = scheduler.add_job(self.__run_case,
+                                                           (s, case, fingerprint, run_log,
+                                                            compile_jobs),
+                                                           n_procs=n_procs,
+                                                           label=case.label,
+                                                           depends=depends)
+                        runs.append((s, case, run_log))
+
+        def _start_hook(label):
+            self.reporting('    - running %s ...' % label,
+                           stdout=True, report=False, status=True)
+
+        errors = scheduler.run(start_hook=_start_hook)
+
+        for s, case in skipped:
+            self.reporting('    - run %s --> inputs unchanged, skipped (%s)'
+                           % (case.label, case.run_id))
+            self.__set_run_attributes(case)
+
+        study_label = None
+        for (s, case, run_log), error in zip(runs, errors):
+            if s.label != study_label:
+                self.reporting("  o Run of study: " + s.label)
+                study_label = s.label
+            if run_log:
+                run_log.seek(0)
+                self.__log.write(run_log.read())
+                run_log.close()
+
+            if not error:
+                if not case.run_id:
+                    self.reporting("    - run %s --> Warning suffix"
+                                   " is not read" % case.label)
+
+                self.reporting('    - run %s --> OK (%s s) in %s' \
+                               % (case.label, \
+                                  case.is_time, \
+                                  case.run_id))
+
+                # time spent in each stage (not shown unless debugging)
+                if case.run_dir:
+                    timings = read_run_timings(case.run_dir)
+                    for l in format_run_timings(timings):
+                        self.reporting('        ' + l, stdout=self.__debug)
+                self.__set_run_attributes(case)
+            else:
+                if not case.run_id:
+                    self.reporting('    - run %s --> FAILED' % case.label)
+                else:
+                    self.reporting('    - run {0} --> FAILED in {1}'.format(case.label,
+                                                                            case.run_id))
 
-                        self.__log.flush()
+            self.__log.flush()
 
         self.reporting('')
 
     #---------------------------------------------------------------------------
 
+    def __case_inputs(self, s, case):
+        """
+        Return the list of (label, path) directories defining the inputs
+        of a case in the repository.
+        """
+        case_dir = os.path.join(self.__repo, s.label, case.label)
+
+        inputs = [('MESH', os.path.join(self.__repo, s.label, 'MESH'))]
+        for d in (case.subdomains or [None]):
+            for sub in ('DATA', 'SRC'):
+                if d:
+                    inputs.append((os.path.join(d, sub),
+                                   os.path.join(case_dir, d, sub)))
+                else:
+                    inputs.append((sub, os.path.join(case_dir, sub)))
+
+        return inputs
+
+    #---------------------------------------------------------------------------
+
+    def __case_options(self, case):
+        """
+        Return the list of options defining the run of a case, from the
+        file of parameters and the command line, as part of the
+        fingerprint of the case.
+        """
+        # Attributes not changing the run (or changed by the session)
+        ignored = ('status', 'compute', 'post', 'compare', 'tags')
+
+        attrs = self.__parser.getAttributes(case.node)
+        options = [self.__n_iter, case.get_n_procs()]
+        options += [(k, attrs[k]) for k in sorted(attrs) if k not in ignored]
+
+        for node in case.node.getElementsByTagName("prepro"):
+            attrs = self.__parser.getAttributes(node)
+            options.append([(k, attrs[k]) for k in sorted(attrs)])
+
+        return options
+
+    #---------------------------------------------------------------------------
+
+    def __state_name(self, s, case):
+        """
+        Return the name under which the state of a case is stored: its
+        label, followed by its rank when the markup of the case is
+        repeated in the file of parameters.
+        """
+        rank = 0
+        for node in self.__parser.getStudyNode(s.label).getElementsByTagName("case"):
+            if node is case.node:
+                break
+            if self.__parser.getAttribute(node, "label", "") == case.label:
+                rank += 1
+
+        if rank > 0:
+            return "%s:%d" % (case.label, rank + 1)
+        return case.label
+
+    #---------------------------------------------------------------------------
+
+    def __run_case(self, s, case, fingerprint, run_log, compile_jobs):
+        """
+        Run a case (possibly in a thread), recording its state before
+        and after the run, so that an interrupted session may be resumed.
+        """
+        name = self.__state_name(s, case)
+        self.__state.set_run(s.label, name, fingerprint, "running")
+
+        error = case.run(run_log, compile_jobs)
+
+        status = "OK"
+        if error:
+            status = "KO"
+        timings = None
+        if case.run_dir:
+            timings = read_run_timings(case.run_dir)
+        self.__state.set_run(s.label, name, fingerprint, status,
+                             case.run_id, case.is_time, timings)
+
+        return error
+
+    #---------------------------------------------------------------------------
+
+    def __set_run_attributes(self, case):
+        """
+        Update the file of parameters once a case is run.
+        """
+        self.__parser.setAttribute(case.node,
+                                   "compute",
+                                   "off")
+
+        # update dest="" attribute
+        n1 = self.__parser.getChildren(case.node, "compare")
+        n2 = self.__parser.getChildren(case.node, "script")
+        n3 = self.__parser.getChildren(case.node, "data")
+        n4 = self.__parser.getChildren(case.node, "probe")
+        n5 = self.__parser.getChildren(case.node, "resu")
+        n6 = self.__parser.getChildren(case.node, "input")
+        for n in n1 + n2 + n3 + n4 + n5 + n6:
+            if self.__parser.getAttribute(n, "dest") == "":
+                self.__parser.setAttribute(n, "dest", case.run_id)
+
+    #---------------------------------------------------------------------------
+
     def check_compare(self, destination=True):
         """
         Check coherency between xml file of parameters and repository.
@@ -1488,6 +1841,11 @@ class Studies(object):
                                                          args,
                                                          reference=ref)
 
+                        self.__state.set_compare(s.label,
+                                                 self.__state_name(s, case),
+                                                 {'m_size_eq': case.m_size_eq,
+                                                  'diff_value': case.diff_value})
+
         self.reporting('')
 
     #---------------------------------------------------------------------------
@@ -1541,14 +1899,47 @@ class Studies(object):
 
     #---------------------------------------------------------------------------
 
+    def __script_log(self, concurrent):
+        """
+        Return the log to which the output of a script is written: with
+        concurrent scripts, each script has its own log, appended to the
+        studymanager log when all scripts are finished.
+        """
+        if concurrent:
+            return tempfile.TemporaryFile(mode='w+')
+        return self.__log
+
+    #---------------------------------------------------------------------------
+
+    def __append_script_log(self, script_log):
+        """
+        Append the log of a script to the studymanager log.
+        """
+        if script_log != self.__log:
+            script_log.seek(0)
+            self.__log.write(script_log.read())
+            script_log.close()
+
+    #---------------------------------------------------------------------------
+
     def scripts(self):
         """
         Launch external additional scripts with arguments.
+        Scripts of different cases are run concurrently if a total number
+        of processors is given (--max-procs option), the scripts of a given
+        case being run in order, and results are reported in order once
+        all scripts are finished.
         """
+        scheduler = Scheduler(self.__max_procs)
+        concurrent = (scheduler.n_procs_max > 1)
+
+        studies = []
+
         for l, s in self.studies:
-            self.reporting("  o Run scripts of study: " + l)
+            scripts = []
             for case in s.cases:
                 script, label, nodes, args, repo, dest = self.__parser.getScript(case.node)
+                previous = None
                 for i in range(len(label)):
                     if script[i] and case.is_run != "KO":
                         cmd = os.path.join(self.__dest, l, "POST", label[i])
@@ -1563,10 +1954,33 @@ class Studies(object):
                             if dest[i]:
                                 d = os.path.join(self.__dest, l, case.label, "RESU", dest[i])
                                 cmd += " -d " + d
-                            retcode, t = run_studymanager_command(cmd, self.__log)
-                            self.reporting('    - script %s --> OK (%s s)' % (cmd, t))
+
+                            # A script may use results of previous scripts of the case
+                            depends = []
+                            if previous != None:
+                                depends.append(previous)
+
+                            script_log = self.__script_log(concurrent)
+                            previous = scheduler.add_job(run_studymanager_command,
+                                                         (cmd, script_log),
+                                                         label=cmd,
+                                                         depends=depends)
+                            scripts.append((cmd, previous, script_log))
                         else:
-                            self.reporting('    - script %s not found' % cmd)
+                            scripts.append((cmd, None, None))
+            studies.append((l, scripts))
+
+        results = scheduler.run()
+
+        for l, scripts in studies:
+            self.reporting("  o Run scripts of study: " + l)
+            for cmd, j, script_log in scripts:
+                if j == None:
+                    self.reporting('    - script %s not found' % cmd)
+                    continue
+                self.__append_script_log(script_log)
+                retcode, t = results[j]
+                self.reporting('    - script %s --> OK (%s s)' % (cmd, t))
 
         self.reporting('')
 
@@ -1575,7 +1989,18 @@ class Studies(object):
     def postpro(self):
         """
         Launch external additional scripts with arguments.
+        Post-processing scripts of different studies are run concurrently
+        if a total number of processors is given (--max-procs option), the
+        scripts of a given study being run in order, and results are
+        reported in order once all scripts are finished. As this is called
+        after scripts(), post-processing of a study always follows the
+        scripts of its cases.
         """
+        scheduler = Scheduler(self.__max_procs)
+        concurrent = (scheduler.n_procs_max > 1)
+
+        studies = []
+
         for l, s in self.studies:
             # fill results directories and ids for the cases of the current study
             # that were not run by the current studymanager command
@@ -1595,7 +2020,8 @@ class Studies(object):
             if not label:
                 continue
 
-            self.reporting('  o Postprocessing cases of study: ' + l)
+            scripts = []
+            previous = None
             for i in range(len(label)):
                 if script[i]:
                     cmd = os.path.join(self.__dest, l, "POST", label[i])
@@ -1608,20 +2034,43 @@ class Studies(object):
                         cmd += ' ' + args[i] + ' -c "' + list_cases + '" -d "' \
                                + list_dir + '" -s ' + l
 
-                        self.reporting('    - running postpro %s' % sc_name,
-                                       stdout=True, report=False, status=True)
+                        # A postpro script may use results of previous ones
+                        depends = []
+                        if previous != None:
+                            depends.append(previous)
+
+                        script_log = self.__script_log(concurrent)
+                        previous = scheduler.add_job(run_studymanager_command,
+                                                     (cmd, script_log),
+                                                     label=sc_name,
+                                                     depends=depends)
+                        scripts.append((sc_name, cmd, previous, script_log))
+                    else:
+                        scripts.append((None, cmd, None, None))
+            studies.append((l, scripts))
 
-                        retcode, t = run_studymanager_command(cmd, self.__log)
+        def _start_hook(sc_name):
+            self.reporting('    - running postpro %s' % sc_name,
+                           stdout=True, report=False, status=True)
 
-                        self.reporting('    - postpro %s --> OK (%s s)' \
-                                       % (sc_name, t),
-                                       stdout=True, report=False)
+        results = scheduler.run(start_hook=_start_hook)
 
-                        self.reporting('    - postpro %s --> OK (%s s)' \
-                                       % (cmd, t),
-                                       stdout=False, report=True)
-                    else:
-                        self.reporting('    - postpro %s not found' % cmd)
+        for l, scripts in studies:
+            self.reporting('  o Postprocessing cases of study: ' + l)
+            for sc_name, cmd, j, script_log in scripts:
+                if j == None:
+                    self.reporting('    - postpro %s not found' % cmd)
+                    continue
+                self.__append_script_log(script_log)
+                retcode, t = results[j]
+
+                self.reporting('    - postpro %s --> OK (%s s)' \
+                               % (sc_name, t),
+                               stdout=True, report=False)
+
+                self.reporting('    - postpro %s --> OK (%s s)' \
+                               % (cmd, t),
+                               stdout=False, report=True)
 
         self.reporting('')
 
@@ -1783,6 +2232,13 @@ class Studies(object):
                        self.__parser.write(),
                        self.__pdflatex)
 
+        # Comparisons not run now are read from stored results
+
+        for l, s in self.studies:
+            for case in s.cases:
+                if case.compare == 'on' and case.is_compare == "not done":
+                    case.loadCompare()
+
         for l, s in self.studies:
             for case in s.cases:
                 if case.diff_value or not case.m_size_eq:
@@ -1903,3 +2359,116 @@ class Studies(object):
             pass
 
 #-------------------------------------------------------------------------------
+# Studies test case
+#-------------------------------------------------------------------------------
+
+class StudiesTestCase(unittest.TestCase):
+    """
+    Test the scheduling of case runs.
+    """
+
+    class _Case(object):
+        """
+        Case recording the time interval of its runs.
+        """
+        def __init__(self, node, label, intervals):
+            self.node = node
+            self.label = label
+            self.compute = "on"
+            self.is_compiled = "not done"
+            self.is_run = "not done"
+            self.is_time = None
+            self.subdomains = None
+            self.resu = "RESU"
+            self.run_id = ""
+            self.run_dir = ""
+            self.intervals = intervals
+
+        def get_n_procs(self):
+            return 2
+
+        def run(self, log=None, compile_jobs=None):
+            t0 = time.time()
+            time.sleep(0.2)
+            self.intervals.append((self.label, t0, time.time(), compile_jobs))
+            self.run_id = "run%d" % len(self.intervals)
+            self.is_run = "OK"
+            self.is_time = "0.20"
+            return 0
+
+    def setUp(self):
+        """This method is executed before all 'check' methods."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.xml = os.path.join(self.tmp_dir, "smgr.xml")
+        f = open(self.xml, 'w')
+        f.write('<?xml version="1.0"?>\n'
+                '<studymanager>'
+                '<repository>%s</repository>'
+                '<destination>%s</destination>'
+                '<study label="STUDY" status="on">'
+                '<case label="CASE1" status="on" compute="on" post="on"/>'
+                '<case label="CASE2" status="on" compute="on" post="on"/>'
+                '<case label="CASE1" status="on" compute="on" post="on"/>'
+                '</study>'
+                '</studymanager>' % (self.tmp_dir, self.tmp_dir))
+        f.close()
+
+    def tearDown(self):
+        """This method is executed after all 'check' methods."""
+        shutil.rmtree(self.tmp_dir)
+
+    def checkRunRepeatedCase(self):
+        """Check whether runs of a repeated case markup are not concurrent"""
+        parser = Parser(self.xml)
+
+        intervals = []
+        study = Study.__new__(Study)
+        study.label = "STUDY"
+        study.cases = [self._Case(node, str(node.getAttribute("label")), intervals)
+                       for node in parser.getStudyNode("STUDY").getElementsByTagName("case")]
+
+        studies = Studies.__new__(Studies)
+        studies._Studies__parser = parser
+        studies._Studies__repo = self.tmp_dir
+        studies._Studies__dest = self.tmp_dir
+        studies._Studies__max_procs = 4
+        studies._Studies__n_iter = None
+        studies._Studies__running = True
+        studies._Studies__state = RunState(None)
+        studies._Studies__use_state = False
+        studies._Studies__debug = False
+        studies._Studies__quiet = True
+        studies._Studies__log = tempfile.TemporaryFile(mode='w+')
+        studies.reportFile = tempfile.TemporaryFile(mode='w+')
+        studies.studies = [("STUDY", study)]
+
+        studies.run()
+
+        runs = sorted([i for i in intervals if i[0] == "CASE1"],
+                      key=lambda i: i[1])
+        assert len(intervals) == 3, 'Could not run all cases'
+        assert runs[0][2] <= runs[1][1], \
+            'Runs of a repeated case are concurrent'
+        assert min([i[1] for i in intervals if i[0] == "CASE2"]) < runs[0][2], \
+            'Runs of different cases are not concurrent'
+        assert [i[3] for i in intervals] == [2, 2, 2], \
+            'Compilation jobs of concurrent runs are not limited'
+
+        studies._Studies__log.close()
+        studies.reportFile.close()
+
+
+def suite():
+    """unittest function"""
+    testSuite = unittest.makeSuite(StudiesTestCase, "check")
+    return testSuite
+
+
+def runTest():
+    """unittest function"""
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
+
+#-------------------------------------------------------------------------------
+# End
+#-------------------------------------------------------------------------------
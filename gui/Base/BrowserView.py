@@ -114,6 +114,7 @@ class TreeModel(QAbstractItemModel):
         rootData.append(to_qvariant("Pages"))
 
         self.rootItem = TreeItem(rootData, "folder")
+        self.labelIndex = {}
         self.populateModel(data.split("\n"), self.rootItem)
 
 
@@ -296,10 +297,24 @@ class TreeModel(QAbstractItemModel):
 
     def itemLocalization(self, data, role=Qt.DisplayRole):
         """
+        Return the list of (row, column, parent) of the items matching data.
+
+        For the display role, items are found through the label index
+        built by populateModel, instead of a traversal of the whole tree.
         """
         info = []
         search_item = from_qvariant(to_qvariant(data), to_text_string)
 
+        if role == Qt.DisplayRole:
+            for item in self.labelIndex.get(search_item, []):
+                parentItem = item.parent()
+                if parentItem == self.rootItem:
+                    parent = QModelIndex()
+                else:
+                    parent = self.createIndex(parentItem.row(), 0, parentItem)
+                info.append( (item.row(), 0, parent) )
+            return info
+
         start = self.index(0, 0, QModelIndex())
         indexList = self.match(start, role, search_item, -1, Qt.MatchExactly)
 
@@ -362,7 +377,12 @@ class TreeModel(QAbstractItemModel):
                         indentations.pop()
 
                 # Append a new item to the current parent's list of children.
-                parents[-1].appendChild(TreeItem(columnData, typename, parents[-1]))
+                item = TreeItem(columnData, typename, parents[-1])
+                parents[-1].appendChild(item)
+
+                # Index the item by its label.
+                label = from_qvariant(to_qvariant(columnData[0]), to_text_string)
+                self.labelIndex.setdefault(label, []).append(item)
 
 #-------------------------------------------------------------------------------
 #
@@ -401,6 +421,9 @@ class BrowserView(QWidget, Ui_BrowserForm):
         self.treeView.expanded[QModelIndex].connect(self.onFolderOpen)
         self.treeView.collapsed[QModelIndex].connect(self.onFolderClose)
 
+        # Pending row visibility changes (label -> hidden), when batched
+        self.__rowHidden = None
+
 
     def _browser(self):
         tree ="""
@@ -463,28 +486,64 @@ Calculation management
         return tree
 
 
-    def setRowClose(self, string):
-        log.debug("setRowClose(): %s" % string)
+    def __setRowHidden(self, string, hidden):
+        """
+        Private method. Hide or show the rows matching a label, or record
+        the change if changes are batched.
+        """
+        if self.__rowHidden != None:
+            self.__rowHidden[string] = hidden
+            return
+
         itemInfoList = self.model.itemLocalization(string)
         for itemInfo in itemInfoList:
             row    = itemInfo[0]
             column = itemInfo[1]
             parent = itemInfo[2]
-            self.treeView.setRowHidden(row, parent, True)
+            if self.treeView.isRowHidden(row, parent) != hidden:
+                self.treeView.setRowHidden(row, parent, hidden)
+
+
+    def beginRowChanges(self):
+        """
+        Public method. Batch the following setRowClose and setRowOpen calls,
+        so that only the final state of each row is applied, in a single
+        update of the view, by endRowChanges.
+        """
+        self.__rowHidden = {}
+
+
+    def endRowChanges(self):
+        """
+        Public method. Apply the batched row visibility changes.
+        """
+        rowHidden = self.__rowHidden
+        self.__rowHidden = None
+        if not rowHidden:
+            return
+
+        self.treeView.setUpdatesEnabled(False)
+        try:
+            for string, hidden in rowHidden.items():
+                self.__setRowHidden(string, hidden)
+        finally:
+            self.treeView.setUpdatesEnabled(True)
+
+
+    def setRowClose(self, string):
+        log.debug("setRowClose(): %s" % string)
+        self.__setRowHidden(string, True)
 
 
     def setRowOpen(self, string):
         log.debug("setRowOpen(): %s" % string)
-        itemInfoList = self.model.itemLocalization(string)
-        for itemInfo in itemInfoList:
-            row    = itemInfo[0]
-            column = itemInfo[1]
-            parent = itemInfo[2]
-            self.treeView.setRowHidden(row, parent, False)
+        self.__setRowHidden(string, False)
 
 
     def isRowClose(self, string):
         log.debug("isRowClose(): %s" % string)
+        if self.__rowHidden and string in self.__rowHidden:
+            return self.__rowHidden[string]
         itemInfoList = self.model.itemLocalization(string)
         for itemInfo in itemInfoList:
             row    = itemInfo[0]
@@ -655,6 +714,18 @@ Calculation management
         Public method.
         Configures the browser with users data.
         """
+        self.beginRowChanges()
+        try:
+            self.__configureTree(case)
+        finally:
+            self.endRowChanges()
+
+
+    def __configureTree(self, case):
+        """
+        Private method.
+        Set the visibility of the browser rows according to users data.
+        """
         self.setRowClose(self.tr('Particles and droplets tracking'))
         self.setRowClose(self.tr('Gas combustion'))
         self.setRowClose(self.tr('Pulverized fuel combustion'))
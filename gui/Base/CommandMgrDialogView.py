@@ -39,6 +39,13 @@ Generic Dialog window to handle execution of a list of external scripts.
 
 import os, logging
 import signal, subprocess
+import shutil, tempfile
+from collections import deque
+
+try:
+    from html import escape  # Python3
+except ImportError:
+    from cgi import escape  # Python2
 
 #-------------------------------------------------------------------------------
 # Third-party modules
@@ -145,7 +152,19 @@ class CommandMgrLinesDisplayedDialogView(QDialog, Ui_CommandMgrLinesDisplayedDia
 class CommandMgrDialogView(QDialog, Ui_CommandMgrDialogForm):
     """
     Open a dialog to start external programs and display its output.
+
+    Only the last lines of the output are kept in the display zone:
+    incoming lines are buffered in a bounded queue and appended in batches
+    on a timer, while the complete output is spooled to a temporary file
+    (used when saving the log).
     """
+
+    # Default number of lines kept in the display zone (0 for unlimited)
+    lines_max = 10000
+
+    # Delay (in ms) between updates of the display zone
+    flush_delay = 200
+
     def __init__(self, parent, title, cmd, start_directory="", obj_salome=""):
         """
         Constructor. Must be overriden.
@@ -168,11 +187,30 @@ class CommandMgrDialogView(QDialog, Ui_CommandMgrDialogForm):
 
         self.objBr = obj_salome
 
+        # Display zone, pending lines ring buffer, and spool file
+
+        self.logText.setMaximumBlockCount(self.lines_max)
+        self.__pending = deque(maxlen=self.lines_max or None)
+        self.__n_dropped = 0
+
+        try:
+            self.__spool = tempfile.TemporaryFile(prefix='cs_log_')
+        except Exception:
+            self.__spool = None
+
+        self.__timer = QTimer(self)
+        self.__timer.setInterval(self.flush_delay)
+        self.__timer.timeout.connect(self.__slotFlush)
+
         self.proc.readyReadStandardOutput.connect(self.slotReadFromStdout)
         self.proc.readyReadStandardError.connect(self.slotReadFromStderr)
         self.pushButtonLines.clicked.connect(self.__slotLines)
         self.pushButtonSaveAs.clicked.connect(self.__slotSaveAs)
         self.pushButtonKill.clicked.connect(self.__slotKill)
+        self.lineEditSearch.returnPressed.connect(self.__slotFindNext)
+        self.pushButtonFindNext.clicked.connect(self.__slotFindNext)
+        self.pushButtonFindPrevious.clicked.connect(self.__slotFindPrevious)
+        self.checkBoxFollow.toggled.connect(self.__slotFollow)
         self.proc.started.connect(self.slotStarted)
         self.proc.finished.connect(self.slotFinished)
 
@@ -209,6 +247,9 @@ class CommandMgrDialogView(QDialog, Ui_CommandMgrDialogForm):
         else:
             print("finished with exit code " + str(exitCode))
 
+        self.__slotFlush()
+        self.__timer.stop()
+
         # if the GUI is launched through SALOME, update the object browser
         # in order to display results
         if self.objBr:
@@ -229,13 +270,15 @@ class CommandMgrDialogView(QDialog, Ui_CommandMgrDialogForm):
         Private slot. Manage the number of lines allowed in the display zone.
         """
         default = {}
-        default['lines'] = self.logText.document().maximumBlockCount()
+        default['lines'] = self.logText.maximumBlockCount()
         dlg = CommandMgrLinesDisplayedDialogView(self, default)
         if dlg.exec_():
             result = dlg.get_result()
             n = int(result['lines'])
             if n != default['lines']:
-                self.logText.document().setMaximumBlockCount(n)
+                self.__slotFlush()
+                self.logText.setMaximumBlockCount(n)
+                self.__pending = deque(maxlen=n or None)
 
 
     @pyqtSlot()
@@ -295,7 +338,8 @@ class CommandMgrDialogView(QDialog, Ui_CommandMgrDialogForm):
     @pyqtSlot()
     def __slotSaveAs(self):
         """
-        Private slot. Save the contain of the display zone.
+        Private slot. Save the complete output (or the contain of the
+        display zone if it could not be spooled).
         """
         if hasattr(self, 'suffix'):
             l = self.log + "." + self.suffix
@@ -317,10 +361,145 @@ class CommandMgrDialogView(QDialog, Ui_CommandMgrDialogForm):
             QMessageBox.warning(self, self.tr('Error'), self.tr('Could not open file for writing'))
             return
 
-        logFile.write(self.logText.toPlainText().encode("utf-8"))
+        if self.__spool:
+            self.__spool.flush()
+            self.__spool.seek(0)
+            logFile.close()
+            logFile = open(str(fileName), 'wb')
+            shutil.copyfileobj(self.__spool, logFile)
+            self.__spool.seek(0, os.SEEK_END)
+        else:
+            logFile.write(self.logText.toPlainText().encode("utf-8"))
         logFile.close()
 
 
+    def appendLog(self, s, error=False):
+        """
+        Public method. Add a line of output to the spool file and to the
+        lines waiting to be displayed (older pending lines are dropped
+        if more lines than the display zone can hold arrive between
+        two updates).
+        """
+        if self.__spool:
+            try:
+                self.__spool.write((s + '\n').encode("utf-8"))
+            except Exception:
+                self.__spool = None
+
+        if len(self.__pending) == self.__pending.maxlen:
+            self.__n_dropped += 1
+        self.__pending.append((s, error))
+
+        if not self.__timer.isActive():
+            self.__timer.start()
+
+
+    @pyqtSlot()
+    def __slotFlush(self):
+        """
+        Private slot. Append the pending lines to the display zone,
+        grouping consecutive lines of the same kind in a single update.
+        """
+        if not self.__pending:
+            self.__timer.stop()
+            return
+
+        follow = self.checkBoxFollow.isChecked()
+        bar = self.logText.verticalScrollBar()
+        position = bar.value()
+
+        self.logText.setUpdatesEnabled(False)
+
+        if self.__n_dropped > 0:
+            self.logText.appendPlainText("[... %d lines not displayed ...]"
+                                         % self.__n_dropped)
+            self.__n_dropped = 0
+
+        lines = []
+        error = False
+        while self.__pending:
+            s, e = self.__pending.popleft()
+            if e != error and lines:
+                self.__appendLines(lines, error)
+                lines = []
+            lines.append(s)
+            error = e
+        if lines:
+            self.__appendLines(lines, error)
+
+        if follow:
+            bar.setValue(bar.maximum())
+        else:
+            bar.setValue(position)
+
+        self.logText.setUpdatesEnabled(True)
+
+
+    def __appendLines(self, lines, error):
+        """
+        Private method. Append a group of lines to the display zone.
+        """
+        if error:
+            html = "<br>".join([escape(l) for l in lines])
+            self.logText.appendHtml('<font color="red">' + html + '</font>')
+        else:
+            self.logText.appendPlainText("\n".join(lines))
+
+
+    def __find(self, backward=False):
+        """
+        Private method. Find the search string in the display zone,
+        wrapping around its start or end.
+        """
+        text = to_text_string(self.lineEditSearch.text())
+        if not text:
+            return
+
+        flags = QTextDocument.FindFlags()
+        if backward:
+            flags |= QTextDocument.FindBackward
+
+        if not self.logText.find(text, flags):
+            cursor = self.logText.textCursor()
+            if backward:
+                cursor.movePosition(QTextCursor.End)
+            else:
+                cursor.movePosition(QTextCursor.Start)
+            self.logText.setTextCursor(cursor)
+            self.logText.find(text, flags)
+
+        # Do not jump away from the found text on the next update
+        self.checkBoxFollow.setChecked(False)
+
+
+    @pyqtSlot()
+    def __slotFindNext(self):
+        """
+        Private slot. Find the next occurence of the search string.
+        """
+        self.__find()
+
+
+    @pyqtSlot()
+    def __slotFindPrevious(self):
+        """
+        Private slot. Find the previous occurence of the search string.
+        """
+        self.__find(backward=True)
+
+
+    @pyqtSlot(bool)
+    def __slotFollow(self, checked):
+        """
+        Private slot. Go to the end of the display zone when following
+        the tail of the output.
+        """
+        if checked:
+            self.__slotFlush()
+            bar = self.logText.verticalScrollBar()
+            bar.setValue(bar.maximum())
+
+
     @pyqtSlot()
     def slotReadFromStdout(self):
         """
@@ -334,7 +513,7 @@ class CommandMgrDialogView(QDialog, Ui_CommandMgrDialogForm):
             ba = self.proc.readLine()
             if ba.isNull(): return
             s = (ba.data()).decode("utf-8")[:-1]
-            self.logText.append(s)
+            self.appendLog(s)
 
 
     @pyqtSlot()
@@ -350,7 +529,7 @@ class CommandMgrDialogView(QDialog, Ui_CommandMgrDialogForm):
             ba = self.proc.readLine()
             if ba.isNull(): return
             s = (ba.data()).decode("utf-8")[:-1]
-            self.logText.append('<font color="red">' + s + '</font>')
+            self.appendLog(s, error=True)
 
 
     def closeEvent(self, event):
@@ -358,6 +537,10 @@ class CommandMgrDialogView(QDialog, Ui_CommandMgrDialogForm):
         Public Method. Close the Dialog window.
         """
         self.__slotKill()
+        self.__timer.stop()
+        if self.__spool:
+            self.__spool.close()
+            self.__spool = None
         event.accept()
 
 
@@ -79,7 +79,7 @@ from code_saturne.Base.BrowserView import BrowserView
 from code_saturne.Base import XMLengine, QtCase
 from code_saturne.Base.XMLinitialize import *
 from code_saturne.Base.XMLmodel import *
-from code_saturne.Base.Toolbox import GuiParam, displaySelectedPage
+from code_saturne.Base.Toolbox import GuiParam, displaySelectedPage, clearPageCache
 from code_saturne.Base.Common import XML_DOC_VERSION
 
 try:
@@ -89,7 +89,6 @@ except:
 
 from code_saturne.Pages.WelcomeView import WelcomeView
 from code_saturne.Pages.IdentityAndPathesModel import IdentityAndPathesModel
-from code_saturne.Pages.XMLEditorView import XMLEditorView
 from code_saturne.Pages.ScriptRunningModel import ScriptRunningModel
 from code_saturne.Base.QtPage import getexistingdirectory
 from code_saturne.Base.QtPage import from_qvariant, to_text_string, getopenfilename, getsavefilename
@@ -660,7 +659,7 @@ class MainView(object):
             self.dockWidgetBrowserDisplay(True)
 
             self.case['salome'] = self.salome
-            self.scrollArea.setWidget(self.displayFisrtPage())
+            self.setPage(self.displayFisrtPage())
             self.case['saved'] = "yes"
 
             self.case.undo_signal.connect(self.slotUndoRedoView)
@@ -691,7 +690,7 @@ class MainView(object):
                 self.dockWidgetBrowserDisplay(True)
 
                 self.case['salome'] = self.salome
-                self.scrollArea.setWidget(self.displayFisrtPage())
+                self.setPage(self.displayFisrtPage())
                 self.case['saved'] = "yes"
 
                 self.actionPrepro.setEnabled(True)
@@ -785,6 +784,9 @@ class MainView(object):
 
         # Instantiate a new case
 
+        if hasattr(self, 'case'):
+            clearPageCache(self.case)
+
         try:
             self.case = QtCase.QtCase(package=self.package, file_name=file_name)
         except:
@@ -837,7 +839,7 @@ class MainView(object):
         msg = self.tr("Loaded: %s" % fn)
         self.statusbar.showMessage(msg, 2000)
 
-        self.scrollArea.setWidget(self.displayFisrtPage())
+        self.setPage(self.displayFisrtPage())
 
         self.case['saved'] = "yes"
 
@@ -917,6 +919,7 @@ class MainView(object):
         print the case (xml file) on the current terminal
         """
         if hasattr(self, 'case'):
+            from code_saturne.Pages.XMLEditorView import XMLEditorView
             dialog = XMLEditorView(self, self.case)
             dialog.show()
 
@@ -1188,7 +1191,7 @@ class MainView(object):
                                          self.Browser)
 
         if self.page is not None:
-            self.scrollArea.setWidget(self.page)
+            self.setPage(self.page)
 
         else:
             log.debug("displayNewPage() self.page == None")
@@ -1384,12 +1387,23 @@ class MainViewSaturne(QMainWindow, Ui_MainForm, MainView):
         return XMLinit(self.case).initialize(self.case['prepro'])
 
 
+    def setPage(self, page):
+        """
+        Display a page in the main frame. The previous page is taken back
+        from the scroll area, so that it is not destroyed if it is kept
+        in the cache of pages.
+        """
+        if self.scrollArea.widget() is not page:
+            self.scrollArea.takeWidget()
+            self.scrollArea.setWidget(page)
+
+
     def displayWelcomePage(self):
         """
         Display the Welcome (and the default) page
         """
         self.page = WelcomeView()
-        self.scrollArea.setWidget(self.page)
+        self.setPage(self.page)
 
 
     def displayFisrtPage(self):
@@ -1470,14 +1484,9 @@ class MainViewSaturne(QMainWindow, Ui_MainForm, MainView):
                                              python_record[2]])
 
             last_record = self.case['undo'].pop()
-            self.case.record_func_prev = None
-            self.case.xml_prev = ""
-            self.case['redo'].append([last_record[0],
-                                      self.case.toString(),
-                                      last_record[2],
-                                      last_record[3]])
-
-            self.case.parseString(last_record[1])
+            self.case['redo'].append(self.case.undoRevert(last_record))
+            clearPageCache(self.case)
+
             self.Browser.activeSelectedPage(last_record[2])
             self.Browser.configureTree(self.case)
             self.case['current_index'] = last_record[2]
@@ -1491,7 +1500,7 @@ class MainViewSaturne(QMainWindow, Ui_MainForm, MainView):
                                     stbar=self.statusbar,
                                     study=self.Id,
                                     tree=self.Browser)
-            self.scrollArea.setWidget(p)
+            self.setPage(p)
 
 
     def slotRedo(self):
@@ -1505,14 +1514,9 @@ class MainViewSaturne(QMainWindow, Ui_MainForm, MainView):
                                              python_record[2]])
 
             last_record = self.case['redo'].pop()
-            self.case.record_func_prev = None
-            self.case.xml_prev = ""
-            self.case['undo'].append([last_record[0],
-                                      self.case.toString(),
-                                      last_record[2],
-                                      last_record[3]])
-
-            self.case.parseString(last_record[1])
+            self.case['undo'].append(self.case.undoRevert(last_record))
+            clearPageCache(self.case)
+
             self.Browser.activeSelectedPage(last_record[2])
             self.Browser.configureTree(self.case)
             self.case['current_index'] = last_record[2]
@@ -1526,7 +1530,7 @@ class MainViewSaturne(QMainWindow, Ui_MainForm, MainView):
                                     stbar=self.statusbar,
                                     study=self.Id,
                                     tree=self.Browser)
-            self.scrollArea.setWidget(p)
+            self.setPage(p)
 
 
     def slotPreproMode(self):
@@ -1537,6 +1541,7 @@ class MainViewSaturne(QMainWindow, Ui_MainForm, MainView):
         rt = mdl.getRunType(self.case['prepro'])
         self.case['prepro'] = True
         self.initCase()
+        clearPageCache(self.case)
         mdl.setRunType(rt)
         self.Browser.configureTree(self.case)
         if self.case['current_page'] == 'Prepare batch calculation':
@@ -1546,7 +1551,7 @@ class MainViewSaturne(QMainWindow, Ui_MainForm, MainView):
                                     stbar=self.statusbar,
                                     study=self.Id,
                                     tree=self.Browser)
-            self.scrollArea.setWidget(p)
+            self.setPage(p)
 
 
     def slotCalculationMode(self):
@@ -1556,6 +1561,7 @@ class MainViewSaturne(QMainWindow, Ui_MainForm, MainView):
         mdl = ScriptRunningModel(self.case)
         self.case['prepro'] = False
         self.initCase()
+        clearPageCache(self.case)
         mdl.setRunType('standard')
         self.Browser.configureTree(self.case)
         if self.case['current_page'] == 'Prepare batch calculation':
@@ -1565,7 +1571,7 @@ class MainViewSaturne(QMainWindow, Ui_MainForm, MainView):
                                     stbar=self.statusbar,
                                     study=self.Id,
                                     tree=self.Browser)
-            self.scrollArea.setWidget(p)
+            self.setPage(p)
 
 
     def slotUndoRedoView(self):
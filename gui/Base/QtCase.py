@@ -25,6 +25,11 @@
 """
 This module extends a case with undo/redo functionnality.
 
+Undo/redo records do not store copies of the XML document, but the
+journal of elementary modifications (attribute, text, child insertion or
+removal) done since the record, so that their cost is proportional to
+the size of the modifications.
+
 This module defines the following classes:
 - QtCase
 """
@@ -54,6 +59,9 @@ from code_saturne.Base.QtCore    import *
 class QtCase(Case, QObject):
     undo_signal = pyqtSignal()
 
+    # Maximum number of undo records kept
+    undo_max = 500
+
     def __init__(self, package=None, file_name="", studymanager=False):
         """
         Instantiate a new dico and a new xml doc
@@ -61,6 +69,9 @@ class QtCase(Case, QObject):
         Case.__init__(self, package, file_name, studymanager)
         QObject.__init__(self)
 
+        # Index the document, as the GUI may do many lookups in large cases
+        self.xml_index_enabled = True
+
 
     def undoStop(self):
         self.record_local = True
@@ -78,13 +89,52 @@ class QtCase(Case, QObject):
         self.record_global = True
 
 
+    def __undoModified(self):
+        """
+        Return True if the document may have been modified since the
+        last undo record.
+        """
+        if self['undo'] and self['undo'][-1][1] is self.xml_journal:
+            return self.xml_journal != []
+        return True
+
+
+    def __undoRecord(self):
+        """
+        Add an undo record, to which following modifications are journaled.
+        """
+        self.xml_journal = []
+        self['undo'].append([self['current_page'], self.xml_journal, self['current_index'], self['current_tab']])
+        if len(self['undo']) > self.undo_max:
+            del self['undo'][0]
+
+        # Redo records only apply to the state from which they were undone
+        self['redo'] = []
+        self['python_redo'] = []
+
+
+    def undoRevert(self, record):
+        """
+        Revert the modifications journaled in an undo (or redo) record,
+        and those done since the last record. Return the record reverting
+        this operation.
+        """
+        operations = record[1]
+        if operations is not self.xml_journal and self.xml_journal:
+            operations = operations + self.xml_journal
+        inverse = self.xmlRevertOperations(operations)
+        self.xml_journal = []
+        self.record_func_prev = None
+        return [record[0], inverse, record[2], record[3]]
+
+
     def undoGlobal(self, f, c):
         if self['current_page'] != '' and self.record_local == False and self.record_global == True:
             if sys.version[0] == '2':
                 self['dump_python'].append([f.__module__, f.func_name, c])
             else:
                 self['dump_python'].append([f.__module__, f.__name__, c])
-            if self.xml_prev != self.toString() or self.xml_prev == "":
+            if self.__undoModified():
                 # control if function have same arguments
                 # last argument is value
                 same = True
@@ -98,8 +148,7 @@ class QtCase(Case, QObject):
                 if same:
                     pass
                 else:
-                    self['undo'].append([self['current_page'], self.toString(), self['current_index'], self['current_tab']])
-                    self.xml_prev = self.toString()
+                    self.__undoRecord()
                     self.record_func_prev = None
                     self.record_argument_prev = c
                     self.undo_signal.emit()
@@ -111,7 +160,7 @@ class QtCase(Case, QObject):
                 self['dump_python'].append([f.__module__, f.func_name, c])
             else:
                 self['dump_python'].append([f.__module__, f.__name__, c])
-            if self.xml_prev != self.toString():
+            if self.__undoModified():
                 # control if function have same arguments
                 # last argument is value
                 same = True
@@ -127,8 +176,7 @@ class QtCase(Case, QObject):
                 else:
                     self.record_func_prev = f
                     self.record_argument_prev = c
-                    self['undo'].append([self['current_page'], self.toString(), self['current_index'], self['current_tab']])
-                    self.xml_prev = self.toString()
+                    self.__undoRecord()
                     self.undo_signal.emit()
 
 
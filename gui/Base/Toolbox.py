@@ -26,6 +26,7 @@
 This module defines the following classes and functions:
 - GuiParam
 - displaySelectedPage
+- clearPageCache
 - dicoLabel
 """
 
@@ -63,6 +64,57 @@ class GuiParam(object):
     #
     DEBUG = logging.NOTSET
 
+    # startup profiling: list of (label, time) when active
+    #
+    startup_timings = None
+
+#-------------------------------------------------------------------------------
+# Cache of page instances
+#-------------------------------------------------------------------------------
+
+# Pages are kept (most recently displayed last) with the case generation
+# at which they were last displayed, and reused if the parameters were not
+# modified since, except by the page itself.
+
+_page_cache = []
+_page_cache_size = 8
+
+# Pages depending on more than the XML parameters are always rebuilt
+
+_page_cache_excluded = ("Identity and paths",
+                        "Meshes selection",
+                        "Prepare batch calculation")
+
+
+def _pageKey(page_name, root, case):
+    """
+    Return the key of a page in the cache.
+    """
+    return (str(page_name), id(root), id(case), case['prepro'])
+
+
+def _pageCacheFind(key):
+    """
+    Return the rank of a page in the cache, or None.
+    """
+    for i, entry in enumerate(_page_cache):
+        if entry[0] == key:
+            return i
+    return None
+
+
+def clearPageCache(case=None):
+    """
+    Remove the pages of a given case (or of all cases) from the cache.
+    This must be called when the case parameters are modified outside
+    of the displayed page (undo/redo, change of mode, ...).
+    """
+    global _page_cache
+    if case == None:
+        _page_cache = []
+    else:
+        _page_cache = [e for e in _page_cache if e[1] is not case]
+
 #-------------------------------------------------------------------------------
 # displaySelectedPage direct to the good page with its name
 #-------------------------------------------------------------------------------
@@ -70,7 +122,51 @@ class GuiParam(object):
 def displaySelectedPage(page_name, root, case, stbar=None, study=None, tree=None):
     """
     This function enables to display a new page when the TreeNavigator
-    send the order.
+    send the order. A page displayed previously is reused if the
+    parameters were not modified since it was left.
+
+    The caller must take back the previous page from its container
+    (for example with QScrollArea.takeWidget()) so that cached pages
+    are not destroyed.
+    """
+    generation = getattr(case, 'xml_generation', None)
+    if generation == None:
+        thisPage = _createPage(page_name, root, case, stbar, study, tree)
+        case['current_page'] = str(page_name)
+        return thisPage
+
+    # The page being left is up to date with its own modifications
+
+    if case['current_page']:
+        i = _pageCacheFind(_pageKey(case['current_page'], root, case))
+        if i != None:
+            _page_cache[i][3] = generation
+
+    key = _pageKey(page_name, root, case)
+    i = _pageCacheFind(key)
+    thisPage = None
+
+    if i != None:
+        entry = _page_cache.pop(i)
+        if entry[3] == generation:
+            thisPage = entry[2]
+
+    if thisPage == None:
+        thisPage = _createPage(page_name, root, case, stbar, study, tree)
+        entry = [key, case, thisPage, generation]
+
+    if str(page_name) not in _page_cache_excluded:
+        _page_cache.append(entry)
+        del _page_cache[:-_page_cache_size]
+
+    case['current_page'] = str(page_name)
+
+    return thisPage
+
+
+def _createPage(page_name, root, case, stbar, study, tree):
+    """
+    Build the page with the given name.
     """
     # 'win' is the frame-support of the Pages
     # 'thisPage' is the instance of classes which create thePages
@@ -269,8 +365,6 @@ def displaySelectedPage(page_name, root, case, stbar=None, study=None, tree=None
         import code_saturne.Pages.WelcomeView as Page
         thisPage = Page.WelcomeView()
 
-    case['current_page'] = str(page_name)
-
     return thisPage
 
 
@@ -308,6 +308,45 @@ class XMLElement:
         return XMLElement(self.doc, el, self.ca)
 
 
+    def _journal(self, *op):
+        """
+        Record an elementary modification of the document: update the
+        generation counter of the case, and add the modification to its
+        journal (used for undo/redo). Return True if journaled.
+        """
+        if self.ca:
+            self.ca.xml_generation += 1
+            self.ca.xmlIndexUpdate(*op)
+        journal = getattr(self.ca, 'xml_journal', None)
+        if journal is None:
+            return False
+        journal.append(op)
+        return True
+
+
+    def _setAttribute(self, attr, value):
+        """
+        Set an attribute of the Element node, recording its previous value.
+        """
+        old = None
+        if self.el.hasAttribute(attr):
+            old = self.el.getAttribute(attr)
+            if old == value:
+                return
+        self._journal('attribute', self.el, attr, old)
+        self.el.setAttribute(attr, value)
+
+
+    def _insertBefore(self, el, nn):
+        """
+        Insert an Element node before the node nn (or at the end if nn is
+        None), recording the insertion.
+        """
+        el = self.el.insertBefore(el, nn)
+        self._journal('insert', el)
+        return el
+
+
     def xmlCreateAttribute(self, **kwargs):
         """
         Set attributes to a XMLElement node, only if these attributes
@@ -317,7 +356,7 @@ class XMLElement:
 
         for attr, value in list(kwargs.items()):
             if not self.el.hasAttribute(attr):
-                self.el.setAttribute(attr, _encode(str(value)))
+                self._setAttribute(attr, _encode(str(value)))
 
         log.debug("xmlCreateAttribute-> %s" % self.__xmlLog())
 
@@ -362,7 +401,7 @@ class XMLElement:
         if self.ca: self.ca.modified()
 
         for attr, value in list(kwargs.items()):
-            self.el.setAttribute(attr, _encode(str(value)))
+            self._setAttribute(attr, _encode(str(value)))
 
         log.debug("xmlSetAttribute-> %s" % self.__xmlLog())
 
@@ -374,6 +413,7 @@ class XMLElement:
         if self.ca: self.ca.modified()
 
         if self.el.hasAttribute(attr):
+            self._journal('attribute', self.el, attr, self.el.getAttribute(attr))
             self.el.removeAttribute(attr)
 
         log.debug("xmlDelAttribute-> %s %s" % (attr, self.__xmlLog()))
@@ -397,7 +437,7 @@ class XMLElement:
         with a dictionary syntax: node['attr'] = value
         """
         if self.ca: self.ca.modified()
-        self.el.setAttribute(attr, _encode(str(value)))
+        self._setAttribute(attr, _encode(str(value)))
 
         log.debug("__setitem__-> %s" % self.__xmlLog())
 
@@ -489,106 +529,98 @@ class XMLElement:
                 return False
 
 
-    def _nodeWithAttrList(self, node, *attrList, **kwargs):
+    def _filterNodeList(self, nodeL, attrList, kwargs):
         """
-        Return a list of Element (and not XMLElement)!
+        Return the list of Element nodes of nodeL having all attributes
+        of attrList, and whose attributes match kwargs.
         """
-        nodeList = []
+        if not attrList and not kwargs:
+            return list(nodeL)
 
-        # Get the nodes list
-        #
-        nodeL = []
+        kw = [(str(k), str(v)) for k, v in list(kwargs.items())]
 
-        iok = 0
-        try:
+        nodeList = []
+        for node in nodeL:
+            iok = 1
             for attr in attrList:
-                if node.hasAttribute(str(attr)):
-                    iok = 1
-                else:
+                if not node.hasAttribute(str(attr)):
                     iok = 0
                     break
-            if iok: nodeList = [node]
-        except Exception:
-            pass
-
-        if attrList and kwargs:
-            nodeL = nodeList
-            nodeList = []
-
-        for n in nodeL:
-            iok = 0
-            for k, v in list(kwargs.items()):
-                if n.getAttribute(str(k)) == str(v):
-                    iok = 1
-                else:
-                    iok = 0
-                    break
-            if iok: nodeList.append(n)
-
-        if not attrList and not kwargs:
-            nodeList = nodeL
-
-        if node.childNodes:
-            for c in node.childNodes:
-                nodeList += self._nodeWithAttrList(c, *attrList, **kwargs)
+            if iok:
+                for k, v in kw:
+                    if node.getAttribute(k) != v:
+                        iok = 0
+                        break
+            if iok: nodeList.append(node)
 
         return nodeList
 
 
-    def _nodeList(self, tag, *attrList, **kwargs):
+    def _nodeWithAttrList(self, node, *attrList, **kwargs):
         """
         Return a list of Element (and not XMLElement)!
         """
         nodeList = []
 
-        # Get the nodes list
-        #
-        nodeL = self.el.getElementsByTagName(tag)
+        # Nodes are selected only if they have all attributes of attrList
+        # (and match kwargs, if given).
 
-        for node in nodeL:
-            iok = 0
-            for attr in attrList:
-                if node.hasAttribute(str(attr)):
-                    iok = 1
-                else:
-                    iok = 0
-                    break
-            if iok: nodeList.append(node)
-
-        if attrList and kwargs:
-            nodeL = nodeList
-            nodeList = []
+        if not attrList:
+            return nodeList
 
-        for node in nodeL:
-            iok = 0
-            for k, v in list(kwargs.items()):
-                if node.getAttribute(str(k)) == str(v):
-                    iok = 1
-                else:
-                    iok = 0
-                    break
-            if iok: nodeList.append(node)
+        kw = [(str(k), str(v)) for k, v in list(kwargs.items())]
 
-        if not attrList and not kwargs:
-            nodeList = nodeL
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if n.nodeType == Node.ELEMENT_NODE:
+                iok = 1
+                for attr in attrList:
+                    if not n.hasAttribute(str(attr)):
+                        iok = 0
+                        break
+                if iok:
+                    for k, v in kw:
+                        if n.getAttribute(k) != v:
+                            iok = 0
+                            break
+                if iok: nodeList.append(n)
+            if n.childNodes:
+                stack.extend(reversed(n.childNodes))
 
         return nodeList
 
 
+    def _nodeList(self, tag, *attrList, **kwargs):
+        """
+        Return a list of Element (and not XMLElement)!
+        """
+        # Get the nodes list, using the index of the case when possible
+        #
+        nodeL = None
+        if self.ca and self.ca.xml_index_enabled:
+            if kwargs:
+                nodeL = self.ca.xmlIndexLookup(self.el, tag, **kwargs)
+            elif self.el.parentNode in (None, self.doc):
+                nodeL = self.ca.xmlIndexLookup(self.el, tag)
+        if nodeL == None:
+            nodeL = self.el.getElementsByTagName(tag)
+
+        return self._filterNodeList(nodeL, attrList, kwargs)
+
+
     def _childNodeList(self, tag, *attrList, **kwargs):
         """
         Return a list of first child Element node from the explored XMLElement node.
         """
-        nodeList = self._nodeList(tag, *attrList, **kwargs)
-
         childNodeList = []
         if self.el.hasChildNodes():
             for node in self.el.childNodes:
                 if node.nodeType == Node.ELEMENT_NODE:
-                    if node.nodeName == tag and node in nodeList:
+                    if node.nodeName == tag:
                         childNodeList.append(node)
 
-        return childNodeList
+        return self._filterNodeList(childNodeList, attrList, kwargs)
 
 
     def xmlAddChild(self, tag, *attrList, **kwargs):
@@ -625,7 +657,7 @@ class XMLElement:
 
         log.debug("xmlAddChild-> %s %s" % (tag, self.__xmlLog()))
 
-        return self._inst(self.el.insertBefore(el, nn))
+        return self._inst(self._insertBefore(el, nn))
 
 
     def xmlSetTextNode(self, newTextNode):
@@ -643,11 +675,12 @@ class XMLElement:
         if self.el.hasChildNodes():
             for n in self.el.childNodes:
                 if n.nodeType == Node.TEXT_NODE:
+                    self._journal('text', n, n.data)
                     n.data = _encode(newTextNode)
         else:
             self._inst(
-                self.el.appendChild(
-                    self.doc.createTextNode(_encode(newTextNode))))
+                self._insertBefore(
+                    self.doc.createTextNode(_encode(newTextNode)), None))
 
         log.debug("xmlSetTextNode-> %s" % self.__xmlLog())
 
@@ -863,7 +896,7 @@ class XMLElement:
         Create a comment XMLElement node.
         """
         if self.ca: self.ca.modified()
-        elt = self._inst( self.el.appendChild(self.doc.createComment(data)) )
+        elt = self._inst( self._insertBefore(self.doc.createComment(data), None) )
         log.debug("xmlAddComment-> %s" % self.__xmlLog())
         return elt
 
@@ -1026,7 +1059,7 @@ class XMLElement:
 
         if oldNode.el.hasChildNodes():
             for n in oldNode.el.childNodes:
-                self._inst(self.el.appendChild(n.cloneNode(deep)))
+                self._inst(self._insertBefore(n.cloneNode(deep), None))
 
         log.debug("xmlChildsCopy-> %s" % self.__xmlLog())
 
@@ -1036,8 +1069,13 @@ class XMLElement:
         Destroy a single node.
         """
         if self.ca: self.ca.modified()
-        oldChild = self.el.parentNode.removeChild(self.el)
-        oldChild.unlink()
+        parentNode = self.el.parentNode
+        nextSibling = self.el.nextSibling
+        oldChild = parentNode.removeChild(self.el)
+
+        # A journaled node is kept alive, as it may be restored by undo
+        if not self._journal('remove', oldChild, parentNode, nextSibling):
+            oldChild.unlink()
 
 
     def xmlRemoveChild(self, tag, *attrList, **kwargs):
@@ -1152,6 +1190,9 @@ class XMLDocument(XMLElement):
         return a xml doc from a file
         """
         self.doc = self.el = parse(d)
+        if self.case:
+            self.case.xml_generation += 1
+            self.case.xml_index = None
         return self
 
 
@@ -1160,6 +1201,9 @@ class XMLDocument(XMLElement):
         return a xml doc from a string
         """
         self.doc = self.el = parseString(_encode(d))
+        if self.case:
+            self.case.xml_generation += 1
+            self.case.xml_index = None
         return self
 
 
@@ -1235,6 +1279,12 @@ class Case(Dico, XMLDocument):
         Instantiate a new dico and a new xml doc
         """
         Dico.__init__(self)
+        self.xml_generation = 0
+        self.xml_journal = None
+        self.xml_index_enabled = False
+        self.xml_index = None
+        self.xml_index_attr = {}
+        self.xml_index_keys = {}
         XMLDocument.__init__(self, case=self)
 
         if package:
@@ -1256,8 +1306,8 @@ class Case(Dico, XMLDocument):
         self.record_argument_prev = None
         self.record_local = False
         self.record_global = True
-        self.xml_prev = ""
-        self.xml_saved = self.toString()
+        self.xml_saved_generation = self.xml_generation
+        self.xml_saved_file = None
 
 
     def xmlRootNode(self):
@@ -1279,13 +1329,10 @@ class Case(Dico, XMLDocument):
         """
         Return True if the xml doc is modified.
         """
-        # return self['saved'] == "no"
+        # The generation counter is updated by each effective modification
+        # of the document, so it is not necessary to serialize it here.
 
-        s = self.toIOString()
-        if s == self.xml_saved:
-            return False
-        else:
-            return True
+        return self.xml_generation != self.xml_saved_generation
 
 
     def __del__(self):
@@ -1322,6 +1369,13 @@ class Case(Dico, XMLDocument):
         This method writes the associated xml file.
         See saveCase and saveCaseAs methods in the Main module.
         """
+        # Nothing to do if the file was written from the current state
+
+        if not self.isModified() and self.xml_saved_file == self['xmlfile'] \
+           and os.path.isfile(self['xmlfile']):
+            self['saved'] = "yes"
+            return
+
         try:
             d = XMLDocument().parseString(self.toPrettyString())
             d.xmlCleanHightLevelBlank(d.root())
@@ -1329,7 +1383,8 @@ class Case(Dico, XMLDocument):
             file = open(self['xmlfile'], 'w')
             file.write(s)
             file.close()
-            self.xml_saved = s
+            self.xml_saved_generation = self.xml_generation
+            self.xml_saved_file = self['xmlfile']
             self['saved'] = "yes"
             d.doc.unlink()
         except IOError:
@@ -1497,6 +1552,263 @@ class Case(Dico, XMLDocument):
             print(msg)
 
 
+    def __xmlIndexKeys(self, node, key):
+        """
+        Assign document order keys to the Element nodes of a subtree,
+        given the key of its root, and return them in document order.
+
+        The key of a node is the tuple of the ranks of its ancestors and
+        itself among their Element siblings, so that the document order
+        of nodes is the order of their keys. Ranks need only be ordered,
+        so that a node may be inserted without renumbering its siblings.
+        """
+        nodeList = []
+        stack = [(node, key)]
+        while stack:
+            n, k = stack.pop()
+            self.xml_index_keys[n] = k
+            if n.nodeType == Node.ELEMENT_NODE:
+                nodeList.append(n)
+            children = [c for c in n.childNodes
+                        if c.nodeType == Node.ELEMENT_NODE]
+            for i in range(len(children) - 1, -1, -1):
+                stack.append((children[i], k + (i + 1,)))
+        return nodeList
+
+
+    def __xmlIndexSiblingRank(self, node, sibling):
+        """
+        Return the rank of the next or previous Element sibling of a node.
+        """
+        n = getattr(node, sibling)
+        while n != None and n.nodeType != Node.ELEMENT_NODE:
+            n = getattr(n, sibling)
+        if n == None:
+            return None
+        return self.xml_index_keys[n][-1]
+
+
+    def __xmlIndexInsertKeys(self, el):
+        """
+        Assign document order keys to an Element node inserted in the
+        document and to its subtree, and return the nodes of the subtree.
+        """
+        parentNode = el.parentNode
+        key = self.xml_index_keys[parentNode]
+        a = self.__xmlIndexSiblingRank(el, 'previousSibling')
+        b = self.__xmlIndexSiblingRank(el, 'nextSibling')
+
+        if a == None and b == None:
+            rank = 1
+        elif b == None:
+            rank = a + 1
+        elif a == None:
+            rank = b - 1
+        else:
+            rank = (a + b) / 2.
+
+        # Renumber the siblings when ranks can not be split anymore
+
+        if a != None and b != None and not a < rank < b:
+            self.__xmlIndexKeys(parentNode, key)
+            key = self.xml_index_keys[el]
+            return self.__xmlIndexKeys(el, key)
+
+        return self.__xmlIndexKeys(el, key + (rank,))
+
+
+    def __xmlIndexBisect(self, nodeL, key):
+        """
+        Return the rank of the first node of a list of nodes in document
+        order whose key is not before the given key.
+        """
+        keys = self.xml_index_keys
+        lo = 0
+        hi = len(nodeL)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if keys[nodeL[mid]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+    def __xmlIndexElements(self, node):
+        """
+        Return the list of Element nodes of a subtree, in document order.
+        """
+        nodeList = []
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if n.nodeType == Node.ELEMENT_NODE:
+                nodeList.append(n)
+            if n.childNodes:
+                stack.extend(reversed(n.childNodes))
+        return nodeList
+
+
+    def __xmlIndexLists(self, n):
+        """
+        Return the lists of the index which may contain a given node.
+        """
+        lists = [self.xml_index.setdefault(n.tagName, [])]
+        for (tag, attr), d in self.xml_index_attr.items():
+            if tag == n.tagName:
+                lists.append(d.setdefault(n.getAttribute(attr), []))
+        return lists
+
+
+    def xmlIndexUpdate(self, *op):
+        """
+        Update the index of Element nodes for an elementary modification
+        of the document (see XMLElement._journal): inserted or removed
+        nodes are inserted in or removed from the lists of the index,
+        and lists depending on a modified attribute are dropped.
+        """
+        if self.xml_index == None:
+            return
+        if not self.xml_index_enabled:
+            self.xml_index = None
+            return
+
+        keys = self.xml_index_keys
+
+        if op[0] == 'attribute':
+            el, attr = op[1:3]
+            key = (el.tagName, attr)
+            if key in self.xml_index_attr:
+                del self.xml_index_attr[key]
+
+        elif op[0] == 'insert':
+            el = op[1]
+            if el.nodeType != Node.ELEMENT_NODE \
+               or el.parentNode not in keys:
+                return
+            for n in self.__xmlIndexInsertKeys(el):
+                key = keys[n]
+                for nodeL in self.__xmlIndexLists(n):
+                    # Nodes are usually appended
+                    if not nodeL or keys[nodeL[-1]] < key:
+                        nodeL.append(n)
+                    else:
+                        nodeL.insert(self.__xmlIndexBisect(nodeL, key), n)
+
+        elif op[0] == 'remove':
+            el, parentNode = op[1:3]
+            if el.nodeType != Node.ELEMENT_NODE \
+               or parentNode not in keys:
+                return
+            for n in self.__xmlIndexElements(el):
+                for nodeL in self.__xmlIndexLists(n):
+                    i = self.__xmlIndexBisect(nodeL, keys[n])
+                    if i < len(nodeL) and nodeL[i] is n:
+                        del nodeL[i]
+                del keys[n]
+
+
+    def xmlIndexLookup(self, scope, tag, **kwargs):
+        """
+        Return the list of Element nodes with a given tag below the
+        scope node, in document order, restricted to those matching one
+        of the (attribute, value) pairs of kwargs, or None if the index
+        can not be used. Remaining attributes must be filtered by the caller.
+
+        The index is only used if the xml_index_enabled attribute is set.
+        It is built when needed, and maintained by the XMLElement
+        methods modifying the document.
+        """
+        if not self.xml_index_enabled:
+            self.xml_index = None
+            return None
+
+        if self.xml_index == None:
+            self.xml_index = {}
+            self.xml_index_attr = {}
+            self.xml_index_keys = {}
+            for n in self.__xmlIndexKeys(self.doc, ()):
+                self.xml_index.setdefault(n.tagName, []).append(n)
+
+        # Only nodes of the indexed document are handled
+        # (not those removed from it)
+
+        key = self.xml_index_keys.get(scope)
+        if key == None:
+            return None
+
+        nodeL = self.xml_index.get(tag, [])
+
+        if kwargs:
+            attr, value = sorted(kwargs.items())[0]
+            attr = str(attr)
+            value = str(value)
+            d = self.xml_index_attr.get((tag, attr))
+            if d == None:
+                d = {}
+                for n in nodeL:
+                    d.setdefault(n.getAttribute(attr), []).append(n)
+                self.xml_index_attr[(tag, attr)] = d
+            nodeL = d.get(value, [])
+
+        # Below the document or its root element, no need to check ancestors
+
+        if len(key) < 2:
+            return [node for node in nodeL if node is not scope]
+
+        # Otherwise, nodes below the scope are contiguous in the list,
+        # their keys extending that of the scope
+
+        return nodeL[self.__xmlIndexBisect(nodeL, key + (float('-inf'),)):
+                     self.__xmlIndexBisect(nodeL, key + (float('inf'),))]
+
+
+    def xmlRevertOperations(self, operations):
+        """
+        Revert a list of elementary modifications recorded in a journal,
+        most recent first. Return the list of modifications reverting the
+        ones just done, so that the same method may be used for redo.
+        """
+        journal = self.xml_journal
+        self.xml_journal = None
+
+        inverse = []
+        for op in reversed(operations):
+            if op[0] == 'attribute':
+                el, attr, value = op[1:]
+                old = None
+                if el.hasAttribute(attr):
+                    old = el.getAttribute(attr)
+                if value == None:
+                    if old != None:
+                        el.removeAttribute(attr)
+                else:
+                    el.setAttribute(attr, value)
+                inverse.append(('attribute', el, attr, old))
+            elif op[0] == 'text':
+                n, data = op[1:]
+                inverse.append(('text', n, n.data))
+                n.data = data
+            elif op[0] == 'insert':
+                el = op[1]
+                parentNode = el.parentNode
+                nextSibling = el.nextSibling
+                parentNode.removeChild(el)
+                inverse.append(('remove', el, parentNode, nextSibling))
+            elif op[0] == 'remove':
+                el, parentNode, nextSibling = op[1:]
+                parentNode.insertBefore(el, nextSibling)
+                inverse.append(('insert', el))
+            self.xmlIndexUpdate(*inverse[-1])
+
+        self.xml_journal = journal
+        if operations:
+            self.xml_generation += 1
+            self.modified()
+
+        return inverse
+
+
     def undoStop(self):
         """
         Method to be overloaded for undo/redo in GUI.
@@ -1884,6 +2196,188 @@ class XMLengineTestCase(unittest.TestCase):
                'Could not use the parseString method'
 
 
+    def checkXmlRevertOperations(self):
+        """Check whether journaled modifications could be reverted."""
+        case = Case()
+        case.parseString(u'<fruits color="red"><a>toto</a><c a="2"/></fruits>')
+        ref = case.toString()
+
+        case.xml_journal = []
+        root = case.root()
+        root['color'] = "green"
+        root.xmlInitNode('b', name="banana").xmlSetTextNode("yellow")
+        root.xmlGetNode('a').xmlSetTextNode("titi")
+        root.xmlRemoveChild('c')
+        modified = case.toString()
+
+        inverse = case.xmlRevertOperations(case.xml_journal)
+        assert case.toString() == ref, \
+               'Could not use the xmlRevertOperations method (undo)'
+
+        case.xmlRevertOperations(inverse)
+        assert case.toString() == modified, \
+               'Could not use the xmlRevertOperations method (redo)'
+
+
+    def checkXmlIndexLookup(self):
+        """Check whether the index of the case is consistent on mutation."""
+        case = Case()
+        root = case.root()
+        root.xmlInitNode('fruits', name="kiwi")
+        assert case.xml_index == None, \
+               'Could not disable the index by default'
+        root.xmlRemoveChild('fruits')
+
+        case.xml_index_enabled = True
+        market = root.xmlInitNode('market')
+        market.xmlInitNode('fruits', name="apple", color="red")
+        n = root.xmlInitNode('fruits', name="pear", color="green")
+        assert len(root.xmlGetNodeList('fruits')) == 2, \
+               'Could not use the index for xmlGetNodeList'
+        assert len(market.xmlGetNodeList('fruits')) == 1, \
+               'Could not use the index for xmlGetNodeList'
+
+        n['color'] = "red"
+        nodeList = root.xmlGetNodeList('fruits', color="red")
+        assert [f['name'] for f in nodeList] == ['pear', 'apple'], \
+               'Could not update the index on attribute modification'
+
+        market.xmlRemoveChild('fruits')
+        assert root.xmlGetNode('fruits', color="red")['name'] == 'pear', \
+               'Could not update the index on node removal'
+        assert market.xmlGetNodeList('fruits', color="red") == [], \
+               'Could not update the index on node removal'
+
+
+    def checkXmlIndexUpdate(self):
+        """Check whether the index of the case is updated in document order."""
+        case = Case()
+        case.xml_index_enabled = True
+        case.xml_journal = []
+        root = case.root()
+        a = root.xmlInitNode('a')
+        c = root.xmlInitNode('c')
+        c.xmlInitNode('fruits', name="pear")
+        a.xmlInitNode('fruits', name="apple")
+        b = root.xmlInitNode('b')
+        b.xmlInitNode('box').xmlInitNode('fruits', name="kiwi")
+        b.xmlInitNode('fruits', name="lemon")
+
+        def _names(scope, **kwargs):
+            return [f['name'] for f in scope.xmlGetNodeList('fruits', **kwargs)]
+
+        def _dom_names(scope):
+            return [str(f.getAttribute('name'))
+                    for f in scope.el.getElementsByTagName('fruits')]
+
+        for scope in (root, a, b, c):
+            assert _names(scope) == _dom_names(scope), \
+                   'Could not update the index in document order on insertion'
+            for name in ('apple', 'kiwi', 'lemon', 'pear'):
+                assert _names(scope, name=name) == \
+                       [n for n in _dom_names(scope) if n == name], \
+                       'Could not use the index in a scope'
+        assert _names(root, name="kiwi") == ['kiwi'], \
+               'Could not update the index on insertion'
+
+        b.xmlRemoveChild('box')
+        assert _names(root) == ['apple', 'lemon', 'pear'], \
+               'Could not update the index on subtree removal'
+
+        case.xmlRevertOperations(case.xml_journal)
+        assert _names(root) == [], \
+               'Could not update the index on undo'
+
+
+    def checkXmlIndexKeys(self):
+        """Check whether the index is kept in order on repeated insertions."""
+        case = Case()
+        case.xml_index_enabled = True
+        root = case.root()
+        a = root.xmlInitNode('a')
+        b = root.xmlInitNode('b')
+        a.xmlInitNode('fruits', name="0")
+        b.xmlInitNode('fruits', name="0")
+        root.xmlGetNodeList('fruits')
+
+        # Insert nodes always at the same place, until siblings
+        # must be renumbered
+
+        for i in range(1, 100):
+            n = case.doc.createElement('c')
+            case.root()._insertBefore(n, b.el)
+            last = XMLElement(case.doc, n, case)
+            last.xmlInitNode('fruits', name=str(i))
+            b = last
+
+        names = [f['name'] for f in root.xmlGetNodeList('fruits')]
+        assert names == ['0'] + [str(i) for i in range(99, 0, -1)] + ['0'], \
+               'Could not keep the index in order on insertion'
+        assert [f['name'] for f in last.xmlGetNodeList('fruits')] == ['99'], \
+               'Could not use the index in a scope after renumbering'
+
+
+    def checkXmlIndexLargeCase(self):
+        """Check whether the index speeds up lookups in a large case."""
+        import time
+
+        doc = ['<Code_Saturne_GUI><boundary_conditions>']
+        for i in range(2000):
+            doc.append('<boundary label="b%d" nature="wall"/>'
+                       '<wall label="b%d">'
+                       '<velocity_pressure choice="off"/></wall>' % (i, i))
+        doc.append('</boundary_conditions></Code_Saturne_GUI>')
+        doc = ''.join(doc)
+
+        def _build(enabled):
+            case = Case()
+            case.xml_index_enabled = enabled
+            case.parseString(doc)
+            return case.root()
+
+        def _lookups(root):
+            t0 = time.time()
+            for i in range(0, 2000, 10):
+                l = "b%d" % i
+                root.xmlGetNode('boundary', label=l)['nature']
+                root.xmlGetNode('wall', label=l).xmlGetNode('velocity_pressure')
+            return time.time() - t0
+
+        ref = _build(False)
+        root = _build(True)
+
+        assert len(root.xmlGetNodeList('wall')) == 2000, \
+               'Could not use the index in a large case'
+        for i in (0, 999, 1999):
+            l = "b%d" % i
+            assert str(root.xmlGetNode('wall', label=l)) \
+                   == str(ref.xmlGetNode('wall', label=l)), \
+                   'Could not use the index in a large case'
+
+        # The index lookups are O(1) (or O(k) for k matching nodes),
+        # instead of O(n) for a traversal of the document
+
+        t_ref = _lookups(ref)
+        t_index = _lookups(root)
+        assert t_index * 10 < t_ref, \
+               'Could not speed up lookups with the index ' \
+               '(%.3f s instead of %.3f s)' % (t_index, t_ref)
+
+
+    def checkIsModified(self):
+        """Check whether modifications of a Case could be detected."""
+        case = Case()
+        assert not case.isModified(), 'Could not use the isModified method'
+
+        root = case.root()
+        root.xmlSetAttribute(study="")
+        root.xmlGetAttribute('study')
+        assert not case.isModified(), 'Could not use the isModified method'
+
+        root.xmlInitNode('fruits')
+        assert case.isModified(), 'Could not use the isModified method'
+
+
     def checkXmlSaveDocument(self):
         """Check whether a Case could be save on the file system"""
         case = Case()
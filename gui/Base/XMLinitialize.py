@@ -35,7 +35,7 @@ This module contains the following classe:
 # Library modules import
 #-------------------------------------------------------------------------------
 
-import sys, unittest, re
+import sys, unittest, re, time
 
 #-------------------------------------------------------------------------------
 # Application modules import
@@ -43,6 +43,7 @@ import sys, unittest, re
 
 from code_saturne.Base.XMLvariables import Variables
 from code_saturne.Base import Toolbox
+from code_saturne.Base.Toolbox import GuiParam
 
 from code_saturne.Pages.LocalizationModel import Zone, LocalizationModel
 from code_saturne.Pages.OutputControlModel import OutputControlModel
@@ -51,14 +52,11 @@ from code_saturne.Pages.TurbulenceModel import TurbulenceModel
 from code_saturne.Pages.InitializationModel import InitializationModel
 from code_saturne.Pages.TimeStepModel import TimeStepModel
 from code_saturne.Pages.FluidCharacteristicsModel import FluidCharacteristicsModel
-from code_saturne.Pages.CoalCombustionModel import CoalCombustionModel
 from code_saturne.Pages.ThermalScalarModel import ThermalScalarModel
-from code_saturne.Pages.ElectricalModel import ElectricalModel
-from code_saturne.Pages.GasCombustionModel import GasCombustionModel
-from code_saturne.Pages.GroundwaterModel import GroundwaterModel
-from code_saturne.Pages.AtmosphericFlowsModel import AtmosphericFlowsModel
-from code_saturne.Pages.LagrangianModel import LagrangianModel
-from code_saturne.Pages.ThermalRadiationModel import ThermalRadiationModel
+
+# Physical models (GroundwaterModel, CoalCombustionModel, GasCombustionModel,
+# ElectricalModel, ThermalRadiationModel, AtmosphericFlowsModel,
+# LagrangianModel) are imported only when needed, see XMLinit.__initModel
 
 #-------------------------------------------------------------------------------
 # class XMLinit
@@ -91,9 +89,12 @@ class XMLinit(Variables):
 
             # Initialization (order is important, see turbulenceModelsList method)
 
-            grdflow = GroundwaterModel(self.case).getGroundwaterModel()
-
             self.node_models = self.case.xmlInitNode('thermophysical_models')
+
+            grdflow = self.__initModel('GroundwaterModel',
+                                       'getGroundwaterModel',
+                                       self.node_models.xmlGetChildNode('groundwater_model'))
+
             node = self.node_models.xmlInitNode('velocity_pressure')
             if grdflow == 'groundwater':
                 self.setNewVariable(node, 'hydraulic_head')
@@ -154,16 +155,49 @@ class XMLinit(Variables):
             # Calculation features
 
             ThermalScalarModel(self.case).getThermalScalarModel()
-            CoalCombustionModel(self.case).getCoalCombustionModel()
-            GasCombustionModel(self.case).getGasCombustionModel()
-            ElectricalModel(self.case).getElectricalModel()
-            ThermalRadiationModel(self.case).getRadiativeModel()
-            AtmosphericFlowsModel(self.case).getAtmosphericFlowsModel()
-            LagrangianModel(self.case).getLagrangianModel()
+            node = self.node_models
+            self.__initModel('CoalCombustionModel',
+                             'getCoalCombustionModel',
+                             node.xmlGetNode('solid_fuels'))
+            self.__initModel('GasCombustionModel',
+                             'getGasCombustionModel',
+                             node.xmlGetNode('gas_combustion'))
+            self.__initModel('ElectricalModel',
+                             'getElectricalModel',
+                             node.xmlGetNode('joule_effect'))
+            self.__initModel('ThermalRadiationModel',
+                             'getRadiativeModel',
+                             node.xmlGetNode('radiative_transfer'))
+            self.__initModel('AtmosphericFlowsModel',
+                             'getAtmosphericFlowsModel',
+                             node.xmlGetChildNode('atmospheric_flows'))
+            self.__initModel('LagrangianModel',
+                             'getLagrangianModel',
+                             self.case.root().xmlGetNode('lagrangian'))
 
             return msg
 
 
+    def __initModel(self, name, getter, node):
+        """
+        Initialize a physical model and return its value. The module of
+        the model is imported only if the model is not already set to
+        'off' in the case (otherwise, its default values already exist).
+        """
+        if node and node['model'] == 'off':
+            return 'off'
+
+        t0 = time.time()
+        module = __import__('code_saturne.Pages.' + name, fromlist=[name])
+        model = getattr(getattr(module, name)(self.case), getter)()
+
+        if GuiParam.startup_timings != None:
+            GuiParam.startup_timings.append(('initialize ' + name,
+                                             time.time() - t0))
+
+        return model
+
+
     def __initHeading(self, prepro):
         """
         Create if necessary headings from the root element of the case.
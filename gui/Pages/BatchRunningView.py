@@ -338,7 +338,7 @@ class ListingDialogView(CommandMgrDialogView):
             ba = self.proc.readLine()
             if ba.isNull(): return
             s = (ba.data()).decode("utf-8")[:-1]
-            self.logText.append(s)
+            self.appendLog(s)
             self.n_lines += 1
 
             # Work and result directories printed in first lines of log.
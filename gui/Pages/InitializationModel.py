@@ -49,7 +49,6 @@ from code_saturne.Pages.TurbulenceModel import TurbulenceModel
 from code_saturne.Pages.DefineUserScalarsModel import DefineUserScalarsModel
 from code_saturne.Pages.LocalizationModel import LocalizationModel
 from code_saturne.Pages.CompressibleModel import CompressibleModel
-from code_saturne.Pages.ElectricalModel import ElectricalModel
 from code_saturne.Pages.ThermalScalarModel import ThermalScalarModel
 
 #-------------------------------------------------------------------------------
@@ -105,6 +105,12 @@ def tr(text):
 # Informations class
 #-------------------------------------------------------------------------------
 
+# Results of previously parsed preprocessor logs, indexed by
+# (file path, modification time, size, chain)
+
+_informations_cache = {}
+
+
 class Informations:
     def __init__(self, file, chain):
 
@@ -112,14 +118,26 @@ class Informations:
         if self.chain not in ('faces', 'cells'):
             raise ValueError("Informations class is called with a wrong parameter 'chain'")
 
-        lines = self.readFile(file)
-        if not lines:
-            raise ValueError("Code_Saturne Preprocessor log language unknown.")
+        key = None
+        if file:
+            st = os.stat(file)
+            key = (os.path.abspath(file), st.st_mtime, st.st_size, chain)
+
+        if key in _informations_cache:
+            familyList, groupList, groupCount = _informations_cache[key]
+
+        else:
+            lines = self.readFile(file)
+            if not lines:
+                raise ValueError("Code_Saturne Preprocessor log language unknown.")
 
-        refList, groupList = self.getLists(lines)
+            familyList, groupList, groupCount = self.getLists(lines)
+            _informations_cache[key] = (familyList, groupList, groupCount)
 
-        self.refList = refList
-        self.groupList = groupList
+        self.refList = []
+        self.familyList = list(familyList)
+        self.groupList = list(groupList)
+        self.groupCount = dict(groupCount)
 
 
     def readFile(self, file):
@@ -160,38 +178,67 @@ class Informations:
 
 
     def getLists(self, lines):
-        refList = []
+        """
+        Parse the families definition section of the preprocessor log
+        in a single pass. Each family is printed as:
+
+          Family <num>
+                 Group "<name>"
+                 ...
+                 Number of cells / boundary faces ... : <count>
+
+        Return the list of families, the list of groups of families having
+        elements of the selected type (faces or cells), and the associated
+        number of elements for each of these groups.
+        """
+        re_family = re.compile(re.escape(self.str3) + r'\s+(\S+)')
+        re_group = re.compile(re.escape(self.str4 + ' ') + r'[^"\n]*"([^"\n]*)"')
+        re_count = re.compile(r'(\d+)\s*$')
+
+        familyList = []
         groupList = []
-        j = len(lines)
-        for i in range(len(lines)):
-            index = re.search(self.str1, lines[i])
-            if index != None:
-                j = i
+        groupCount = {}
+
+        # Skip lines up to the families definition section
+
+        n = 0
+        while n < len(lines) and lines[n].find(self.str1) < 0:
+            n += 1
+
+        family = None
+        groups = []
+
+        for line in lines[n:]:
+            if line.find(self.str5) > -1:
                 break
 
-        for n in range(j,len(lines),1):
-            if re.search(self.str5, lines[n]): break
-            index = re.search(self.str3, lines[n])
-            if index != None:
-                familyList =[]
-                fam = re.split(self.str3, lines[n])
-                for f in fam[1:]: numfam = re.split('\n', f)[0]
-                for m in range(n+1,len(lines),1):
-                    if re.search(self.str2, lines[m]) != None:
-                        p = m
-                        for p in range(p-1,p-m,-1):
-                            if re.search(self.str4, lines[p]) != None:
-                                gr = re.split(self.str4 + ' ', lines[p])
-                                for g in gr[1:]:
-                                    group = re.split('\n', g)[0]
-                                    group = re.split('"',group)[1]
-                                    if group:
-                                        if group not in groupList: groupList.append(group)
-                            if re.search(self.str3, lines[p]) != None:
-                                n = m-1
-                                break
-
-        return refList, groupList
+            if line.find(self.str3) > -1:
+                m = re_family.search(line)
+                if m:
+                    family = m.group(1)
+                    familyList.append(family)
+                groups = []
+
+            elif family == None:
+                continue
+
+            elif line.find(self.str4) > -1:
+                for group in re_group.findall(line):
+                    if group and group not in groups:
+                        groups.append(group)
+
+            elif line.find(self.str2) > -1:
+                m = re_count.search(line)
+                count = 0
+                if m:
+                    count = int(m.group(1))
+                for group in groups:
+                    if group not in groupCount:
+                        groupList.append(group)
+                        groupCount[group] = 0
+                    groupCount[group] += count
+
+        return familyList, groupList, groupCount
 
 
     def getLocalizations(self):
@@ -39,6 +39,8 @@ This module defines the following classes:
 
 import os, sys, shutil, signal, logging
 import subprocess, platform
+import threading
+import io, warnings
 
 try:
     import ConfigParser  # Python2
@@ -46,6 +48,11 @@ try:
 except Exception:
     import configparser  # Python3
 
+try:
+    import queue  # Python3
+except ImportError:
+    import Queue as queue  # Python2
+
 #-------------------------------------------------------------------------------
 # Third-party modules
 #-------------------------------------------------------------------------------
@@ -62,6 +69,7 @@ import cs_info
 from cs_exec_environment import \
     separate_args, update_command_single_value, assemble_args, enquote_arg
 import cs_runcase
+from cs_run_timings import read_run_timings, format_run_timings
 
 try:
     from code_saturne.trackcvg.MainForm import Ui_MainForm
@@ -315,6 +323,26 @@ class CaseStandardItemModel(QAbstractItemModel):
         return p_Item.childCount()
 
 
+    def appendFile(self, entry, items):
+        """
+        Add a file and its probes (or variables) at the end of the model.
+        The entry must already be appended to the list of files.
+        """
+        name = entry[0]
+        row = self.rootItem.childCount()
+
+        self.beginInsertRows(QModelIndex(), row, row)
+
+        item = item_class(row, name, entry[2], entry[3])
+        newparent = TreeItem(item, name, self.rootItem)
+        self.rootItem.appendChild(newparent)
+        self.noderoot[name] = newparent
+        for itm in items:
+            newparent.appendChild(TreeItem(itm, itm.name, newparent))
+
+        self.endInsertRows()
+
+
     def populateModel(self):
         idx = 0
         for (name, name_long, status, subplot_id, probes_number) in self.lst:
@@ -409,6 +437,7 @@ class MyMplCanvas(FigureCanvas):
         self.yAxe = numpy.array([0])
         self.xAxe = numpy.array([0])
         self.axes = []
+        self.xLabels = {}
 
         if subplotNb == 1:
             self.axes.append(self.fig.add_subplot(111))
@@ -445,11 +474,12 @@ class MyMplCanvas(FigureCanvas):
         pass
 
 
-    def update_figure(self, name, data, nb_probes, lstProbes):
-        self.xAxe = data[0].tolist()
+    def update_figure(self, name, data, nb_probes, lstProbes, x_label=None):
+        self.xAxe = data[0]
         for j in range(nb_probes - 1):
             if (lstProbes[j].status == "on"):
-                self.yAxe = data[j + 1].tolist()
+                self.yAxe = data[j + 1]
+                self.xLabels[lstProbes[j].subplot_id - 1] = x_label
 
                 lbl = name + "_s" + str(j)
 
@@ -463,11 +493,12 @@ class MyMplCanvas(FigureCanvas):
                                                               prop={'size':'medium', 'style': 'italic'})
 
 
-    def update_figure_listing(self, name, data, nb_probes, lstProbes):
-        self.xAxe = data[0].tolist()
+    def update_figure_listing(self, name, data, nb_probes, lstProbes, x_label=None):
+        self.xAxe = data[0]
         for j in range(nb_probes - 1):
             if (lstProbes[j].status == "on"):
-                self.yAxe = data[j + 1].tolist()
+                self.yAxe = data[j + 1]
+                self.xLabels[lstProbes[j].subplot_id - 1] = x_label
 
                 lbl = "t res. " + name[j]
 
@@ -485,13 +516,17 @@ class MyMplCanvas(FigureCanvas):
     def drawFigure(self):
         for it in range(len(self.axes)):
             self.axes[it].grid(True)
-            self.axes[it].set_xlabel("time (s)")
+            if self.xLabels.get(it) == 'iteration':
+                self.axes[it].set_xlabel("iteration")
+            else:
+                self.axes[it].set_xlabel("time (s)")
         self.axes[0].set_yscale('log')
 
         self.fig.canvas.draw()
 
 
     def clear(self):
+        self.xLabels = {}
         for plt in range(len(self.axes)):
             self.axes[plt].clear()
 
@@ -516,6 +551,282 @@ class MyMplCanvas(FigureCanvas):
             self.axes.append(self.fig.add_subplot(224))
 
 
+#-------------------------------------------------------------------------------
+# Incremental reader for monitoring and residuals files
+#-------------------------------------------------------------------------------
+
+class TailReader(object):
+    """
+    Follow a CSV or DAT file being written by a running computation:
+    only lines appended since the previous update are read and parsed,
+    into a growable array of floats. The file is read again from the
+    beginning if it was truncated or replaced.
+
+    Appended lines are parsed as a block by numpy; lines are parsed one
+    by one only if the block is not a regular table (for example when a
+    file is being rewritten with a different number of columns).
+    """
+    def __init__(self, name, n_cols):
+        self.name   = name
+        self.n_cols = n_cols
+        self.csv    = (os.path.splitext(name)[1] == '.csv')
+
+        self.reset()
+
+
+    def reset(self):
+        """
+        Restart reading from the beginning of the file.
+        """
+        self.offset    = 0
+        self.inode     = None
+        self.n_lines   = 0
+        self.n_rows    = 0
+        self.values    = numpy.empty((64, self.n_cols), dtype=numpy.float64)
+        self.x_label   = None
+        self.x_from_header = False
+
+
+    def __append(self, rows):
+        """
+        Append parsed rows (list of rows or 2d array), growing storage
+        by doubling when needed.
+        """
+        n = len(rows)
+        if self.n_rows + n > self.values.shape[0]:
+            size = max(2*self.values.shape[0], self.n_rows + n)
+            values = numpy.empty((size, self.n_cols), dtype=numpy.float64)
+            values[:self.n_rows] = self.values[:self.n_rows]
+            self.values = values
+
+        self.values[self.n_rows:self.n_rows + n] = rows
+        self.n_rows += n
+
+
+    def __parseHeader(self, text):
+        """
+        Determine whether the first column is the time or the iteration
+        number, from the column titles at the beginning of a file.
+        """
+        title = None
+        if self.csv:
+            title = text.split('\n', 1)[0].split(',')[0]
+        else:
+            i = text.find('#COLUMN_TITLES:')
+            if i > -1:
+                title = text[i+15:].split('\n', 1)[0].split('|')[0]
+        if title != None:
+            title = title.strip().lower()
+            if title in ['iteration', 'nt']:
+                self.x_label = 'iteration'
+            elif title in ['t', 'time']:
+                self.x_label = 'time'
+        self.x_from_header = (self.x_label != None)
+
+
+    def __parseBlock(self, text):
+        """
+        Parse a block of complete lines, returning a 2d array of floats,
+        or None if the block is not a regular table.
+        """
+        if self.csv:
+            delimiter = ','
+        else:
+            delimiter = None
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore") # empty block
+                rows = numpy.loadtxt(io.StringIO(text),
+                                     dtype=numpy.float64,
+                                     delimiter=delimiter,
+                                     comments='#',
+                                     usecols=range(self.n_cols),
+                                     ndmin=2)
+        except (ValueError, IndexError):
+            return None
+
+        return rows
+
+
+    def __parse(self, line):
+        """
+        Parse a data line, returning None for header or comment lines.
+        """
+        if self.csv:
+            if self.n_lines == 1: # first line: column names
+                return None
+            content = line.split(',')
+        else:
+            if line.startswith('#'):
+                return None
+            content = line.split()
+
+        if not content:
+            return None
+
+        row = [numpy.nan]*self.n_cols
+        for i, el in enumerate(content[:self.n_cols]):
+            try:
+                row[i] = float(el)
+            except ValueError:
+                pass
+        return row
+
+
+    def update(self):
+        """
+        Read lines appended to the file, and return data as an array
+        of columns (first column being time or iteration).
+        """
+        try:
+            st = os.stat(self.name)
+        except OSError:
+            self.reset()
+            return self.data()
+
+        # truncated or rotated file
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            self.reset()
+            self.inode = st.st_ino
+
+        if st.st_size > self.offset:
+            f = open(self.name, 'rb')
+            f.seek(self.offset)
+            chunk = f.read(st.st_size - self.offset)
+            f.close()
+
+            # only complete lines are parsed
+            end = chunk.rfind(b'\n') + 1
+            if end > 0:
+                self.offset += end
+                text = chunk[:end].decode('utf-8', 'replace')
+                if self.n_lines == 0:
+                    self.__parseHeader(text)
+                    if self.csv: # first line: column names
+                        text = text.split('\n', 1)[1]
+                        self.n_lines += 1
+
+                rows = self.__parseBlock(text)
+                if rows is not None:
+                    self.n_lines += text.count('\n')
+                else:
+                    rows = []
+                    for line in text.splitlines():
+                        self.n_lines += 1
+                        row = self.__parse(line.strip())
+                        if row != None:
+                            rows.append(row)
+                if len(rows) > 0:
+                    self.__append(rows)
+
+                # without column titles, integer values denote iterations
+                if not self.x_from_header and len(rows) > 0:
+                    x = self.values[self.n_rows - len(rows):self.n_rows, 0]
+                    if not numpy.all(x == numpy.floor(x)):
+                        self.x_label = 'time'
+                    elif self.x_label == None:
+                        self.x_label = 'iteration'
+
+        return self.data()
+
+
+    def data(self):
+        """
+        Return data read so far, as an array of columns.
+        """
+        return self.values[:self.n_rows].transpose()
+
+
+#-------------------------------------------------------------------------------
+# Background indexer for monitoring and residuals files
+#-------------------------------------------------------------------------------
+
+class HeaderIndexer(object):
+    """
+    Determine the columns of monitoring and residuals files in a
+    background thread, using a function reading only their header or
+    first data line.
+
+    Entries are indexed by file path, with the inode and size of the
+    file when indexed: as these files only grow during a computation,
+    an entry remains valid as long as the inode is unchanged and the
+    file is not smaller.
+    """
+    def __init__(self, read_header, index=None):
+        self.read_header = read_header
+        self.index       = index or {}
+        self.results     = queue.Queue()
+        self.n_pending   = 0
+        self.n_indexed   = 0
+
+
+    def lookup(self, path):
+        """
+        Return the valid index entry of a file, or None.
+        """
+        e = self.index.get(path)
+        if e == None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if e['inode'] != st.st_ino or e['size'] > st.st_size:
+            return None
+        return e
+
+
+    def __run(self, files):
+        """
+        Index files (in the background thread).
+        """
+        for name, path in files:
+            e = None
+            try:
+                st = os.stat(path)
+                columns, variables = self.read_header(name, path)
+                e = {'inode': st.st_ino,
+                     'size': st.st_size,
+                     'columns': columns,
+                     'variables': variables}
+            except Exception:
+                pass
+            self.results.put((name, path, e))
+
+
+    def start(self, files):
+        """
+        Start indexing a list of (name, path) files in the background.
+        """
+        if not files:
+            return
+        self.n_pending += len(files)
+        t = threading.Thread(target=self.__run, args=(files,))
+        t.daemon = True
+        t.start()
+
+
+    def poll(self):
+        """
+        Return the (name, path, entry) results available so far
+        (entry being None if the file could not be read).
+        """
+        results = []
+        while True:
+            try:
+                name, path, e = self.results.get_nowait()
+            except queue.Empty:
+                break
+            # Files with no data yet are indexed again on the next load
+            if e != None and e['columns'] > 1:
+                self.index[path] = e
+                self.n_indexed += 1
+            results.append((name, path, e))
+        self.n_pending -= len(results)
+        return results
+
+
 #-------------------------------------------------------------------------------
 # Base Main Window
 #-------------------------------------------------------------------------------
@@ -804,58 +1115,47 @@ class MainView(object):
 
     def loadDirectoryContent(self):
         """
-        Load directory content in treeView
+        Load directory content in treeView.
+
+        Files whose columns are known from the index saved in the state
+        file are shown immediately; the headers of other files are read
+        by a background indexer, and files are added as they are indexed.
         """
         # self.fileList : nom_court, nom_long, status, plotId, probes_number
+        self.fileList = []
+        self.listFileProbes = {}
+        self.fileReaders = {}
+
+        self.LoadState()
+
+        files = []
         for fl in os.listdir(self.caseName):
             rep = os.path.abspath(os.path.join(self.caseName, fl))
             if os.path.isdir(rep):
                 for ffl in os.listdir(rep):
                     base, ext = os.path.splitext(ffl)
-                    if ext in ['.dat', '.csv']:
-                        # read number of probes
-                        if ext == ".csv" and (base.find("_coords") == -1):
-                            size = self.ReadCsvFileHeader(os.path.abspath(os.path.join(rep, ffl)))
-                            self.fileList.append([ffl, os.path.abspath(os.path.join(rep, ffl)), "off", 2, size])
-                            ll = []
-                            for idx in range(size - 1):
-                                nameItem = "probe_" + str(idx)
-                                item = item_class(idx, nameItem, "off", 2)
-                                ll.append(item)
-                            self.listFileProbes[ffl] = ll
-                        elif ext == ".dat" and (base.find("_coords") == -1):
-                            size = self.ReadDatFileHeader(os.path.abspath(os.path.join(rep, ffl)))
-                            self.fileList.append([ffl, os.path.abspath(os.path.join(rep, ffl)), "off", 2, size])
-                            ll = []
-                            for idx in range(size - 1):
-                                nameItem = "probe_" + str(idx)
-                                item = item_class(idx, nameItem, "off", 2)
-                                ll.append(item)
-                            self.listFileProbes[ffl] = ll
+                    if ext in ['.dat', '.csv'] and (base.find("_coords") == -1):
+                        files.append((ffl, os.path.abspath(os.path.join(rep, ffl))))
+            elif fl in ['residuals.csv', 'residuals.dat']:
+                files.append((fl, rep))
+
+        self.headerIndexer = HeaderIndexer(self.readFileHeader,
+                                           self.savedHeaderIndex)
+
+        # Time spent in each stage of the run, if available
+
+        timings = format_run_timings(read_run_timings(self.caseName), True)
+        self.lineEditCase.setToolTip("\n".join(timings))
+
+        # Files already indexed
+
+        unindexed = []
+        for name, path in files:
+            e = self.headerIndexer.lookup(path)
+            if e != None:
+                self.__addFile(name, path, e)
             else:
-                if fl == 'residuals.csv':
-                    self.listingVariable = self.readResidualsVariableListCSV(rep)
-                    self.fileList.append([fl, rep, "on", 1, len(self.listingVariable) + 1])
-                    # read variable list for Time residual
-                    idx = 0
-                    ll = []
-                    for var in self.listingVariable:
-                        item = item_class(idx, var, "on", 1)
-                        idx = idx + 1
-                        ll.append(item)
-                    self.listFileProbes[fl] = ll
-                elif fl == 'residuals.dat':
-                    self.listingVariable = self.readResidualsVariableListDAT(rep)
-                    self.fileList.append([fl, rep, "on", 1, len(self.listingVariable) + 1])
-                    # read variable list for Time residual
-                    idx = 0
-                    ll = []
-                    for var in self.listingVariable:
-                        item = item_class(idx, var, "on", 1)
-                        idx = idx + 1
-                        ll.append(item)
-                    self.listFileProbes[fl] = ll
-        self.LoadState()
+                unindexed.append((name, path))
 
         self.modelCases = CaseStandardItemModel(self.parent, self.fileList, self.listFileProbes)
         self.treeViewDirectory.setModel(self.modelCases)
@@ -866,6 +1166,84 @@ class MainView(object):
         self.treeViewDirectory.resizeColumnToContents(3)
         self.modelCases.dataChanged.connect(self.treeViewChanged)
 
+        # Other files are indexed in the background
+
+        self.headerIndexer.start(unindexed)
+        if unindexed:
+            if not hasattr(self, 'indexTimer'):
+                self.indexTimer = QTimer()
+                self.indexTimer.timeout.connect(self.slotIndexResults)
+            self.indexTimer.start(100)
+            self.statusbar.showMessage(self.tr("Reading files headers..."))
+
+
+    def __addFile(self, name, path, e):
+        """
+        Add a file to the list of files, and return its entry and the
+        list of its probes (or variables for residuals).
+        """
+        if e['variables'] != None:
+            # residuals file: variables are displayed by default
+            self.listingVariable = e['variables']
+            entry = [name, path, "on", 1, e['columns']]
+            ll = []
+            for idx, var in enumerate(e['variables']):
+                ll.append(item_class(idx, var, "on", 1))
+        else:
+            entry = [name, path, "off", 2, e['columns']]
+            ll = []
+            for idx in range(e['columns'] - 1):
+                nameItem = "probe_" + str(idx)
+                ll.append(item_class(idx, nameItem, "off", 2))
+
+        self.fileList.append(entry)
+        self.listFileProbes[name] = ll
+        self.__restoreFileState(name)
+
+        return entry, ll
+
+
+    def slotIndexResults(self):
+        """
+        Private slot. Add files indexed in the background to the tree view.
+        """
+        indexer = self.headerIndexer
+
+        added = False
+        for name, path, e in indexer.poll():
+            if e != None:
+                entry, ll = self.__addFile(name, path, e)
+                self.modelCases.appendFile(entry, ll)
+                added = True
+
+        if added:
+            self.treeViewDirectory.expandAll()
+
+        if indexer.n_pending < 1:
+            self.indexTimer.stop()
+            self.treeViewDirectory.resizeColumnToContents(0)
+            self.statusbar.showMessage(self.tr("Ready"), 5000)
+            if indexer.n_indexed > 0:
+                self.__saveHeaderIndex()
+            self.updateView()
+
+
+    def readFileHeader(self, name, path):
+        """
+        Return the number of columns of a file and, for residuals files,
+        the list of variables (called from the indexer thread).
+        """
+        if name == 'residuals.csv':
+            variables = self.readResidualsVariableListCSV(path)
+            return len(variables) + 1, variables
+        elif name == 'residuals.dat':
+            variables = self.readResidualsVariableListDAT(path)
+            return len(variables) + 1, variables
+        elif os.path.splitext(name)[1] == '.csv':
+            return self.ReadCsvFileHeader(path), None
+        else:
+            return self.ReadDatFileHeader(path), None
+
 
     def treeViewChanged(self, topLeft, bottomRight):
         """
@@ -932,64 +1310,46 @@ class MainView(object):
                 base, ext = os.path.splitext(fle)
                 if name == 'residuals.csv':
                     data = self.ReadCsvFile(fle, probes_number)
+                    x_label = self.fileReaders[fle].x_label
                     if status == "on" or status == "onoff":
-                        self.dc.update_figure_listing(self.listingVariable, data, probes_number, self.listFileProbes[name])
+                        self.dc.update_figure_listing(self.listingVariable, data, probes_number, self.listFileProbes[name], x_label)
                 elif name == 'residuals.dat':
                     data = self.ReadDatFile(fle, probes_number)
+                    x_label = self.fileReaders[fle].x_label
                     if status == "on" or status == "onoff":
-                        self.dc.update_figure_listing(self.listingVariable, data, probes_number, self.listFileProbes[name])
+                        self.dc.update_figure_listing(self.listingVariable, data, probes_number, self.listFileProbes[name], x_label)
                 elif ext == ".csv":
                     data = self.ReadCsvFile(fle, probes_number)
+                    x_label = self.fileReaders[fle].x_label
                     nm, ext = os.path.splitext(name)
                     nm = nm[7:]
-                    self.dc.update_figure(nm, data, probes_number, self.listFileProbes[name])
+                    self.dc.update_figure(nm, data, probes_number, self.listFileProbes[name], x_label)
                 elif ext == ".dat":
                     data = self.ReadDatFile(fle, probes_number)
+                    x_label = self.fileReaders[fle].x_label
                     nm, ext = os.path.splitext(name)
                     nm = nm[7:]
-                    self.dc.update_figure(nm, data, probes_number, self.listFileProbes[name])
+                    self.dc.update_figure(nm, data, probes_number, self.listFileProbes[name], x_label)
         self.dc.drawFigure()
 
 
     def ReadCsvFile(self, name, probes_number):
         """
+        Return data of a CSV file, parsing only lines added since
+        the previous call.
         """
-        data = []
-        comp = 0
-        ficIn= open(name, 'r')
-        typ = 0 # O time / 1 iteration
-        for line in ficIn.readlines():
-            line = line.strip('\n')
-            if comp > 0:
-                content = line.split(',')
-
-                if comp == 1:
-                    if type(content[0]) == int:
-                        typ = 1
-
-                if typ == 0:
-                    for el in content:
-                        el = el.lstrip()
-                        el = el.rstrip()
-                        data.append(el)
-                else:
-                    data.append(float(content[0]))
-                    for el in content[1:]:
-                        el = el.lstrip()
-                        el = el.rstrip()
-                        data.append(el)
-            comp = comp + 1
-        ficIn.close()
-        A = numpy.array(data)
-        n = A.shape[0]
-        r = n % probes_number
-        if r > 0:
-            n -= r
-            A = numpy.resize(A, n)
-        B = A.reshape(-1, probes_number)
-        C = B.transpose()
+        return self.__getReader(name, probes_number).update()
+
 
-        return C
+    def __getReader(self, name, probes_number):
+        """
+        Return the incremental reader associated with a file.
+        """
+        reader = self.fileReaders.get(name)
+        if reader == None or reader.n_cols != probes_number:
+            reader = TailReader(name, probes_number)
+            self.fileReaders[name] = reader
+        return reader
 
 
     def ReadCsvFileHeader(self, name):
@@ -1008,52 +1368,25 @@ class MainView(object):
 
     def ReadDatFile(self, name, probes_number):
         """
+        Return data of a DAT file, parsing only lines added since
+        the previous call.
         """
-        data = []
-        ficIn= open(name, 'r')
-        comp = 0
-        typ = 0 # O time / 1 iteration
-        for line in ficIn.readlines():
-            if not line.startswith("#"):
-                comp = comp + 1
-                line = line.lstrip()
-                content = line.split()
-
-                if comp == 1:
-                    if type(content[0]) == int:
-                        typ = 1
-
-                if typ == 0:
-                    for el in content:
-                        data.append(el)
-                else:
-                    data.append(float(content[0]))
-                    for el in content[1:]:
-                        data.append(el)
-        ficIn.close()
-        A = numpy.array(data)
-        n = A.shape[0]
-        r = n % probes_number
-        if r > 0:
-            n -= r
-            A = numpy.resize(A, n)
-        B = A.reshape(-1, probes_number)
-        C = B.transpose()
-
-        return C
+        return self.__getReader(name, probes_number).update()
 
 
     def ReadDatFileHeader(self, name):
         """
+        Return the number of columns of a DAT file, based on its
+        first data line.
         """
         size = 0
         ficIn= open(name, 'r')
-        for line in ficIn.readlines():
+        for line in ficIn:
             if not line.startswith("#"):
-                line = line.lstrip()
                 content = line.split()
-                lst = []
-                size = len(content)
+                if content:
+                    size = len(content)
+                    break
         ficIn.close()
 
         return size
@@ -1125,6 +1458,8 @@ class MainView(object):
                 node.setAttribute("subplot_id", str(itt.subplot_id))
                 newnode.appendChild(node)
 
+        self.__writeHeaderIndex(newdoc, root)
+
         newdoc.writexml(ficIn,
                         indent="  ",
                         addindent="  ",
@@ -1134,30 +1469,113 @@ class MainView(object):
         ficIn.close()
 
 
+    def __writeHeaderIndex(self, doc, root):
+        """
+        Add the index of files headers to a state document.
+        """
+        if not hasattr(self, 'headerIndexer'):
+            return
+
+        index = doc.createElement('index')
+        root.appendChild(index)
+
+        for path in sorted(self.headerIndexer.index.keys()):
+            e = self.headerIndexer.index[path]
+            node = doc.createElement('header')
+            node.setAttribute("path", os.path.relpath(path, self.caseName))
+            node.setAttribute("inode", str(e['inode']))
+            node.setAttribute("size", str(e['size']))
+            node.setAttribute("columns", str(e['columns']))
+            if e['variables'] != None:
+                for var in e['variables']:
+                    nn = doc.createElement('variable')
+                    nn.setAttribute("name", var)
+                    node.appendChild(nn)
+            index.appendChild(node)
+
+
+    def __saveHeaderIndex(self):
+        """
+        Update the index of files headers in the state file, keeping
+        the other saved settings.
+        """
+        name = os.path.join(self.caseName, '.trackcvg.state')
+
+        try:
+            if os.path.exists(name):
+                doc = parse(name)
+                root = doc.documentElement
+                for node in root.getElementsByTagName('index'):
+                    root.removeChild(node).unlink()
+            else:
+                doc = Document()
+                root = doc.createElement('root')
+                doc.appendChild(root)
+
+            self.__writeHeaderIndex(doc, root)
+
+            ficIn = open(name, 'w')
+            doc.writexml(ficIn, addindent="  ", newl='\n')
+            ficIn.close()
+            doc.unlink()
+        except Exception:
+            log.debug("could not save index to %s" % name)
+
+
+    def __restoreFileState(self, name):
+        """
+        Restore the saved status of the probes (or variables) of a file.
+        """
+        state = self.savedProbesState.get(name)
+        if state == None:
+            return
+        for itt in self.listFileProbes[name]:
+            if itt.index < len(state):
+                itt.name, itt.status, itt.subplot_id = state[itt.index]
+
+
     def LoadState(self):
         """
         """
         name = os.path.join(self.caseName, '.trackcvg.state')
 
+        self.savedProbesState = {}
+        self.savedHeaderIndex = {}
+
         if os.path.exists(name):
             dom = parse(name)
-            self.timeRefresh = float(dom.getElementsByTagName('timeRefresh')[0].getAttribute('value'))
-            self.subplotNumber = int(dom.getElementsByTagName('subplotNumber')[0].getAttribute('value'))
+
+            for fl in dom.getElementsByTagName('file'):
+                state = []
+                for nn in fl.getElementsByTagName('probe'):
+                    state.append((nn.getAttribute('name'),
+                                  nn.getAttribute('status'),
+                                  int(nn.getAttribute('subplot_id'))))
+                self.savedProbesState[fl.getAttribute('name')] = state
+
+            for node in dom.getElementsByTagName('header'):
+                path = os.path.join(self.caseName, node.getAttribute('path'))
+                variables = None
+                if node.getElementsByTagName('variable'):
+                    variables = [nn.getAttribute('name') for nn
+                                 in node.getElementsByTagName('variable')]
+                self.savedHeaderIndex[os.path.abspath(path)] \
+                    = {'inode': int(node.getAttribute('inode')),
+                       'size': int(node.getAttribute('size')),
+                       'columns': int(node.getAttribute('columns')),
+                       'variables': variables}
+
             for (name, fle, status, subplot_id, probes_number) in self.fileList:
-                lst = dom.getElementsByTagName('file')
-                fl = None
-                for node in lst:
-                    if node.getAttribute('name') == name:
-                        fl = node
-                if fl != None:
-                    for itt in self.listFileProbes[name]:
-                        nn = fl.getElementsByTagName('probe')[itt.index]
-                        itt.name       = nn.getAttribute('name')
-                        itt.status     = nn.getAttribute('status')
-                        itt.subplot_id = int(nn.getAttribute('subplot_id'))
-            self.lineEditTime.setText(str(self.timeRefresh))
-            self.timer.start(self.timeRefresh * 1000)
-            self.spinBox.setValue(int(self.subplotNumber))
+                self.__restoreFileState(name)
+
+            if dom.getElementsByTagName('timeRefresh'):
+                self.timeRefresh = float(dom.getElementsByTagName('timeRefresh')[0].getAttribute('value'))
+                self.subplotNumber = int(dom.getElementsByTagName('subplotNumber')[0].getAttribute('value'))
+                self.lineEditTime.setText(str(self.timeRefresh))
+                self.timer.start(self.timeRefresh * 1000)
+                self.spinBox.setValue(int(self.subplotNumber))
+
+            dom.unlink()
 
 
     def slotRefresh(self):
@@ -1221,6 +1639,7 @@ class MainViewSaturne(QMainWindow, Ui_MainForm, MainView):
         self.fileList = []
         self.listingVariable = []
         self.listFileProbes = {}
+        self.fileReaders = {}
         self.timer = QTimer()
         self.timer.start(self.timeRefresh * 1000)
 
@@ -56,6 +56,7 @@
 
 #include "cs_base.h"
 #include "cs_coupling.h"
+#include "cs_log.h"
 #include "cs_mesh.h"
 #include "cs_mesh_quantities.h"
 #include "cs_mesh_connect.h"
@@ -505,6 +506,74 @@ _init_all_mpi_sat(void)
 
 #endif /* defined(HAVE_MPI) */
 
+/*----------------------------------------------------------------------------
+ * Log timing info
+ *----------------------------------------------------------------------------*/
+
+static void
+_all_comm_times(void)
+{
+  int coupl_id, ent_id;
+
+  if (cs_glob_sat_n_couplings == 0)
+    return;
+
+  cs_log_printf(CS_LOG_PERFORMANCE, "\n");
+  cs_log_separator(CS_LOG_PERFORMANCE);
+
+  cs_log_printf(CS_LOG_PERFORMANCE,
+                _("\nCode_Saturne coupling overheads\n"));
+
+  for (coupl_id = 0; coupl_id < cs_glob_sat_n_couplings; coupl_id++) {
+
+    cs_sat_coupling_t *coupl = cs_glob_sat_couplings[coupl_id];
+
+    for (ent_id = 0; ent_id < 2; ent_id++) {
+
+      ple_locator_t *locator
+        = (ent_id == 0) ? coupl->localis_fbr : coupl->localis_cel;
+      const char *ent_type[] = {N_("boundary faces"), N_("cells")};
+
+      double location_wtime, exchange_wtime;
+      double location_comm_wtime, exchange_comm_wtime;
+
+      if (locator == NULL)
+        continue;
+
+      if (coupl->sat_name != NULL)
+        cs_log_printf(CS_LOG_PERFORMANCE,
+                      _("\n  %s (%s):\n\n"),
+                      coupl->sat_name, _(ent_type[ent_id]));
+      else
+        cs_log_printf(CS_LOG_PERFORMANCE,
+                      _("\n  coupling %d (%s):\n\n"),
+                      coupl_id + 1, _(ent_type[ent_id]));
+
+      ple_locator_get_times(locator,
+                            &location_wtime,
+                            NULL,
+                            &exchange_wtime,
+                            NULL);
+
+      ple_locator_get_comm_times(locator,
+                                 &location_comm_wtime,
+                                 NULL,
+                                 &exchange_comm_wtime,
+                                 NULL);
+
+      cs_log_printf(CS_LOG_PERFORMANCE,
+                    _("    location time:                 %12.3f\n"
+                      "      communication and wait:      %12.3f\n"
+                      "    variable exchange time:        %12.3f\n"
+                      "      communication and wait:      %12.3f\n"),
+                    location_wtime, location_comm_wtime,
+                    exchange_wtime, exchange_comm_wtime);
+
+    }
+
+  }
+}
+
 /*----------------------------------------------------------------------------
  * Destroy a coupling structure
  *
@@ -2165,6 +2234,8 @@ cs_sat_coupling_all_finalize(void)
 {
   int  i;
 
+  _all_comm_times();
+
   for (i = 0 ; i < cs_glob_sat_n_couplings ; i++)
     _sat_coupling_destroy(cs_glob_sat_couplings[i]);
 